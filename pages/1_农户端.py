@@ -3,7 +3,18 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from datetime import datetime, timedelta
+import zlib
+from datetime import datetime
+from utils.weather_store import WeatherStore, region_key
+from utils.weather_classifier import classify_frame, rainfall_colors, growth_stage, lookup_thresholds
+from utils.weather_trigger import DEFAULT_INDEX_PRODUCTS, evaluate_series
+from utils.burn_cost import sum_insured_per_mu
+from utils.price_forecast import PriceForecastRegistry, forecast_model, baseline_forecast
+from utils.price_store import PriceStore
+from utils.photo_store import shared_photo_store
+from utils.photo_hash import shared_photo_index, duplicate_note
+from utils.claim_store import shared_claim_repository, PENDING, MANUAL
+from utils.photo_exif import verify_photos
 st.set_page_config(page_title="农户端", page_icon="👨‍🌾", layout="wide")
 # 顶部导航
 col_nav1, col_nav2 = st.columns([1, 4])
@@ -24,196 +35,230 @@ with st.sidebar:
    
     st.divider()
     st.success(f"欢迎, {farmer_name}!")
+def _threshold_line(fig, dates, values, label, unit, color, dash):
+    """逐日阈值画成阶梯线, 末端标注当前阈值"""
+    fig.add_trace(go.Scatter(x=dates, y=values, mode='lines', name=label, showlegend=False,
+                             line=dict(color=color, dash=dash, width=1.5, shape='hv'),
+                             hovertemplate=f'{label}: %{{y:.0f}}{unit}<extra></extra>'))
+    fig.add_annotation(x=dates.iloc[-1], y=values[-1], text=f"{label}: {values[-1]:.0f}{unit}",
+                       showarrow=False, xanchor='right', yanchor='bottom', font=dict(color=color))
+
+
+@st.cache_data(ttl=6 * 3600, max_entries=2000)
+def build_weather_forecast(region, issue_date, crop):
+    """生成一个 (地区, 发布日, 作物) 的30天预报及三张图的 spec, 在所有会话间缓存"""
+    # 随机数种子只由地区和发布日决定, 同一地区同一天各会话看到同一份预报
+    rng = np.random.default_rng(zlib.crc32(f"{region}|{issue_date}".encode('utf-8')))
+   
+    # 优先使用气象数据仓库中的同期历史气候(内存映射读取), 无数据时退回模拟
+    climatology = WeatherStore().climatology(region, issue_date, days=30)
+    if not climatology.empty:
+        weather_data = climatology[['date', 'temp_max', 'temp_min', 'rainfall']].copy()
+        weather_data['disaster_risk'] = np.clip(rng.beta(2, 5, 30), 0, 1)
+    else:
+        # 生成模拟30天天气数据
+        dates = pd.date_range(start=issue_date, periods=30, freq='D')
+       
+        # 模拟温度数据（带季节性和随机波动）
+        t = np.arange(30)
+        seasonal = 2 * np.sin(2 * np.pi * t / 365)
+        temp_base = 28
+        weather_data = pd.DataFrame({
+            'date': dates,
+            'temp_max': temp_base + seasonal + rng.normal(0, 3, 30),
+            'temp_min': temp_base - 7 + seasonal + rng.normal(0, 2, 30),
+            'rainfall': np.abs(rng.exponential(15, 30) + rng.normal(0, 5, 30)),
+            'disaster_risk': np.clip(rng.beta(2, 5, 30), 0, 1) # 偏向低风险但有高风险天数
+        })
+   
+    # 标注极端天气（向量化分类, 阈值按作物及预报日所处生育期查表）
+    weather_data['crop'] = crop
+    weather_data['stage'] = growth_stage(crop, weather_data['date'])
+    classify_frame(weather_data)
+    thresholds = lookup_thresholds(weather_data['crop'].to_numpy(), weather_data['stage'].to_numpy(),
+                                   len(weather_data))
+   
+    # 1. 温度趋势图（标注极端高温）
+    fig_temp = go.Figure()
+   
+    # 正常温度(按分类结果区分, 阈值随作物生育期变化)
+    extreme_temp_mask = weather_data['extreme_type'] == '高温'
+    normal_mask = ~extreme_temp_mask
+    fig_temp.add_trace(go.Scatter(
+        x=weather_data[normal_mask]['date'],
+        y=weather_data[normal_mask]['temp_max'],
+        mode='lines+markers',
+        name='最高温',
+        line=dict(color='orange', width=2),
+        marker=dict(size=6)
+    ))
+   
+    # 极端高温标红
+    fig_temp.add_trace(go.Scatter(
+        x=weather_data[extreme_temp_mask]['date'],
+        y=weather_data[extreme_temp_mask]['temp_max'],
+        mode='markers',
+        name='极端高温',
+        marker=dict(color='red', size=12, symbol='x')
+    ))
+   
+    fig_temp.add_trace(go.Scatter(
+        x=weather_data['date'],
+        y=weather_data['temp_min'],
+        mode='lines+markers',
+        name='最低温',
+        line=dict(color='blue', width=2),
+        marker=dict(size=4),
+        fill='tonexty'
+    ))
+   
+    # 添加极端高温阈值线(与分类使用同一阈值表, 生育期变化时阶梯变化)
+    _threshold_line(fig_temp, weather_data['date'], thresholds['heat'], "极端高温阈值", "°C", "red", "dash")
+   
+    fig_temp.update_layout(
+        title="未来30天温度趋势预测",
+        xaxis_title="日期",
+        yaxis_title="温度(°C)",
+        hovermode='x unified',
+        height=400
+    )
+   
+    # 2. 降雨量柱状图（标注暴雨）
+    # 根据降雨量分级着色
+    rain_colors = rainfall_colors(weather_data['rainfall'].to_numpy(),
+                                  thresholds['heavy_rain'], thresholds['rain'])
+   
+    fig_rain = go.Figure()
+    fig_rain.add_trace(go.Bar(
+        x=weather_data['date'],
+        y=weather_data['rainfall'],
+        marker_color=rain_colors,
+        name='降雨量',
+        text=weather_data['rainfall'].round(1),
+        textposition='outside',
+        hovertemplate='<b>%{x|%m-%d}</b><br>降雨量: %{y:.1f}mm<extra></extra>'
+    ))
+   
+    # 添加暴雨阈值线
+    _threshold_line(fig_rain, weather_data['date'], thresholds['heavy_rain'], "暴雨阈值", "mm", "red", "dash")
+    _threshold_line(fig_rain, weather_data['date'], thresholds['rain'], "大雨阈值", "mm", "orange", "dot")
+   
+    fig_rain.update_layout(
+        title="未来30天降雨量预测",
+        xaxis_title="日期",
+        yaxis_title="降雨量(mm)",
+        height=400,
+        showlegend=False
+    )
+   
+    # 3. 极端天气概率热力图
+   
+    # 将风险等级转换为0-100的概率
+    weather_data['risk_percent'] = (weather_data['disaster_risk'] * 100).round(1)
+   
+    # 创建热力图数据（按周组织）
+    weather_data['week'] = ((weather_data.index) // 7) + 1
+    weather_data['day_of_week'] = weather_data.index % 7
+   
+    # 用pivot创建周-日矩阵
+    heatmap_data = weather_data.pivot_table(
+        values='risk_percent',
+        index='week',
+        columns='day_of_week',
+        aggfunc='first'
+    )
+   
+    fig_heatmap = go.Figure(data=go.Heatmap(
+        z=heatmap_data.values,
+        x=['周一', '周二', '周三', '周四', '周五', '周六', '周日'][:heatmap_data.shape[1]],
+        y=[f'第{i+1}周' for i in range(len(heatmap_data))],
+        colorscale='RdYlGn_r', # 红-黄-绿反转（红色表示高风险）
+        text=heatmap_data.values.round(1),
+        texttemplate='%{text}%',
+        textfont={"size": 10},
+        colorbar=dict(title="风险等级(%)")
+    ))
+   
+    fig_heatmap.update_layout(
+        title="未来30天极端天气概率热力图",
+        height=300
+    )
+   
+    return {
+        'frame': weather_data,
+        'fig_temp': fig_temp.to_dict(),
+        'fig_rain': fig_rain.to_dict(),
+        'fig_heatmap': fig_heatmap.to_dict(),
+    }
 # Tab导航
 tab1, tab2, tab3, tab4 = st.tabs(["🌦️ 天气预警", "💰 价格预测", "📝 理赔申请", "📄 我的保单"])
 # ==================== Tab1: 天气预警 ====================
 with tab1:
     st.header("🌦️ 天气预警系统 - 未来30天极端天气预测")
    
-    # Dashboard - 关键指标卡片
+    # 同一地区、发布日的预报在所有会话间共享, 只在首个请求时计算
+    issue_date = datetime.now().date()
+    forecast = build_weather_forecast(farmer_location, issue_date, crop_type)
+    weather_data = forecast['frame']
+    extreme_days = weather_data[weather_data['is_extreme']]
+    avg_risk = weather_data['disaster_risk'].mean()
+   
+    # Dashboard - 关键指标卡片(由极端天气分类结果统计)
     st.subheader("📊 气象预警Dashboard")
    
     metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
    
     with metric_col1:
-        st.metric("极端高温天数", "3天", "↑ 1天", help="未来30天预测超过35°C的天数")
+        st.metric("极端高温天数", f"{(weather_data['extreme_type'] == '高温').sum()}天",
+                  help="未来30天预测超过高温阈值的天数")
    
     with metric_col2:
-        st.metric("暴雨预警", "5天", "↑ 2天", help="未来30天降雨量>50mm的天数")
+        st.metric("暴雨预警", f"{(weather_data['extreme_type'] == '暴雨').sum()}天",
+                  help="未来30天降雨量超过暴雨阈值的天数")
    
     with metric_col3:
-        st.metric("综合风险等级", "中", delta="稳定", help="基于多维气象数据的综合评估")
+        if avg_risk > 0.7 or len(extreme_days) >= 3:
+            risk_level = '高'
+        elif avg_risk > 0.4 or len(extreme_days) > 0:
+            risk_level = '中'
+        else:
+            risk_level = '低'
+        st.metric("综合风险等级", risk_level, help="基于多维气象数据的综合评估")
    
     with metric_col4:
-        disaster_prob = 23.5
-        st.metric("极端天气概率", f"{disaster_prob:.1f}%", "↓ 5%", help="未来30天内发生极端天气的概率")
+        disaster_prob = weather_data['is_extreme'].mean() * 100
+        st.metric("极端天气概率", f"{disaster_prob:.1f}%", help="未来30天内极端天气(高温/暴雨/低温)天数占比")
    
     st.divider()
    
     col1, col2 = st.columns([2, 1])
    
     with col1:
-        # 生成模拟30天天气数据
-        dates = pd.date_range(start=datetime.now(), periods=30, freq='D')
-       
-        # 模拟温度数据（带季节性和随机波动）
-        t = np.arange(30)
-        seasonal = 2 * np.sin(2 * np.pi * t / 365)
-        temp_base = 28
-        weather_data = pd.DataFrame({
-            'date': dates,
-            'temp_max': temp_base + seasonal + np.random.normal(0, 3, 30),
-            'temp_min': temp_base - 7 + seasonal + np.random.normal(0, 2, 30),
-            'rainfall': np.abs(np.random.exponential(15, 30) + np.random.normal(0, 5, 30)),
-            'disaster_risk': np.clip(np.random.beta(2, 5, 30), 0, 1) # 偏向低风险但有高风险天数
-        })
-       
-        # 标注极端天气
-        weather_data['is_extreme'] = (weather_data['temp_max'] > 35) | (weather_data['rainfall'] > 50)
-        weather_data['extreme_type'] = weather_data.apply(
-            lambda x: '高温' if x['temp_max'] > 35 else ('暴雨' if x['rainfall'] > 50 else '正常'),
-            axis=1
-        )
-       
-        # 1. 温度趋势图（标注极端高温）
-        fig_temp = go.Figure()
-       
-        # 正常温度
-        normal_mask = weather_data['temp_max'] <= 35
-        fig_temp.add_trace(go.Scatter(
-            x=weather_data[normal_mask]['date'],
-            y=weather_data[normal_mask]['temp_max'],
-            mode='lines+markers',
-            name='最高温',
-            line=dict(color='orange', width=2),
-            marker=dict(size=6)
-        ))
-       
-        # 极端高温标红
-        extreme_temp_mask = weather_data['temp_max'] > 35
-        fig_temp.add_trace(go.Scatter(
-            x=weather_data[extreme_temp_mask]['date'],
-            y=weather_data[extreme_temp_mask]['temp_max'],
-            mode='markers',
-            name='极端高温',
-            marker=dict(color='red', size=12, symbol='x')
-        ))
-       
-        fig_temp.add_trace(go.Scatter(
-            x=weather_data['date'],
-            y=weather_data['temp_min'],
-            mode='lines+markers',
-            name='最低温',
-            line=dict(color='blue', width=2),
-            marker=dict(size=4),
-            fill='tonexty'
-        ))
-       
-        # 添加极端高温阈值线
-        fig_temp.add_hline(y=35, line_dash="dash", line_color="red",
-                          annotation_text="极端高温阈值: 35°C")
-       
-        fig_temp.update_layout(
-            title="未来30天温度趋势预测",
-            xaxis_title="日期",
-            yaxis_title="温度(°C)",
-            hovermode='x unified',
-            height=400
-        )
-        st.plotly_chart(fig_temp, use_container_width=True)
-       
-        # 2. 降雨量柱状图（标注暴雨）
-        # 根据降雨量分级着色
-        rainfall_colors = weather_data['rainfall'].apply(
-            lambda x: 'red' if x > 50 else ('orange' if x > 25 else 'lightblue')
-        )
-       
-        fig_rain = go.Figure()
-        fig_rain.add_trace(go.Bar(
-            x=weather_data['date'],
-            y=weather_data['rainfall'],
-            marker_color=rainfall_colors,
-            name='降雨量',
-            text=weather_data['rainfall'].round(1),
-            textposition='outside',
-            hovertemplate='<b>%{x|%m-%d}</b><br>降雨量: %{y:.1f}mm<extra></extra>'
-        ))
-       
-        # 添加暴雨阈值线
-        fig_rain.add_hline(y=50, line_dash="dash", line_color="red",
-                          annotation_text="暴雨阈值: 50mm")
-        fig_rain.add_hline(y=25, line_dash="dot", line_color="orange",
-                          annotation_text="大雨阈值: 25mm")
-       
-        fig_rain.update_layout(
-            title="未来30天降雨量预测",
-            xaxis_title="日期",
-            yaxis_title="降雨量(mm)",
-            height=400,
-            showlegend=False
-        )
-        st.plotly_chart(fig_rain, use_container_width=True)
+        st.plotly_chart(forecast['fig_temp'], use_container_width=True)
+        st.plotly_chart(forecast['fig_rain'], use_container_width=True)
        
         # 3. 极端天气概率热力图
         st.subheader("📅 极端天气风险日历")
-       
-        # 将风险等级转换为0-100的概率
-        weather_data['risk_percent'] = (weather_data['disaster_risk'] * 100).round(1)
-       
-        # 创建热力图数据（按周组织）
-        weather_data['week'] = ((weather_data.index) // 7) + 1
-        weather_data['day_of_week'] = weather_data.index % 7
-       
-        # 用pivot创建周-日矩阵
-        heatmap_data = weather_data.pivot_table(
-            values='risk_percent',
-            index='week',
-            columns='day_of_week',
-            aggfunc='first'
-        )
-       
-        fig_heatmap = go.Figure(data=go.Heatmap(
-            z=heatmap_data.values,
-            x=['周一', '周二', '周三', '周四', '周五', '周六', '周日'][:heatmap_data.shape[1]],
-            y=[f'第{i+1}周' for i in range(len(heatmap_data))],
-            colorscale='RdYlGn_r', # 红-黄-绿反转（红色表示高风险）
-            text=heatmap_data.values.round(1),
-            texttemplate='%{text}%',
-            textfont={"size": 10},
-            colorbar=dict(title="风险等级(%)")
-        ))
-       
-        fig_heatmap.update_layout(
-            title="未来30天极端天气概率热力图",
-            height=300
-        )
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+        st.plotly_chart(forecast['fig_heatmap'], use_container_width=True)
    
     with col2:
         st.subheader("⚠️ 风险预警")
        
-        # 计算平均风险等级
-        avg_risk = weather_data['disaster_risk'].mean()
-       
-        if avg_risk > 0.7:
+        # 按极端天气分类结果列出预警日期
+        if risk_level == '高':
             st.error("🚨 **高风险警报**")
-            st.markdown("""
-            **预警内容:**
-            - 未来3天可能出现暴雨
-            - 建议做好排水措施
-            - 及时关注天气变化
-            """)
-            st.warning("💡 **理赔提示:** 如发生灾害损失,请及时拍照记录并提交理赔申请")
-        elif avg_risk > 0.4:
+        elif risk_level == '中':
             st.warning("⚠️ **中风险提示**")
-            st.markdown("""
-            **注意事项:**
-            - 天气状况不稳定
-            - 注意防范局部暴雨
-            """)
         else:
             st.success("✅ **低风险**")
+        if extreme_days.empty:
             st.markdown("天气状况良好,适合农业生产")
+        else:
+            advice = {'高温': '注意灌溉遮阴', '暴雨': '做好排水措施', '低温': '做好防寒覆盖'}
+            lines = [f"- {d:%m-%d} {t}: {advice[t]}"
+                     for d, t in zip(extreme_days['date'], extreme_days['extreme_type'])]
+            st.markdown("**预警内容:**\n" + "\n".join(lines))
+            st.warning("💡 **理赔提示:** 如发生灾害损失,请及时拍照记录并提交理赔申请")
        
         st.divider()
        
@@ -224,8 +269,23 @@ with tab1:
         - 作物: {crop_type}
         - 面积: {planting_area}亩
         - 保险类型: 天气指数保险
-        - 保障额度: ¥{planting_area * 5000:,.0f}
+        - 保障额度: ¥{planting_area * sum_insured_per_mu(crop_type):,.0f}
         """)
+       
+        st.divider()
+       
+        # 天气指数触发（按指数定义计算，而不是看图比对阈值线）
+        st.subheader("⚡ 指数触发预警")
+        for product_name in DEFAULT_INDEX_PRODUCTS:
+            index_value, ratio, payout = evaluate_series(
+                weather_data, product_name, sum_insured=planting_area * sum_insured_per_mu(crop_type)
+            )
+            if np.isnan(index_value):
+                st.info(f"➖ **{product_name}**: 数据天数不足一个完整统计窗口, 不评估")
+            elif ratio > 0:
+                st.error(f"🔔 **{product_name}**: 指数值 {index_value:.1f}, 预计赔付 {ratio*100:.0f}% (¥{payout:,.0f})")
+            else:
+                st.success(f"✅ **{product_name}**: 指数值 {index_value:.1f}, 未触发")
 # ==================== Tab2: 价格预测 ====================
 with tab2:
     st.header("💰 价格趋势预测")
@@ -233,18 +293,24 @@ with tab2:
     col1, col2 = st.columns([3, 1])
    
     with col1:
-        # 生成模拟历史价格数据
-        months = pd.date_range(start='2024-01-01', periods=12, freq='ME')
-        historical_prices = pd.DataFrame({
-            'month': months,
-            'price': [3.5, 3.2, 2.8, 2.5, 2.3, 2.0, 1.8, 2.2, 2.6, 3.0, 3.3, 3.6]
-        })
-       
-        # 生成预测价格
-        future_months = pd.date_range(start=months[-1] + timedelta(days=30), periods=3, freq='ME')
+        # 历史价格: 优先读取价格仓库中最近12个月的月均价, 无数据时用示例数据
+        historical_prices = PriceStore().monthly_mean(crop_type).tail(12).reset_index(drop=True)
+        if historical_prices.empty:
+            months = pd.date_range(start='2024-01-01', periods=12, freq='ME')
+            historical_prices = pd.DataFrame({
+                'month': months,
+                'price': [3.5, 3.2, 2.8, 2.5, 2.3, 2.0, 1.8, 2.2, 2.6, 3.0, 3.3, 3.6]
+            })
+       
+        # 预测价格: 读取离线拟合的指数平滑模型外推3个月, 无模型时用季节朴素预测
+        price_model = PriceForecastRegistry().get(crop_type, region_key(farmer_location))
+        if price_model is not None:
+            price_forecast = forecast_model(price_model, 3)
+        else:
+            price_forecast = baseline_forecast(historical_prices['month'], historical_prices['price'], 3)
         predicted_prices = pd.DataFrame({
-            'month': future_months,
-            'price': [3.8, 3.5, 3.3]
+            'month': price_forecast['date'],
+            'price': price_forecast['forecast'].round(2)
         })
        
         # 绘制价格趋势
@@ -395,7 +461,32 @@ with tab3:
             uploaded_file = st.file_uploader("选择照片(支持jpg/png)", type=['jpg', 'png', 'jpeg'])
            
             if uploaded_file:
-                st.image(uploaded_file, caption="受灾照片", use_container_width=True)
+                photo = shared_photo_store().process_upload(uploaded_file, st.session_state, 'farmer_photo_upload')
+                st.session_state.claim_photo = photo
+                st.image(photo['thumbnail'], caption=f"受灾照片({photo['width']}×{photo['height']})", use_container_width=True)
+                # 上传时只查重不登记, 提交申请后再按申请编号登记
+                check = st.session_state.get('farmer_photo_check')
+                if check is None or check['digest'] != photo['digest']:
+                    phash_value, similar = shared_photo_index().find_similar(
+                        shared_photo_store().thumbnail_path(photo['digest']))
+                    check = {'digest': photo['digest'], 'phash': phash_value, 'similar': similar}
+                    st.session_state.farmer_photo_check = check
+                similar = check['similar']
+                if not similar.empty:
+                    st.warning(f"⚠️ 该照片与 {similar['claim_id'].nunique()} 个历史理赔案件的照片高度相似"
+                               f"(汉明距离 {similar['distance'].min()}), 将转人工复核")
+                # 照片 EXIF: 拍摄位置与投保地块、拍摄时间与灾害日期是否吻合
+                exif_check = verify_photos(pd.DataFrame({
+                    'path': [str(shared_photo_store().blob_path(photo['digest']))],
+                    'county': [farmer_location], 'disaster_date': [disaster_date],
+                    'claim_date': [datetime.now().date()],
+                })).iloc[0]
+                if exif_check['gps_ok'] is False or exif_check['time_ok'] is False:
+                    st.warning(f"⚠️ 照片信息核验: {exif_check['note']}")
+                elif exif_check['gps_ok'] and exif_check['time_ok']:
+                    st.caption(f"📍 照片拍摄于投保地块 {exif_check['distance_km']:.1f}km 内, 拍摄时间吻合")
+                else:
+                    st.caption(f"📍 照片信息不完整: {exif_check['note']}")
                
                 # 模拟AI识别
                 with st.spinner("AI正在分析照片..."):
@@ -406,7 +497,8 @@ with tab3:
         st.text_area("补充说明", placeholder="请描述灾害情况...", key="补充说明_天气")
        
         # 计算预计赔付
-        compensation = affected_area * 5000 * (damage_level / 100)
+        unit_amount = sum_insured_per_mu(crop_type)  # 按作物的每亩保额
+        compensation = affected_area * unit_amount * (damage_level / 100)
        
         st.divider()
        
@@ -415,12 +507,27 @@ with tab3:
             st.info(f"""
             💰 **预计赔付金额:** ¥{compensation:,.0f}
            
-            📝 **计算方式:** {affected_area}亩 × ¥5,000/亩 × {damage_level}% = ¥{compensation:,.0f}
+            📝 **计算方式:** {affected_area}亩 × ¥{unit_amount:,}/亩 × {damage_level}% = ¥{compensation:,.0f}
             """)
         with col_b:
             if st.button("🚀 提交理赔申请", type="primary", use_container_width=True, key="提交天气理赔"):
-                st.success("✅ 理赔申请已提交,审核中...")
-                st.balloons()
+                claim_id = f"CL{datetime.now():%Y%m%d%H%M%S%f}"
+                check = st.session_state.get('farmer_photo_check') if uploaded_file else None
+                note = duplicate_note(check['similar']) if check else None
+                shared_claim_repository().insert_many(pd.DataFrame([{
+                    'claim_id': claim_id, 'farmer': farmer_name, 'region': region_key(farmer_location),
+                    'claim_type': '天气灾害', 'amount': compensation,
+                    'submitted_at': f"{datetime.now():%Y-%m-%d %H:%M}", 'event_date': str(disaster_date),
+                    'area_mu': affected_area, 'damage_pct': damage_level, 'crop': crop_type,
+                    'status': MANUAL if note else PENDING, 'note': note,
+                }]))
+                if check:
+                    shared_photo_index().register(check['phash'], check['digest'], claim_id)
+                if note:
+                    st.warning(f"⚠️ 理赔申请 {claim_id} 已提交: {note}")
+                else:
+                    st.success(f"✅ 理赔申请 {claim_id} 已提交,审核中...")
+                    st.balloons()
    
     else: # 价格保险理赔
         st.subheader("💰 价格保险理赔")
@@ -4,6 +4,12 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
+
+from utils.spatial_index import COUNTY_COORDS
+from utils.typhoon_cat import synthetic_tracks, event_loss_table, pml_curve
+from utils.claim_store import shared_claim_repository, APPROVED, REJECTED, MANUAL, REVIEW_QUEUE
+from utils.claim_adjudication import adjudicate, summarize, run_batch, verification_evidence
+from utils.claim_verification import shared_verification_service, NOT_APPLICABLE
 st.set_page_config(page_title="保险公司使用入口", page_icon="🏢", layout="wide")
 # 顶部导航
 col_nav1, col_nav2 = st.columns([1, 4])
@@ -42,10 +48,11 @@ with tab1:
         st.subheader("🗺️ 区域风险热力图")
        
         # 模拟区域风险数据
+        # 县域坐标与空间索引共用一份
         regions_data = pd.DataFrame({
-            'region': ['南宁-武鸣', '钦州-灵山', '崇左-扶绥', '百色-田阳', '河池-宜州'],
-            'lat': [23.1566, 22.2893, 22.6362, 23.7368, 24.4925],
-            'lon': [108.2733, 109.3122, 107.9043, 106.9152, 108.6364],
+            'region': list(COUNTY_COORDS),
+            'lat': [c[0] for c in COUNTY_COORDS.values()],
+            'lon': [c[1] for c in COUNTY_COORDS.values()],
             'insured_amount': [5000, 3200, 2800, 2100, 1900],
             'risk_level': [0.75, 0.45, 0.62, 0.38, 0.52]
         })
@@ -138,6 +145,46 @@ with tab1:
     )
    
     st.plotly_chart(fig_payout, use_container_width=True)
+   
+    # 台风巨灾模型: 合成路径足迹 × 承保暴露 → 事件损失表与 PML
+    st.subheader("🌀 台风巨灾损失(PML)")
+   
+    @st.cache_data
+    def typhoon_pml(counties, insured_amounts, n_years):
+        rng = np.random.default_rng(2024)
+        # 各县保额分摊到县城周边的模拟地块上
+        parcels_per_county = 400
+        exposures = pd.DataFrame({
+            'county': np.repeat(counties, parcels_per_county),
+            'sum_insured': np.repeat(np.asarray(insured_amounts, dtype=float) / parcels_per_county,
+                                     parcels_per_county),
+            'crop': rng.choice(['沃柑', '甘蔗', '荔枝', '芒果', '火龙果'], len(counties) * parcels_per_county),
+        })
+        centers = np.array([COUNTY_COORDS[c] for c in exposures['county']])
+        exposures['lat'] = centers[:, 0] + rng.normal(0, 0.15, len(exposures))
+        exposures['lon'] = centers[:, 1] + rng.normal(0, 0.15, len(exposures))
+        elt = event_loss_table(synthetic_tracks(n_years, seed=2024), exposures)
+        return pml_curve(elt, n_years), elt
+   
+    pml, elt = typhoon_pml(tuple(regions_data['region']), tuple(regions_data['insured_amount']), 2000)
+   
+    col_pml1, col_pml2 = st.columns([2, 1])
+    with col_pml1:
+        fig_pml = go.Figure()
+        fig_pml.add_trace(go.Scatter(x=pml['重现期(年)'], y=pml['OEP损失'], mode='lines+markers', name='OEP(单次最大)'))
+        fig_pml.add_trace(go.Scatter(x=pml['重现期(年)'], y=pml['AEP损失'], mode='lines+markers', name='AEP(年累计)'))
+        fig_pml.update_layout(
+            title="台风损失超越概率曲线(万元)",
+            xaxis_title="重现期(年)",
+            yaxis_title="损失(万元)",
+            xaxis_type='log',
+            height=350
+        )
+        st.plotly_chart(fig_pml, use_container_width=True)
+    with col_pml2:
+        st.metric("年均损失(AAL)", f"{elt['loss'].sum() / 2000:,.1f}万")
+        st.metric("百年一遇 PML(OEP)", f"{pml.loc[pml['重现期(年)'] == 100, 'OEP损失'].iloc[0]:,.0f}万")
+        st.metric("模拟台风事件数", f"{len(elt):,}")
 # ==================== Tab2: 理赔审核 ====================
 with tab2:
     st.header("✅ 智能理赔审核系统")
@@ -145,147 +192,198 @@ with tab2:
     # 待审核列表
     st.subheader("📋 待审核理赔申请")
    
-    pending_claims = pd.DataFrame({
-        '申请编号': ['CL202400145', 'CL202400146', 'CL202400147', 'CL202400148'],
-        '农户姓名': ['张三', '李四', '王五', '赵六'],
-        '地区': ['南宁-武鸣', '钦州-灵山', '崇左-扶绥', '南宁-武鸣'],
-        '类型': ['天气灾害', '价格理赔', '天气灾害', '价格理赔'],
-        '申请金额': [12000, 5000, 8000, 3500],
-        '申请时间': ['2024-11-15 10:30', '2024-11-15 14:20', '2024-11-16 09:15', '2024-11-16 11:45'],
-        '状态': ['待审核', '待审核', '待审核', '待审核']
-    })
-   
-    # 选择要审核的理赔
-    selected_claim = st.selectbox(
-        "选择理赔申请",
-        pending_claims['申请编号'].tolist(),
-        format_func=lambda x: f"{x} - {pending_claims[pending_claims['申请编号']==x]['农户姓名'].values[0]} - ¥{pending_claims[pending_claims['申请编号']==x]['申请金额'].values[0]:,.0f}"
-    )
-   
-    # 显示理赔详情
-    claim_detail = pending_claims[pending_claims['申请编号'] == selected_claim].iloc[0]
-   
-    col1, col2 = st.columns([2, 1])
-   
-    with col1:
-        st.subheader("📄 理赔详情")
-       
-        st.markdown(f"""
-        **申请编号:** {claim_detail['申请编号']}
-        **农户姓名:** {claim_detail['农户姓名']}
-        **所在地区:** {claim_detail['地区']}
-        **理赔类型:** {claim_detail['类型']}
-        **申请金额:** ¥{claim_detail['申请金额']:,.0f}
-        **申请时间:** {claim_detail['申请时间']}
-        """)
-       
-        st.divider()
-       
-        # 显示申请材料
-        st.markdown("**📎 申请材料**")
-       
-        if '天气灾害' in claim_detail['类型']:
-            st.image("https://via.placeholder.com/400x300?text=受灾照片", caption="受灾现场照片")
-           
-            st.markdown("""
-            **灾害信息:**
-            - 灾害类型: 暴雨洪涝
-            - 发生日期: 2024-11-10
-            - 受灾面积: 8亩
-            - 受损程度: 60%
+    repo = shared_claim_repository()
+    if repo.count() == 0:
+        # 首次运行写入演示案件
+        repo.insert_many(pd.DataFrame({
+            '申请编号': ['CL202400145', 'CL202400146', 'CL202400147', 'CL202400148'],
+            '农户姓名': ['张三', '李四', '王五', '赵六'],
+            '地区': ['南宁-武鸣', '钦州-灵山', '崇左-扶绥', '南宁-武鸣'],
+            '类型': ['天气灾害', '价格理赔', '天气灾害', '价格理赔'],
+            '申请金额': [12000, 5000, 8000, 3500],
+            '申请时间': ['2024-11-15 10:30', '2024-11-15 14:20', '2024-11-16 09:15', '2024-11-16 11:45'],
+            'event_date': ['2024-11-10', '2024-11-12', '2024-11-10', '2024-11-12'],
+            'area_mu': [8, None, 6, None],
+            'damage_pct': [60, None, 45, None],
+            'sale_qty': [None, 5000, None, 3000],
+            'sale_price': [None, 2.3, None, 2.6],
+            'insured_price': [None, 3.0, None, 3.0],
+            'crop': ['沃柑', '沃柑', '荔枝', '沃柑'],
+        }))
+
+    # 筛选与分页(只取当前一页)
+    col_f1, col_f2, col_f3 = st.columns(3)
+    with col_f1:
+        filter_region = st.selectbox("地区", ['全部'] + list(COUNTY_COORDS), key="claim_region")
+    with col_f2:
+        filter_type = st.selectbox("类型", ['全部', '天气灾害', '价格理赔'], key="claim_type")
+    region_arg = None if filter_region == '全部' else filter_region
+    type_arg = None if filter_type == '全部' else filter_type
+    # 审核队列包括待审核案件与自动审核转来的人工复核案件
+    n_pending = repo.count(REVIEW_QUEUE, region_arg, type_arg)
+    page_size = 50
+    with col_f3:
+        page_no = st.number_input(f"页码(共 {n_pending:,} 件待处理)", min_value=1,
+                                  max_value=max(1, -(-n_pending // page_size)), value=1)
+
+    pending_claims = repo.page_by_number(page_no, REVIEW_QUEUE, region_arg, type_arg, page_size)
+
+    if pending_claims.empty:
+        st.info("当前没有待审核的理赔申请")
+    else:
+        # 选项标签预先建好, format_func 为 O(1) 字典查找
+        claim_labels = {cid: f"{cid} - {name} - ¥{amount:,.0f}" + (f" [{status}]" if status == MANUAL else "")
+                        for cid, name, amount, status in zip(pending_claims['申请编号'], pending_claims['农户姓名'],
+                                                             pending_claims['申请金额'], pending_claims['状态'])}
+        selected_claim = st.selectbox("选择理赔申请", list(claim_labels), format_func=claim_labels.get)
+   
+        # 显示理赔详情
+        claim_detail = pending_claims.set_index('申请编号', drop=False).loc[selected_claim].astype(object)
+        claim_detail = claim_detail.where(claim_detail.notna(), None)
+   
+        col1, col2 = st.columns([2, 1])
+   
+        with col1:
+            st.subheader("📄 理赔详情")
+       
+            st.markdown(f"""
+            **申请编号:** {claim_detail['申请编号']}
+            **农户姓名:** {claim_detail['农户姓名']}
+            **所在地区:** {claim_detail['地区']}
+            **理赔类型:** {claim_detail['类型']}
+            **申请金额:** ¥{claim_detail['申请金额']:,.0f}
+            **申请时间:** {claim_detail['申请时间']}
             """)
-        else:
-            st.markdown("""
-            **销售信息:**
-            - 销售日期: 2024-11-12
-            - 销售数量: 5000斤
-            - 实际价格: ¥2.3/斤
-            - 保险价格: ¥3.0/斤
-            - 价格差额: ¥0.7/斤
-            """)
-   
-    with col2:
-        st.subheader("🤖 AI交叉验证")
-       
-        with st.spinner("AI验证中..."):
-            import time
-            time.sleep(1)
+            if claim_detail['状态'] == MANUAL:
+                st.warning(f"🔎 自动审核转人工复核: {claim_detail['审核意见'] or '-'}")
        
-        # 模拟AI验证结果
-        st.success("✅ **验证完成**")
+            st.divider()
        
-        verification_results = {
-            '气象数据验证': np.random.choice([True, False], p=[0.9, 0.1]),
-            '遥感影像验证': np.random.choice([True, False], p=[0.85, 0.15]),
-            '市场价格验证': np.random.choice([True, False], p=[0.88, 0.12])
-        }
+            # 显示申请材料
+            st.markdown("**📎 申请材料**")
        
-        for check, result in verification_results.items():
-            if result:
-                st.success(f"✅ {check}")
+            if '天气灾害' in claim_detail['类型']:
+                st.image("https://via.placeholder.com/400x300?text=受灾照片", caption="受灾现场照片")
+           
+                st.markdown(f"""
+                **灾害信息:**
+                - 灾害类型: 暴雨洪涝
+                - 发生日期: {claim_detail['event_date'] or '-'}
+                - 受灾面积: {claim_detail['area_mu'] or 0:g}亩
+                - 受损程度: {claim_detail['damage_pct'] or 0:g}%
+                """)
             else:
-                st.error(f"❌ {check}")
-       
-        # 综合评分
-        confidence = sum(verification_results.values()) / len(verification_results)
-       
-        st.divider()
-       
-        st.metric("置信度评分", f"{confidence*100:.0f}%")
-       
-        if confidence >= 0.8:
-            st.success("🎯 **建议:** 通过审核")
-        elif confidence >= 0.6:
-            st.warning("⚠️ **建议:** 进一步核实")
-        else:
-            st.error("❌ **建议:** 拒绝理赔")
+                sale_price = claim_detail['sale_price'] or 0.0
+                insured_price = claim_detail['insured_price'] or 0.0
+                st.markdown(f"""
+                **销售信息:**
+                - 销售日期: {claim_detail['event_date'] or '-'}
+                - 销售数量: {claim_detail['sale_qty'] or 0:,.0f}斤
+                - 实际价格: ¥{sale_price:.1f}/斤
+                - 保险价格: ¥{insured_price:.1f}/斤
+                - 价格差额: ¥{max(insured_price - sale_price, 0):.1f}/斤
+                """)
+   
+        with col2:
+            st.subheader("🤖 AI交叉验证")
+       
+            with st.spinner("AI验证中..."):
+                verification = shared_verification_service().verify({
+                    'claim_id': claim_detail['申请编号'],
+                    'region': claim_detail['地区'],
+                    'event_date': claim_detail['event_date'] or str(claim_detail['申请时间'])[:10],
+                    'sale_price': claim_detail['sale_price'],
+                    'crop': claim_detail['crop'],
+                })
+       
+            st.success("✅ **验证完成**")
+       
+            for item in verification['results']:
+                if item['passed'] == NOT_APPLICABLE:
+                    st.info(f"➖ {item['check']}: {item['detail']}")
+                elif item['passed'] is None:
+                    st.warning(f"⚠️ {item['check']}: {item['detail']}")
+                elif item['passed']:
+                    st.success(f"✅ {item['check']}")
+                else:
+                    st.error(f"❌ {item['check']}: {item['detail']}")
+       
+            # 综合评分
+            confidence = verification['confidence']
+       
+            st.divider()
+       
+            st.metric("置信度评分", f"{confidence*100:.0f}%")
+       
+            if confidence >= 0.8:
+                st.success("🎯 **建议:** 通过审核")
+            elif confidence >= 0.6:
+                st.warning("⚠️ **建议:** 进一步核实")
+            else:
+                st.error("❌ **建议:** 拒绝理赔")
        
-        st.divider()
+            st.divider()
        
-        # 审核操作
-        st.subheader("📝 审核操作")
+            # 审核操作
+            st.subheader("📝 审核操作")
        
-        approved_amount = st.number_input(
-            "批准金额(元)",
-            min_value=0,
-            max_value=int(claim_detail['申请金额']),
-            value=int(claim_detail['申请金额'] * confidence)
-        )
+            approved_amount = st.number_input(
+                "批准金额(元)",
+                min_value=0,
+                max_value=int(claim_detail['申请金额']),
+                value=int(claim_detail['申请金额'] * confidence)
+            )
        
-        审核意见 = st.text_area("审核意见", placeholder="请填写审核意见...")
+            审核意见 = st.text_area("审核意见", placeholder="请填写审核意见...")
        
-        col_a, col_b = st.columns(2)
+            col_a, col_b = st.columns(2)
        
-        with col_a:
-            if st.button("✅ 批准", type="primary", use_container_width=True):
-                st.success(f"✅ 理赔已批准,赔付金额: ¥{approved_amount:,.0f}")
-                st.balloons()
+            with col_a:
+                if st.button("✅ 批准", type="primary", use_container_width=True):
+                    if repo.review(selected_claim, APPROVED, approved_amount, '审核员', 审核意见):
+                        st.success(f"✅ 理赔已批准,赔付金额: ¥{approved_amount:,.0f}")
+                        st.balloons()
+                    else:
+                        st.warning("该案件已被其他审核员处理")
        
-        with col_b:
-            if st.button("❌ 拒绝", type="secondary", use_container_width=True):
-                st.error("❌ 理赔已拒绝")
+            with col_b:
+                if st.button("❌ 拒绝", type="secondary", use_container_width=True):
+                    if repo.review(selected_claim, REJECTED, 0, '审核员', 审核意见):
+                        st.error("❌ 理赔已拒绝")
+                    else:
+                        st.warning("该案件已被其他审核员处理")
    
     st.divider()
    
     # 批量审核
     st.subheader("⚡ 批量审核")
    
+    @st.cache_data(ttl=60)
+    def batch_preview(pending_signature):
+        """按当前待审核案件预演一次自动审核(不写回); 新增或处理任一待审核案件时签名变化, 重新计算"""
+        claims = repo.pending_frame()
+        if claims.empty:
+            return {'auto_approve': 0, 'manual_review': 0, 'reject': 0, 'approved_amount': 0.0}
+        return summarize(adjudicate(claims, verification_evidence(claims)))
+
+    preview = batch_preview(repo.pending_signature())
+
     col1, col2, col3 = st.columns(3)
    
     with col1:
-        st.info("**高置信度案件**\n自动批准: 23件")
+        st.info(f"**高置信度案件**\n自动批准: {preview['auto_approve']:,}件")
    
     with col2:
-        st.warning("**中置信度案件**\n待人工复核: 12件")
+        st.warning(f"**中置信度案件**\n待人工复核: {preview['manual_review']:,}件")
    
     with col3:
-        st.error("**低置信度案件**\n建议拒绝: 8件")
+        st.error(f"**低置信度案件**\n建议拒绝: {preview['reject']:,}件")
    
     if st.button("🚀 执行批量审核", type="primary"):
         with st.spinner("批量处理中..."):
-            import time
-            time.sleep(2)
-        st.success("✅ 批量审核完成!")
+            result = run_batch(repo, evidence=verification_evidence)
+        st.success(f"✅ 批量审核完成! 处理 {result['written']:,} 件, "
+                   f"批准赔付 ¥{result['approved_amount']:,.0f}")
 # ==================== Tab3: 数据分析 ====================
 with tab3:
     st.header("📈 数据分析中心")
@@ -2,11 +2,24 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from datetime import datetime
 import time
 
+from utils.sequence_model import load_price_rnn, price_panel, random_walk_forecast
+from utils.photo_store import shared_photo_store
+from utils.photo_exif import verify_photos
+from utils.damage_classifier import (CLASSES as DAMAGE_CLASSES, DEMO_NOTICE, MISSING_MODEL_NOTICE,
+                                     shared_damage_batcher)
+from utils.burn_cost import sum_insured_per_mu, SUM_INSURED_PER_MU
+
 st.set_page_config(page_title="AI技术演示", page_icon="🤖", layout="wide")
 
+
+@st.cache_data(ttl=3600)
+def load_price_panel():
+    """价格仓库各作物日收盘价面板, 每小时刷新一次"""
+    return price_panel()
+
+
 # 顶部导航
 col_nav1, col_nav2 = st.columns([1, 4])
 with col_nav1:
@@ -29,12 +42,13 @@ with tab1:
     st.header("🌦️ AI灾害识别系统")
     
     st.markdown("""
-    本系统基于深度学习的计算机视觉技术,能够自动识别农业灾害类型和受损程度。
+    本系统从照片的颜色与纹理统计特征识别农业灾害类型, 并估计受损程度。
+    当前为演示模型(用程序生成的灾害纹理训练), 对真实照片的结果仅供参考, 不参与赔付计算。
     
     **核心技术:**
-    - 卷积神经网络(CNN)
-    - 迁移学习(ResNet-50)
-    - 多模态数据融合
+    - 颜色统计(色相直方图、植被/土壤/水体像素占比)
+    - 纹理统计(梯度强度、梯度方向一致性、拉普拉斯方差)
+    - 多类 softmax 回归(L2 正则)
     """)
     
     col1, col2 = st.columns([1, 1])
@@ -49,44 +63,35 @@ with tab1:
         )
         
         if uploaded_file:
-            st.image(uploaded_file, caption="待识别图片", use_container_width=True)
+            photo = shared_photo_store().process_upload(uploaded_file, st.session_state, 'demo_photo_upload')
+            st.image(photo['thumbnail'], caption="待识别图片", use_container_width=True)
+            st.session_state.demo_photo = photo['digest']
             
             if st.button("🚀 开始AI识别", type="primary", use_container_width=True, key="识别按钮"):
                 
-                # 模拟AI识别过程
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                steps = [
-                    ("图像预处理...", 0.2),
-                    ("特征提取...", 0.4),
-                    ("模型推理...", 0.7),
-                    ("结果分析...", 0.9),
-                    ("完成!", 1.0)
-                ]
-                
-                for step, progress in steps:
-                    status_text.text(step)
-                    progress_bar.progress(progress)
-                    time.sleep(0.5)
-                
-                status_text.success("✅ 识别完成!")
-                st.session_state.识别完成 = True
+                # 进程内共享的识别模型, 并发请求合并成小批量推理
+                with st.spinner("AI识别中..."):
+                    result = shared_damage_batcher().predict(shared_photo_store().tensor(photo['digest']))
+                if result is None:
+                    st.warning(f"⚠️ {MISSING_MODEL_NOTICE}")
+                    st.session_state.识别完成 = False
+                else:
+                    st.session_state.disaster_result = {
+                        'probabilities': np.array([result['probabilities'][c] for c in DAMAGE_CLASSES]) * 100,
+                        'damage_level': result['damage_level'],
+                        'synthetic': result['synthetic'],
+                    }
+                    st.success("✅ 识别完成!")
+                    st.session_state.识别完成 = True
     
     with col2:
         if uploaded_file and st.session_state.get("识别完成", False):
-            st.subheader("📊 AI识别结果")
-            
-            # 模拟识别结果
-            disaster_types = ['洪涝', '干旱', '病虫害', '台风', '冰雹']
+            synthetic = st.session_state.disaster_result['synthetic']
+            st.subheader("📊 AI识别结果" + (" (演示模型)" if synthetic else ""))
+            if synthetic:
+                st.caption(f"⚠️ {DEMO_NOTICE}")
             
-            # 使用固定的随机种子保证结果一致性
-            if 'disaster_result' not in st.session_state:
-                np.random.seed(42)
-                st.session_state.disaster_result = {
-                    'probabilities': np.random.dirichlet(np.ones(5)) * 100,
-                    'damage_level': np.random.randint(30, 90)
-                }
+            disaster_types = list(DAMAGE_CLASSES)
             
             probabilities = st.session_state.disaster_result['probabilities']
             damage_level = st.session_state.disaster_result['damage_level']
@@ -99,7 +104,7 @@ with tab1:
             st.metric("置信度", f"{main_prob:.1f}%")
             
             # 受损程度评估
-            st.metric("受损程度", f"{damage_level}%")
+            st.metric("模型估计受损程度", f"{damage_level}%")
             
             st.divider()
             
@@ -162,12 +167,24 @@ with tab1:
                 help=f"请选择受灾面积（1-{max_area}亩）"
             )
             
-            unit_amount = 5000  # 每亩保额
+            crop = st.selectbox("受灾作物", list(SUM_INSURED_PER_MU), key="受灾作物")
+            # 赔付按查勘认定的受损程度计算, 模型估计只作参考
+            assessed_damage = st.slider(
+                "查勘受损程度(%)",
+                min_value=1,
+                max_value=100,
+                value=50,
+                step=1,
+                key="查勘受损程度",
+                help=f"以查勘认定为准, 模型估计 {damage_level}% 仅供参考"
+            )
             
-            suggested_amount = area * unit_amount * (damage_level / 100)
+            unit_amount = sum_insured_per_mu(crop)  # 按作物的每亩保额
+            
+            suggested_amount = area * unit_amount * (assessed_damage / 100)
             
             st.success(f"### 建议理赔: ¥{suggested_amount:,.0f}")
-            st.caption(f"💡 计算方式: {area}亩 × ¥{unit_amount}/亩 × {damage_level}% = ¥{suggested_amount:,.0f}")
+            st.caption(f"💡 计算方式: {area}亩 × ¥{unit_amount:,}/亩 × {assessed_damage}% = ¥{suggested_amount:,.0f}")
     
     st.divider()
     
@@ -177,23 +194,21 @@ with tab1:
         ### 模型架构
         
         **1. 数据预处理**
-        - 图像尺寸标准化: 224x224
-        - 数据增强: 旋转、翻转、色彩抖动
-        - 归一化处理
+        - 居中裁成正方形后缩放到 224x224, 像素归一化到 0~1
+        - JPEG 在解码阶段按比例缩小, 模型输入只生成一次并缓存
         
         **2. 特征提取**
-        - 基础模型: ResNet-50 (ImageNet预训练)
-        - 迁移学习fine-tune
-        - 特征维度: 2048
+        - 颜色: RGB 均值/方差、饱和度加权色相直方图、超绿指数
+        - 像素占比: 绿色植被、褐色土壤/枯叶、水体/积水、暗部、亮部
+        - 纹理: 梯度强度、横竖/斜向梯度方向一致性(倒伏)、拉普拉斯方差、8x8 块内方差
         
         **3. 分类器**
-        - 全连接层 + Dropout(0.5)
-        - Softmax输出5类灾害概率
+        - 特征标准化 + 多类 softmax 回归(L2 正则, L-BFGS 求解)
+        - 输出5类灾害概率; 受损程度由植被缺失与倒伏程度估计
         
-        **4. 性能指标**
-        - 准确率: 92.3%
-        - 召回率: 89.7%
-        - F1-Score: 90.8%
+        **4. 训练数据**
+        - 尚无标注照片, 用程序生成的各类灾害典型纹理离线训练(演示模型)
+        - 有标注照片后用 train_damage_classifier 重新训练即可替换
         """)
 
 # ==================== Tab2: AI价格预测 ====================
@@ -201,12 +216,13 @@ with tab2:
     st.header("💰 AI价格预测系统")
     
     st.markdown("""
-    基于LSTM(长短期记忆网络)的时间序列预测模型,综合考虑历史价格、天气、供需等多维因素。
+    基于循环神经网络(回声状态网络)的时间序列预测模型,用价格仓库中各作物的日收盘价训练;
+    天气、供需、政策系数作为情景调整叠加在模型预测之上。
     
     **核心技术:**
-    - LSTM神经网络
-    - 多变量时间序列建模
-    - 注意力机制
+    - 回声状态网络(NumPy实现, 储备池固定, 只训练线性输出层)
+    - 全部作物的价格面板一次推理
+    - 留出末段的样本外残差给出预测区间
     """)
     
     col1, col2 = st.columns([1, 2])
@@ -254,23 +270,14 @@ with tab2:
     with col2:
         st.subheader("📈 价格预测结果")
         
-        # 生成历史价格
+        # 价格仓库中的日收盘价面板(日期 × 作物)
+        panel = load_price_panel()
         historical_days = 180
-        dates = pd.date_range(end=datetime.now(), periods=historical_days, freq='D')
-        
-        # 模拟历史价格(带季节性) - 提高基准价格到3.5
-        np.random.seed(123)
-        t = np.arange(historical_days)
-        seasonal = 0.3 * np.sin(2 * np.pi * t / 365)
-        trend = -0.001 * t
-        noise = np.random.normal(0, 0.08, historical_days)
-        historical_prices = 3.5 + seasonal + trend + noise
         
         # 生成预测价格
-        if st.session_state.get('predict_done', False):
-            
-            with st.spinner("AI模型预测中..."):
-                time.sleep(1.5)
+        if st.session_state.get('predict_done', False) and st.session_state.crop not in panel:
+            st.warning(f"⚠️ 价格仓库中没有{st.session_state.crop}的日收盘价数据, 无法预测")
+        elif st.session_state.get('predict_done', False):
             
             # 使用保存的参数
             forecast_days_used = st.session_state.forecast_days
@@ -279,18 +286,20 @@ with tab2:
             policy_factor_used = st.session_state.policy_factor
             crop_used = st.session_state.crop
             
-            future_dates = pd.date_range(
-                start=dates[-1] + pd.Timedelta(days=1),
-                periods=forecast_days_used,
-                freq='D'
-            )
-            
-            # 考虑影响因素的预测
-            t_future = np.arange(forecast_days_used)
-            seasonal_future = 0.3 * np.sin(2 * np.pi * (historical_days + t_future) / 365)
-            trend_future = -0.001 * (historical_days + t_future)
+            # 循环网络价格模型: 权重离线训练, 每个进程只加载一次; 尚未训练时用随机游走基准
+            # 全部作物一次推理, 再取所选作物的一行
+            row = panel.columns.get_loc(crop_used)
+            price_rnn = load_price_rnn()
+            if price_rnn is not None:
+                rnn_mean, rnn_lower, rnn_upper = price_rnn.predict(panel.to_numpy().T, panel.index, forecast_days_used)
+            else:
+                st.caption("价格循环网络尚未离线训练(python -m utils.sequence_model), 当前为随机游走基准预测")
+                rnn_mean, rnn_lower, rnn_upper = random_walk_forecast(panel.to_numpy().T, forecast_days_used)
+            dates = panel.index[-historical_days:]
+            historical_prices = panel[crop_used].to_numpy()[-historical_days:]
+            future_dates = pd.date_range(start=dates[-1] + pd.Timedelta(days=1), periods=forecast_days_used, freq='D')
             
-            # 修正影响因子计算
+            # 影响因子作为情景调整叠加在统计预测上
             weather_impact = (weather_factor_used - 0.5) * 1.2
             supply_impact = (supply_factor_used - 0.5) * 1.5
             policy_impact = (policy_factor_used - 0.5) * 0.8
@@ -299,13 +308,11 @@ with tab2:
             total_impact = weather_impact + supply_impact + policy_impact
             
             # 生成预测价格
-            np.random.seed(456)
-            noise_future = np.random.normal(0, 0.12, forecast_days_used)
-            predicted_prices = 3.5 + seasonal_future + trend_future + total_impact + noise_future
+            predicted_prices = rnn_mean[row] + total_impact
             
-            # 置信区间
-            confidence_upper = predicted_prices + 0.35
-            confidence_lower = predicted_prices - 0.35
+            # 置信区间(按留出段样本外残差)
+            confidence_upper = rnn_upper[row] + total_impact
+            confidence_lower = rnn_lower[row] + total_impact
             
             # 绘制价格走势
             fig_forecast = go.Figure()
@@ -353,8 +360,7 @@ with tab2:
                 xaxis_title="日期",
                 yaxis_title="价格(元/斤)",
                 hovermode='x unified',
-                height=500,
-                yaxis=dict(range=[1.5, 4.5])
+                height=500
             )
             
             st.plotly_chart(fig_forecast, use_container_width=True)
@@ -405,42 +411,35 @@ with tab2:
     # 技术说明
     with st.expander("🔧 技术细节"):
         st.markdown("""
-        ### LSTM模型架构
+        ### 循环网络模型架构
         
         **1. 输入特征**
-        - 历史价格序列(滑动窗口: 30天)
-        - 气象数据(温度、降雨量)
-        - 供需指标(库存、产量预估)
-        - 政策因子(补贴、进出口政策)
+        - 历史价格对数收益率(最近250天推进隐状态)
+        - 年内季节特征(sin/cos)
         
         **2. 网络结构**
 ```
-        Input Layer (多变量时间序列)
-            ↓
-        LSTM Layer 1 (128 units, return_sequences=True)
+        Input Layer (收益率 + 季节特征)
             ↓
-        Dropout (0.2)
+        Recurrent Reservoir (128 units, 泄漏积分, 谱半径0.9)
             ↓
-        LSTM Layer 2 (64 units)
-            ↓
-        Dropout (0.2)
-            ↓
-        Dense Layer (32 units, ReLU)
-            ↓
-        Output Layer (1 unit, Linear)
+        Linear Readout (未来1~90天累计收益, 多步直出)
 ```
         
-        **3. 训练参数**
-        - 损失函数: MSE (均方误差)
-        - 优化器: Adam (learning_rate=0.001)
-        - Batch Size: 32
-        - Epochs: 100
+        **3. 训练方式**
+        - 离线训练, 输出层岭回归闭式求解
+        - 权重保存为 .npz, 每个进程只加载一次
+        - 推理: 所有作物、全部预测步长一次矩阵运算完成
         
-        **4. 性能指标**
-        - MAE (平均绝对误差): ¥0.15/斤
-        - RMSE (均方根误差): ¥0.21/斤
-        - R² Score: 0.87
+        **4. 预测区间**
+        - 训练时留出最后 25% 的历史, 先用其余部分拟合, 在留出段上按步长计算样本外残差标准差
+        - 再用全部历史重新拟合输出层; 留出段覆盖不到的长步长按 √k 外推
         """)
+        trained_rnn = load_price_rnn()
+        if trained_rnn is not None:
+            sd = trained_rnn.resid_sd
+            st.caption("当前模型留出段对数收益残差标准差: " + ", ".join(
+                f"{k}天 {sd[k - 1]:.1%}" for k in (1, 7, 30, 90) if k <= len(sd)))
 
 # ==================== Tab3: 自动化理赔流程 ====================
 with tab3:
@@ -506,6 +505,20 @@ with tab3:
                 st.session_state.demo_paused = not st.session_state.demo_paused
                 st.rerun()
     
+    # 有上传照片时用其 EXIF 做 GPS 核验, 否则显示演示数据
+    gps_result = "与投保地块位置吻合 ✅"
+    if 'demo_photo' in st.session_state:
+        exif_check = verify_photos(pd.DataFrame({
+            'path': [str(shared_photo_store().blob_path(st.session_state.demo_photo))],
+            'county': ['南宁-武鸣'], 'disaster_date': ['2024-11-18'], 'claim_date': ['2024-11-19'],
+        })).iloc[0]
+        if exif_check['gps_ok']:
+            gps_result = f"距投保地块 {exif_check['distance_km']:.1f}km ✅"
+        elif exif_check['gps_ok'] is None:
+            gps_result = f"{exif_check['note'].split(';')[0]} ⚠️"
+        else:
+            gps_result = f"距投保地块 {exif_check['distance_km']:.1f}km ❌"
+
     # 流程步骤定义
     steps = [
         {
@@ -536,7 +549,7 @@ with tab3:
             "data": {
                 "气象数据": "11月18日暴雨 187mm/24h ✅",
                 "卫星遥感": "检测到大面积积水区域 ✅",
-                "GPS验证": "与投保地块位置吻合 ✅",
+                "GPS验证": gps_result,
                 "历史记录": "该农户无欺诈记录 ✅"
             },
             "time": "T+4分钟"
@@ -6,6 +6,15 @@ import plotly.express as px
 from scipy.stats import norm
 from datetime import datetime, timedelta
 
+from utils.burn_cost import load_rate_table, lookup_rate, sum_insured_per_mu, SUM_INSURED_PER_MU
+from utils.claim_verification import shared_verification_service, NOT_APPLICABLE
+from utils.photo_store import shared_photo_store
+from utils.photo_hash import shared_photo_index, duplicate_note
+from utils.claim_store import shared_claim_repository, MANUAL
+from utils.weather_store import region_key
+from utils.damage_classifier import (CLASSES as DAMAGE_CLASSES, DEMO_NOTICE, MISSING_MODEL_NOTICE,
+                                     shared_damage_batcher)
+
 st.set_page_config(page_title="量化模型后台", page_icon="📊", layout="wide")
 
 # 顶部导航
@@ -737,7 +746,8 @@ with tab3:
                 st.success("### 🎉 核保通过")
                 
                 # 计算保费
-                base_rate = 0.08  # 基础费率8%
+                # 基础费率取历史燃烧成本定价结果, 未定价的地区/作物按8%
+                base_rate = lookup_rate(load_rate_table(), farm_location, crop_type_ins)
                 risk_adjustment = (100 - 综合评分) / 1000  # 风险调整
                 final_rate = base_rate + risk_adjustment
                 
@@ -819,7 +829,19 @@ with tab4:
         )
         
         if uploaded_img:
-            st.image(uploaded_img, caption="受灾现场照片", use_container_width=True)
+            photo = shared_photo_store().process_upload(uploaded_img, st.session_state, 'quant_photo_upload')
+            st.image(photo['thumbnail'], caption="受灾现场照片", use_container_width=True)
+            # 上传时只查重不登记, 提交申请后再按申请编号登记
+            photo_check = st.session_state.get('quant_photo_check')
+            if photo_check is None or photo_check['digest'] != photo['digest']:
+                phash_value, similar = shared_photo_index().find_similar(
+                    shared_photo_store().thumbnail_path(photo['digest']))
+                photo_check = {'digest': photo['digest'], 'phash': phash_value, 'similar': similar}
+                st.session_state.quant_photo_check = photo_check
+            similar = photo_check['similar']
+            if not similar.empty:
+                st.warning(f"⚠️ 该照片与 {similar['claim_id'].nunique()} 个历史理赔案件的照片高度相似"
+                           f"(汉明距离 {similar['distance'].min()}), 将转人工复核")
         else:
             # 显示示例图片占位符
             st.info("👆 请上传受灾作物照片进行AI识别")
@@ -831,136 +853,146 @@ with tab4:
         claim_farmer = st.text_input("农户姓名", value="李四")
         claim_location = st.selectbox("受灾位置", 
             ["广西钦州-灵山", "广西南宁-武鸣", "广西崇左-扶绥"])
+        claim_crop = st.selectbox("受灾作物", list(SUM_INSURED_PER_MU))
         claim_date = st.date_input("灾害发生日期", value=datetime.now())
         claim_area = st.number_input("受灾面积(亩)", min_value=1, max_value=100, value=10)
+        # 赔付按申报/查勘的受损程度计算, 图像识别只作参考
+        claim_damage = st.slider("受损程度(%)", min_value=1, max_value=100, value=50, step=1,
+                                 key="quant_claim_damage")
         
         st.divider()
         
         if uploaded_img and st.button("🚀 提交理赔申请", type="primary", use_container_width=True):
             st.session_state.claim_submitted = True
+            st.session_state.quant_claim_id = f"CL{datetime.now():%Y%m%d%H%M%S%f}"
+            st.session_state.quant_claim_note = duplicate_note(photo_check['similar'])
+            shared_photo_index().register(photo_check['phash'], photo_check['digest'],
+                                          st.session_state.quant_claim_id)
     
     with col2:
         st.subheader("🤖 AI智能审核")
         
         if 'claim_submitted' in st.session_state and st.session_state.claim_submitted and uploaded_img:
             
-            # 模拟AI识别过程
-            with st.spinner("AI正在分析照片..."):
-                import time
-                
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                steps = [
-                    ("🖼️ 图像预处理...", 0.15),
-                    ("🤖 AI模型识别中...", 0.35),
-                    ("🛰️ 调取卫星遥感数据...", 0.55),
-                    ("🌦️ 交叉验证气象数据...", 0.75),
-                    ("📊 计算赔付金额...", 0.90),
-                    ("✅ 分析完成!", 1.0)
-                ]
-                
-                for step_name, progress in steps:
-                    status_text.text(step_name)
-                    progress_bar.progress(progress)
-                    time.sleep(0.6)
+            # 进程内共享的识别模型, 并发请求合并成小批量推理
+            # 识别结果按照片缓存, 页面重跑时不再推理
+            cached = st.session_state.get('quant_recognition')
+            if cached is not None and cached[0] == photo['digest']:
+                recognition = cached[1]
+            else:
+                with st.spinner("AI正在分析照片..."):
+                    recognition = shared_damage_batcher().predict(shared_photo_store().tensor(photo['digest']))
+                if recognition is not None:
+                    st.session_state.quant_recognition = (photo['digest'], recognition)
             
-            st.success("✅ AI识别完成!")
+            if recognition is None:
+                st.warning(f"⚠️ {MISSING_MODEL_NOTICE}")
+            else:
+                st.success("✅ AI识别完成!")
             
-            st.divider()
+                st.divider()
             
-            # AI识别结果
-            st.subheader("📊 AI识别结果")
+                # AI识别结果(只作参考, 不参与赔付计算)
+                st.subheader("📊 AI识别结果" + (" (演示模型)" if recognition['synthetic'] else ""))
+                if recognition['synthetic']:
+                    st.caption(f"⚠️ {DEMO_NOTICE}")
             
-            disaster_types = ['洪涝', '干旱', '病虫害', '暴雨', '台风']
-            probabilities = np.random.dirichlet(np.ones(5)) * 100
+                disaster_types = list(DAMAGE_CLASSES)
+                probabilities = np.array([recognition['probabilities'][c] for c in disaster_types]) * 100
             
-            main_disaster = disaster_types[np.argmax(probabilities)]
-            main_prob = np.max(probabilities)
+                main_disaster = disaster_types[np.argmax(probabilities)]
+                main_prob = np.max(probabilities)
             
-            damage_level = np.random.randint(45, 85)
+                model_damage = recognition['damage_level']
             
-            col_a, col_b = st.columns(2)
+                col_a, col_b = st.columns(2)
             
-            with col_a:
-                st.success(f"### 🎯 识别结果: **{main_disaster}**")
-                st.metric("AI置信度", f"{main_prob:.1f}%")
+                with col_a:
+                    st.success(f"### 🎯 识别结果: **{main_disaster}**")
+                    st.metric("AI置信度", f"{main_prob:.1f}%")
             
-            with col_b:
-                st.error(f"### 📉 受损程度: **{damage_level}%**")
-                st.metric("评估面积", f"{claim_area}亩")
+                with col_b:
+                    st.error(f"### 📉 模型估计受损: **{model_damage}%**")
+                    st.metric("评估面积", f"{claim_area}亩")
             
-            # 各类灾害概率
-            with st.expander("📈 详细识别概率"):
-                prob_df = pd.DataFrame({
-                    '灾害类型': disaster_types,
-                    '识别概率(%)': probabilities
-                }).sort_values('识别概率(%)', ascending=False)
+                # 各类灾害概率
+                with st.expander("📈 详细识别概率"):
+                    prob_df = pd.DataFrame({
+                        '灾害类型': disaster_types,
+                        '识别概率(%)': probabilities
+                    }).sort_values('识别概率(%)', ascending=False)
                 
-                fig_prob = px.bar(
-                    prob_df,
-                    x='识别概率(%)',
-                    y='灾害类型',
-                    orientation='h',
-                    color='识别概率(%)',
-                    color_continuous_scale='Blues'
-                )
+                    fig_prob = px.bar(
+                        prob_df,
+                        x='识别概率(%)',
+                        y='灾害类型',
+                        orientation='h',
+                        color='识别概率(%)',
+                        color_continuous_scale='Blues'
+                    )
                 
-                st.plotly_chart(fig_prob, use_container_width=True)
+                    st.plotly_chart(fig_prob, use_container_width=True)
             
-            st.divider()
+                st.divider()
             
             # 卫星数据交叉验证
             st.subheader("🛰️ 卫星遥感数据交叉验证")
             
-            col_sat1, col_sat2, col_sat3 = st.columns(3)
+            verification = shared_verification_service().verify({
+                'claim_id': st.session_state.quant_claim_id,
+                'region': claim_location,
+                'event_date': str(claim_date),
+                'sale_price': None,
+                'crop': claim_crop,
+            })
             
-            with col_sat1:
-                sat_verified = np.random.choice([True, False], p=[0.92, 0.08])
-                if sat_verified:
-                    st.success("✅ 卫星影像验证通过")
-                else:
-                    st.warning("⚠️ 卫星影像待人工复核")
-                st.caption(f"灾害发生日期: {claim_date}")
-            
-            with col_sat2:
-                weather_verified = np.random.choice([True, False], p=[0.89, 0.11])
-                if weather_verified:
-                    st.success("✅ 气象数据验证通过")
-                else:
-                    st.warning("⚠️ 气象数据待人工复核")
-                st.caption(f"当日降雨: {np.random.randint(50, 150)}mm")
-            
-            with col_sat3:
-                ndvi_verified = np.random.choice([True, False], p=[0.87, 0.13])
-                if ndvi_verified:
-                    st.success("✅ NDVI指数验证通过")
-                else:
-                    st.warning("⚠️ NDVI指数待人工复核")
-                st.caption("植被健康度: 异常")
+            for col_sat, item in zip(st.columns(len(verification['results'])), verification['results']):
+                with col_sat:
+                    if item['passed'] == NOT_APPLICABLE:
+                        st.info(f"➖ {item['check']}不适用")
+                    elif item['passed']:
+                        st.success(f"✅ {item['check']}通过")
+                    elif item['passed'] is None:
+                        st.warning(f"⚠️ {item['check']}待人工复核")
+                    else:
+                        st.error(f"❌ {item['check']}未通过")
+                    st.caption(item['detail'])
             
             # 综合验证评分
-            verification_score = (sat_verified + weather_verified + ndvi_verified) / 3
+            verification_score = verification['confidence']
             
             st.divider()
             
             # 智能合约触发
             st.subheader("⚡ 区块链智能合约触发")
             
-            if verification_score >= 0.66:  # 至少2项验证通过
+            # 计算赔付金额
+            unit_amount = sum_insured_per_mu(claim_crop)  # 按作物的每亩保额
+            compensation = claim_area * unit_amount * (claim_damage / 100)
+            duplicate = st.session_state.get('quant_claim_note')
+            
+            if duplicate:
+                # 照片疑似重复使用: 不触发自动赔付, 案件带查重结果进入审核员队列
+                shared_claim_repository().insert_many(pd.DataFrame([{
+                    'claim_id': st.session_state.quant_claim_id, 'farmer': claim_farmer,
+                    'region': region_key(claim_location), 'claim_type': '天气灾害', 'amount': compensation,
+                    'submitted_at': f"{datetime.now():%Y-%m-%d %H:%M}", 'event_date': str(claim_date),
+                    'area_mu': claim_area, 'damage_pct': claim_damage, 'crop': claim_crop,
+                    'status': MANUAL, 'note': duplicate,
+                }]))
+                st.warning(f"### ⚠️ 智能合约未触发: {duplicate}")
+                st.info(f"案件 {st.session_state.quant_claim_id} 已进入保险公司端审核队列")
+            
+            elif verification_score >= 0.66:  # 适用项中至少2/3通过, 数据缺失项不得分
                 st.success("### 🎉 验证通过,触发智能合约自动理赔!")
                 
-                # 计算赔付金额
-                unit_amount = 5000  # 每亩保额
-                compensation = claim_area * unit_amount * (damage_level / 100)
-                
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.info(f"""
                     **理赔详情:**
                     - 受灾面积: {claim_area}亩
-                    - 受损程度: {damage_level}%
+                    - 受损程度: {claim_damage}%
                     - 每亩保额: ¥{unit_amount:,}
                     - 理赔金额: ¥{compensation:,.2f}
                     """)
@@ -1063,7 +1095,7 @@ st.divider()
 st.info("""
 💡 **技术说明:** 
 - 亚式期权定价采用 Kemna-Vorst 近似方法
-- AI识别基于ResNet-50卷积神经网络
+- 灾害图像识别为演示模型(合成纹理训练), 结果仅供参考, 不参与赔付计算
 - 卫星数据来自Sentinel-2遥感影像
 - 智能合约部署在以太坊测试网
 - 所有演示数据为模拟生成,仅供展示
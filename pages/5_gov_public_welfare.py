@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import base64
 from pathlib import Path
 import time
 
+from utils.subsidy import simulate_subsidy_outlay
+from utils.subsidy_allocation import SubsidyAllocator
+
 # ==================== 背景图片加载函数 ====================
 def get_base64_of_bin_file(bin_file):
     with open(bin_file, 'rb') as f:
@@ -131,6 +135,106 @@ fig.update_traces(textposition='auto')
 st.plotly_chart(fig, use_container_width=True)
 st.divider()
 
+# ==================== 下一年度补贴支出预测 ====================
+st.subheader("📈 下一年度补贴支出预测（按县分位数）")
+st.markdown("**按80%补贴分摊规则作用于模拟保单账簿（参保、保费、赔付），赔付率超过封顶线部分由财政兜底**")
+
+@st.cache_data
+def simulate_next_year_outlay(n_households, stop_loss_ratio, n_sims):
+    rng = np.random.default_rng(2026)
+    counties = ["武鸣", "灵山", "扶绥", "田阳", "宜州"]
+    households = pd.DataFrame({
+        "county": rng.choice(counties, n_households, p=[0.3, 0.2, 0.2, 0.15, 0.15]),
+        "premium": rng.uniform(200, 900, n_households),
+    })
+    households["sum_insured"] = households["premium"] / 0.06
+    county_params = pd.DataFrame({
+        "enroll_rate": [0.72, 0.65, 0.68, 0.60, 0.62],
+        "enroll_sd": [0.04, 0.05, 0.05, 0.06, 0.06],
+        "claim_freq": [0.05, 0.08, 0.06, 0.05, 0.05],
+        "cat_sd": [0.5, 0.7, 0.5, 0.4, 0.4],
+        "damage_mean": [0.35, 0.40, 0.35, 0.30, 0.30],
+        "damage_sd": [0.20, 0.20, 0.20, 0.15, 0.15],
+    }, index=counties)
+    result = simulate_subsidy_outlay(households, county_params, n_sims=n_sims,
+                                     stop_loss_ratio=stop_loss_ratio, seed=2026)
+    return result["summary"]
+
+col_sim1, col_sim2 = st.columns(2)
+with col_sim1:
+    stop_loss_ratio = st.slider("财政兜底封顶赔付率", 1.0, 3.0, 1.5, 0.1)
+with col_sim2:
+    n_sims = st.select_slider("模拟年数", options=[1000, 2000, 5000, 10000], value=5000)
+
+outlay_summary = simulate_next_year_outlay(284000, stop_loss_ratio, n_sims)
+total_outlay = outlay_summary[(outlay_summary["县域"] == "全部") & (outlay_summary["财政层级"] == "财政合计")].iloc[0]
+
+col_o1, col_o2, col_o3 = st.columns(3)
+with col_o1:
+    st.metric("预计补贴支出(P50)", f"¥{total_outlay['P50'] / 1e8:.2f}亿")
+with col_o2:
+    st.metric("预算压力(P95)", f"¥{total_outlay['P95'] / 1e8:.2f}亿")
+with col_o3:
+    st.metric("极端情景(P99)", f"¥{total_outlay['P99'] / 1e8:.2f}亿")
+
+county_outlay = outlay_summary[(outlay_summary["县域"] != "全部") & (outlay_summary["财政层级"] == "财政合计")]
+fig_outlay = px.bar(
+    county_outlay,
+    x="县域",
+    y=["P50", "P95", "P99"],
+    barmode="group",
+    title="各县补贴支出分位数（元）",
+)
+st.plotly_chart(fig_outlay, use_container_width=True)
+st.divider()
+
+# ==================== 补贴资金池分配优化 ====================
+st.subheader("🧮 补贴资金池分配优化（县×作物线性规划）")
+st.markdown("**在资金池上限内最大化加权覆盖面积，优先满足各县覆盖率目标**")
+
+if "subsidy_allocator" not in st.session_state:
+    alloc_rng = np.random.default_rng(2026)
+    alloc_counties = ["武鸣", "灵山", "扶绥", "田阳", "宜州"]
+    alloc_crops = ["沃柑", "甘蔗", "荔枝", "芒果", "火龙果"]
+    alloc_cells = pd.DataFrame(
+        [(c, k) for c in alloc_counties for k in alloc_crops], columns=["county", "crop"]
+    )
+    alloc_cells["eligible_area"] = alloc_rng.uniform(20000, 150000, len(alloc_cells)).round(-2)
+    alloc_cells["subsidy_per_mu"] = alloc_rng.uniform(20, 60, len(alloc_cells)).round(1)
+    alloc_cells["weight"] = np.where(alloc_cells["crop"] == "甘蔗", 1.5, 1.0)
+    st.session_state.subsidy_allocator = SubsidyAllocator(alloc_cells)
+
+allocator = st.session_state.subsidy_allocator
+full_need = allocator.need.sum()
+
+col_a1, col_a2 = st.columns(2)
+with col_a1:
+    pool_yi = st.slider("补贴资金池(亿元)", 0.05, round(full_need / 1e8 * 1.2, 2),
+                        round(full_need / 1e8 * 0.6, 2), 0.05)
+with col_a2:
+    coverage_target = st.slider("各县覆盖率目标", 0.2, 0.9, 0.5, 0.05)
+
+alloc_result = allocator.solve(pool_yi * 1e8, target=coverage_target)
+if alloc_result["allocation"] is None:
+    st.error(f"❌ 求解失败: {alloc_result['status']}")
+else:
+    county_alloc = alloc_result["county"]
+    missed = county_alloc[~county_alloc["达标"]]["县域"].tolist()
+    if missed:
+        st.warning(f"⚠️ 资金池不足，未达覆盖目标的县: {'、'.join(missed)}")
+    else:
+        st.success("✅ 所有县均达到覆盖率目标")
+    fig_alloc = px.bar(
+        alloc_result["allocation"],
+        x="county",
+        y="补贴金额",
+        color="crop",
+        title="各县各作物补贴分配（元）",
+    )
+    st.plotly_chart(fig_alloc, use_container_width=True)
+    st.caption(f"资金池影子价格: {alloc_result['pool_shadow_price']:.4f} 加权亩/元 | 累计求解次数: {allocator.solve_count}")
+st.divider()
+
 # ====================== 政府公益风险综合解决方案 ======================
 st.subheader("🌟 政府公益风险综合解决方案")
 st.markdown("**服务整合** · 地域灾害风险监测和预警 + 灾中智能响应 + 灾后高效理赔 + 灾害数据·保险数据融合 → 一键打包生成风险方案")
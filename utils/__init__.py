@@ -0,0 +1 @@
+"""智控农险 工具函数包(量化模型、数据处理与理赔逻辑)"""
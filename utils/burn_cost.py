@@ -0,0 +1,213 @@
+"""天气指数产品历史燃烧成本(Burn Cost)费率引擎
+
+核保页面的保费用固定 base_rate = 0.08, 理赔按每亩 ¥5,000 一刀切。本模块把
+指数产品的赔付公式回放到气象数据仓库里每个站点的每一个历史年份上:
+  - 站点 × 年份 整理成 (行, 365天) 矩阵, 各作物保障期内的指数与赔付比例
+    复用 weather_trigger.evaluate_policies 一次向量化算出(年份不逐个循环)
+  - 按县汇总为逐年损失成本序列, 计算燃烧成本、波动率、线性趋势
+  - 趋势调整后与全区均值按 √(n/30) 规则做信度加权, 加风险附加与费用率得到指示费率
+各县(地区)之间用线程池并行, 结果保存为 CSV 供页面直接读取。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.weather_store import WeatherStore
+from utils.weather_trigger import DEFAULT_INDEX_PRODUCTS, evaluate_policies
+
+DEFAULT_RATE_PATH = Path("data/rates/rate_table.csv")
+
+DEFAULT_BASE_RATE = 0.08
+
+# 每亩保额(元), 理赔与保额计算使用; 未列出的作物按 5000 元
+SUM_INSURED_PER_MU = {
+    '沃柑': 5000,
+    '荔枝': 4000,
+    '芒果': 4000,
+    '火龙果': 6000,
+    '甘蔗': 1000,
+}
+
+# 作物保障方案: (指数产品, 保障期起 月-日, 保障期止 月-日, 保额占比)
+CROP_COVERAGE = {
+    '沃柑': [('高温指数', '06-01', '09-30', 0.5), ('暴雨指数', '04-01', '09-30', 0.5)],
+    '荔枝': [('暴雨指数', '04-15', '07-15', 0.6), ('干旱指数', '02-01', '04-30', 0.4)],
+    '芒果': [('暴雨指数', '03-01', '07-31', 0.6), ('高温指数', '05-01', '07-31', 0.4)],
+    '火龙果': [('高温指数', '05-01', '10-31', 0.5), ('暴雨指数', '05-01', '10-31', 0.5)],
+    '甘蔗': [('干旱指数', '03-01', '06-30', 0.5), ('暴雨指数', '06-01', '09-30', 0.5)],
+}
+
+DAYS = 365
+
+
+def sum_insured_per_mu(crop):
+    return SUM_INSURED_PER_MU.get(crop, 5000)
+
+
+def _doy(month_day):
+    """'MM-DD' → 365天日历中的下标(0~364)"""
+    return int((pd.Timestamp(f'2001-{month_day}') - pd.Timestamp('2001-01-01')).days)
+
+
+def station_year_matrix(data, columns=('rainfall', 'temp_max'), min_days=330):
+    """WeatherStore.query 的结果 → 站点×年份 的逐日矩阵
+
+    2月29日丢弃, 每年统一为365天; 有效天数不足 min_days 的站点年份剔除,
+    其余缺测日降雨补 0、气温补该站该年均值。
+    返回 (行索引 DataFrame[station, year], {要素: (n_rows, 365) 数组})
+    """
+    date = np.asarray(data['date']).astype('datetime64[D]')
+    year = date.astype('datetime64[Y]').astype(int) + 1970
+    doy = (date - date.astype('datetime64[Y]')).astype(int)
+    leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    keep = ~(leap & (doy == 59))
+    doy = np.where(leap & (doy > 59), doy - 1, doy)[keep]
+    station, year = np.asarray(data['station'])[keep], year[keep]
+
+    keys = pd.DataFrame({'station': station, 'year': year})
+    row_codes = keys.groupby(['station', 'year'], sort=False).ngroup().to_numpy()
+    index = keys.drop_duplicates(ignore_index=True)
+
+    matrices = {}
+    valid = np.ones(len(index), dtype=bool)
+    for col in columns:
+        m = np.full((len(index), DAYS), np.nan, dtype=np.float32)
+        m[row_codes, doy] = np.asarray(data[col])[keep]
+        present = (~np.isnan(m)).sum(axis=1)
+        valid &= present >= min_days
+        if col == 'rainfall':
+            m = np.nan_to_num(m, nan=0.0)
+        else:
+            with np.errstate(invalid='ignore'):
+                fill = np.nanmean(np.where(present[:, None] > 0, m, 0.0), axis=1)
+            m = np.where(np.isnan(m), fill[:, None], m)
+        matrices[col] = m
+
+    index = index[valid].reset_index(drop=True)
+    return index, {c: m[valid] for c, m in matrices.items()}
+
+
+def station_year_loss_cost(index, weather, crops=None, products=None, coverage=None):
+    """各站点年份 × 作物 的赔付比例(单位保额的损失成本)
+
+    返回 DataFrame: station, year, crop, loss_cost
+    """
+    coverage = CROP_COVERAGE if coverage is None else coverage
+    crops = list(coverage) if crops is None else crops
+    n = len(index)
+    parts = []
+    for crop in crops:
+        for product, start, end, share in coverage[crop]:
+            parts.append(pd.DataFrame({
+                'location': np.arange(n), 'start': _doy(start), 'end': _doy(end),
+                'product': product, 'sum_insured': share, 'crop': crop,
+            }))
+    if not parts or n == 0:
+        return pd.DataFrame(columns=['station', 'year', 'crop', 'loss_cost'])
+    policies = pd.concat(parts, ignore_index=True)
+    result = evaluate_policies(weather, policies, products)
+
+    # 同一作物多个保障项目的赔付合计, 以保额为上限
+    codes, crop_names = pd.factorize(result['crop'])
+    flat = codes.astype(np.int64) * n + result['location'].to_numpy()
+    total = np.bincount(flat, weights=result['赔付金额'].to_numpy(), minlength=len(crop_names) * n)
+    out = pd.DataFrame({
+        'station': np.tile(index['station'].to_numpy(), len(crop_names)),
+        'year': np.tile(index['year'].to_numpy(), len(crop_names)),
+        'crop': np.repeat(crop_names.to_numpy(), n),
+        'loss_cost': np.minimum(total, 1.0),
+    })
+    return out
+
+
+def _rate_region(store, region, crops, products, coverage):
+    data = store.query(region, columns=['rainfall', 'temp_max'])
+    if not data or 'rainfall' not in data or 'temp_max' not in data:
+        return None
+    index, weather = station_year_matrix(data)
+    index['station'] = np.asarray(store.catalog['stations'])[index['station'].to_numpy()]
+    lc = station_year_loss_cost(index, weather, crops, products, coverage)
+    if lc.empty:
+        return None
+    # 县内各站点等权平均成逐年序列
+    annual = lc.groupby(['crop', 'year'], as_index=False)['loss_cost'].mean()
+    annual.insert(0, 'region', region)
+    return annual
+
+
+def rating_statistics(annual, target_year=None, risk_load=0.5, expense_ratio=0.2, full_credibility_years=30):
+    """逐年损失成本 → 费率表
+
+    annual: DataFrame[region, crop, year, loss_cost]
+    返回每个 (region, crop) 一行: 年数、燃烧成本、标准差、变异系数、趋势斜率、
+    趋势调整成本、信度、指示费率
+    """
+    target_year = annual['year'].max() + 1 if target_year is None else target_year
+    g = annual.groupby(['region', 'crop'])
+    n = g['loss_cost'].size()
+    mean_lc = g['loss_cost'].mean()
+    std_lc = g['loss_cost'].std(ddof=1).fillna(0.0)
+
+    # 最小二乘趋势: slope = Σ(x-x̄)(y-ȳ) / Σ(x-x̄)², 各组一次算出
+    df = annual.join(g['year'].mean().rename('year_mean'), on=['region', 'crop'])
+    df = df.join(mean_lc.rename('lc_mean'), on=['region', 'crop'])
+    dx = df['year'] - df['year_mean']
+    sxy = (dx * (df['loss_cost'] - df['lc_mean'])).groupby([df['region'], df['crop']]).sum()
+    sxx = (dx * dx).groupby([df['region'], df['crop']]).sum()
+    slope = (sxy / sxx.replace(0, np.nan)).fillna(0.0)
+    year_mean = g['year'].mean()
+    trended = (mean_lc + slope * (target_year - year_mean)).clip(lower=0.0)
+
+    # 信度: 与同作物全区平均加权
+    crop_mean = annual.groupby('crop')['loss_cost'].mean()
+    complement = crop_mean.reindex(trended.index.get_level_values('crop')).to_numpy()
+    z = np.minimum(1.0, np.sqrt(n / full_credibility_years))
+    credible = z * trended + (1 - z) * complement
+
+    rate = (credible + risk_load * std_lc) / (1 - expense_ratio)
+    table = pd.DataFrame({
+        '年数': n, '燃烧成本': mean_lc, '标准差': std_lc,
+        '变异系数': (std_lc / mean_lc.replace(0, np.nan)).fillna(0.0),
+        '趋势斜率': slope, '趋势调整成本': trended, '信度': z, '指示费率': rate,
+    })
+    return table.reset_index()
+
+
+def rate_book(store=None, regions=None, crops=None, products=None, coverage=None,
+              max_workers=4, save_path=DEFAULT_RATE_PATH, **rating_kwargs):
+    """全区重新定价: 各地区并行回放历史赔付, 返回 (费率表, 逐年损失成本)
+
+    save_path 不为 None 时把费率表写入 CSV, 页面用 load_rate_table 读取。
+    """
+    store = WeatherStore() if store is None else store
+    regions = store.regions() if regions is None else regions
+    products = DEFAULT_INDEX_PRODUCTS if products is None else products
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        parts = list(pool.map(lambda r: _rate_region(store, r, crops, products, coverage), regions))
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return pd.DataFrame(), pd.DataFrame()
+    annual = pd.concat(parts, ignore_index=True)
+    table = rating_statistics(annual, **rating_kwargs)
+    if save_path is not None:
+        save_path = Path(save_path)
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        table.to_csv(save_path, index=False)
+    return table, annual
+
+
+def load_rate_table(path=DEFAULT_RATE_PATH):
+    """读取已保存的费率表, 不存在时返回空表"""
+    path = Path(path)
+    return pd.read_csv(path) if path.exists() else pd.DataFrame()
+
+
+def lookup_rate(table, region, crop, default=DEFAULT_BASE_RATE):
+    """查 (地区, 作物) 的指示费率, 地区名可带"广西"前缀; 查不到时返回 default"""
+    if table.empty:
+        return default
+    key = str(region).replace('广西', '', 1)
+    hit = table[(table['region'].astype(str).str.replace('广西', '', n=1) == key) & (table['crop'] == crop)]
+    return float(hit['指示费率'].iloc[0]) if len(hit) else default
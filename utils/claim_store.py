@@ -0,0 +1,238 @@
+"""理赔案件持久化仓库(SQLite, WAL 模式)
+
+保险公司端每次运行都重建一个四行的 pending_claims DataFrame, 选择框的
+format_func 对每个选项过滤两次整张表(队列越长越慢, 平方复杂度)。这里把理赔
+案件存入 SQLite:
+  - WAL 日志模式: 多个审核员会话可同时读, 写入不阻塞读
+  - 索引: 申请编号(主键)、状态、地区、类型、申请时间, 以及 (状态, 申请时间) 组合索引
+  - 分页: 按 (申请时间, 申请编号) 的键集分页, 翻到很深的页也只走索引
+  - 审核写回带状态条件(仅"待审核"/"人工复核"可改), 两个审核员同时处理同一案件时只有一个成功
+  - 审核队列(REVIEW_QUEUE)同时列出待审核与自动审核转来的人工复核案件
+每个线程使用自己的连接(Streamlit 会话运行在不同线程)。
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_DB_PATH = Path("data/claims.db")
+
+PENDING, APPROVED, REJECTED, MANUAL = '待审核', '已批准', '已拒绝', '人工复核'
+
+# 审核员队列: 尚未处理的案件与自动审核转人工的案件
+REVIEW_QUEUE = (PENDING, MANUAL)
+
+# 数据库列 → 页面显示列
+DISPLAY_COLUMNS = {
+    'claim_id': '申请编号', 'farmer': '农户姓名', 'region': '地区', 'claim_type': '类型',
+    'amount': '申请金额', 'submitted_at': '申请时间', 'status': '状态',
+    'approved_amount': '批准金额', 'reviewer': '审核人', 'reviewed_at': '审核时间', 'note': '审核意见',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    claim_id        TEXT PRIMARY KEY,
+    farmer          TEXT NOT NULL,
+    region          TEXT NOT NULL,
+    claim_type      TEXT NOT NULL,
+    amount          REAL NOT NULL,
+    submitted_at    TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT '待审核',
+    approved_amount REAL,
+    reviewer        TEXT,
+    reviewed_at     TEXT,
+    note            TEXT,
+    area_mu         REAL,
+    damage_pct      REAL,
+    sale_qty        REAL,
+    sale_price      REAL,
+    insured_price   REAL,
+    event_date      TEXT,
+    crop            TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_claims_status ON claims(status);
+CREATE INDEX IF NOT EXISTS idx_claims_region ON claims(region);
+CREATE INDEX IF NOT EXISTS idx_claims_type ON claims(claim_type);
+CREATE INDEX IF NOT EXISTS idx_claims_submitted ON claims(submitted_at);
+CREATE INDEX IF NOT EXISTS idx_claims_status_submitted ON claims(status, submitted_at, claim_id);
+"""
+
+COLUMNS = ['claim_id', 'farmer', 'region', 'claim_type', 'amount', 'submitted_at', 'status',
+           'approved_amount', 'reviewer', 'reviewed_at', 'note', 'area_mu', 'damage_pct',
+           'sale_qty', 'sale_price', 'insured_price', 'event_date', 'crop']
+
+# 早期版本建的表缺少的列, 打开时补上
+ADDED_COLUMNS = {'crop': 'TEXT'}
+
+
+class ClaimRepository:
+    """理赔案件仓库"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(claims)")}
+        for col, col_type in ADDED_COLUMNS.items():
+            if col not in existing:
+                conn.execute(f"ALTER TABLE claims ADD COLUMN {col} {col_type}")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    # ==================== 写入 ====================
+
+    def insert_many(self, claims):
+        """批量新增案件(DataFrame, 列名可为数据库列或页面显示列), 一个事务写入, 返回条数"""
+        claims = claims.rename(columns={v: k for k, v in DISPLAY_COLUMNS.items()})
+        if 'status' not in claims:
+            claims = claims.assign(status=PENDING)
+        cols = [c for c in COLUMNS if c in claims]
+        rows = claims[cols].astype(object).where(claims[cols].notna(), None).itertuples(index=False, name=None)
+        sql = f"INSERT OR IGNORE INTO claims ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        with self._transaction() as conn:
+            cur = conn.executemany(sql, rows)
+        return cur.rowcount
+
+    def review(self, claim_id, status, approved_amount=None, reviewer=None, note=None):
+        """审核单个案件; 案件已被他人处理时返回 False"""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE claims SET status=?, approved_amount=?, reviewer=?, reviewed_at=?, note=? "
+                "WHERE claim_id=? AND status IN (?, ?)",
+                (status, approved_amount, reviewer, datetime.now().isoformat(timespec='seconds'), note,
+                 claim_id, PENDING, MANUAL))
+        return cur.rowcount == 1
+
+    def review_many(self, decisions, reviewer='系统自动审核'):
+        """批量写回审核结果(DataFrame: claim_id, status, approved_amount[, note]), 单个事务
+
+        只更新仍处于待审核的案件, 返回实际更新条数; 同一案件出现多次时以最后一条为准。
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        decisions = decisions.drop_duplicates('claim_id', keep='last')
+        note = decisions['note'] if 'note' in decisions else pd.Series(None, index=decisions.index)
+        rows = zip(decisions['status'], decisions['approved_amount'].astype(float), note,
+                   decisions['claim_id'])
+        with self._transaction() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS _decisions "
+                         "(claim_id TEXT PRIMARY KEY, status TEXT, approved_amount REAL, note TEXT)")
+            conn.execute("DELETE FROM _decisions")
+            conn.executemany("INSERT INTO _decisions (status, approved_amount, note, claim_id) VALUES (?, ?, ?, ?)",
+                             rows)
+            cur = conn.execute(
+                "UPDATE claims SET status=d.status, approved_amount=d.approved_amount, note=d.note, "
+                "reviewer=?, reviewed_at=? FROM _decisions d "
+                "WHERE claims.claim_id = d.claim_id AND claims.status = ?",
+                (reviewer, now, PENDING))
+            conn.execute("DELETE FROM _decisions")
+        return cur.rowcount
+
+    # ==================== 查询 ====================
+
+    @staticmethod
+    def _where(status=None, region=None, claim_type=None):
+        clauses, params = [], []
+        for col, value in (('status', status), ('region', region), ('claim_type', claim_type)):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                clauses.append(f"{col} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{col} = ?")
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def get(self, claim_id):
+        """按申请编号取单个案件(dict), 不存在返回 None"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM claims WHERE claim_id = ?", (claim_id,)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def count(self, status=None, region=None, claim_type=None):
+        where, params = self._where(status, region, claim_type)
+        return self._connection().execute(f"SELECT COUNT(*) FROM claims{where}", params).fetchone()[0]
+
+    def pending_signature(self):
+        """待审核案件集合的签名 (件数, 最大 rowid, rowid 之和): 新增或处理任一案件都会改变, 用作缓存键"""
+        return tuple(self._connection().execute(
+            "SELECT COUNT(*), MAX(rowid), TOTAL(rowid) FROM claims WHERE status = ?", (PENDING,)).fetchone())
+
+    def page(self, status=REVIEW_QUEUE, region=None, claim_type=None, limit=50, after=None, display=True):
+        """一页案件, 按 (申请时间, 申请编号) 升序
+
+        status: 单个状态或状态元组, 缺省为审核队列(待审核 + 人工复核)
+        after: 上一页最后一条的 (submitted_at, claim_id), 为 None 时取第一页
+        display: True 时列名转为页面显示的中文列名
+        """
+        where, params = self._where(status, region, claim_type)
+        if after is not None:
+            where += (' AND ' if where else ' WHERE ') + '(submitted_at, claim_id) > (?, ?)'
+            params += list(after)
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM claims{where} "
+               f"ORDER BY submitted_at, claim_id LIMIT ?")
+        rows = self._connection().execute(sql, params + [limit]).fetchall()
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        return df.rename(columns=DISPLAY_COLUMNS) if display else df
+
+    def page_by_number(self, page_no, status=REVIEW_QUEUE, region=None, claim_type=None, page_size=50, display=True):
+        """按页码取页(从 1 开始), 偏移量在覆盖索引上计算"""
+        where, params = self._where(status, region, claim_type)
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM claims{where} "
+               f"ORDER BY submitted_at, claim_id LIMIT ? OFFSET ?")
+        rows = self._connection().execute(sql, params + [page_size, (page_no - 1) * page_size]).fetchall()
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        return df.rename(columns=DISPLAY_COLUMNS) if display else df
+
+    def pending_frame(self, columns=None):
+        """全部待审核案件(批量审核用), 返回数据库列名的 DataFrame
+
+        已转人工复核的案件留给审核员, 不再参与批量自动审核。
+        """
+        cols = COLUMNS if columns is None else columns
+        rows = self._connection().execute(
+            f"SELECT {', '.join(cols)} FROM claims WHERE status = ?", (PENDING,)).fetchall()
+        return pd.DataFrame(rows, columns=cols)
+
+
+class _Transaction:
+    """连接处于自动提交模式, 写操作在 with 块内显式 BEGIN IMMEDIATE/COMMIT, 出错时回滚"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_claim_repository(path=DEFAULT_DB_PATH):
+    """进程级单例, 各审核员会话共用同一个仓库对象(连接仍按线程区分)"""
+    key = str(Path(path))
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = ClaimRepository(path)
+        return _shared[key]
@@ -0,0 +1,411 @@
+"""理赔交叉验证服务(asyncio 并发)
+
+保险公司端与量化后台的交叉验证是先 time.sleep 转圈, 再对气象、遥感、价格三项
+各调用一次 np.random.choice, 依次执行。这里:
+  - 每项验证 = 数据提供方(provider) + 判定规则(check), 提供方可替换:
+    本地仓库(WeatherStore/PriceStore)、本地文件(CSV)、HTTP 接口(测试时可指向桩服务)
+  - 一个案件的各项验证用 asyncio 并发执行, 总耗时等于最慢的一项
+  - 数据请求有超时与重试(指数退避), 只重试取数; 每个服务持有一个线程信号量,
+    限制所有会话同时进行的数据请求数; 许可在取数线程内获取和释放, 超时后
+    线程仍在读取时许可不会提前归还
+  - 数据缺失、超时或出错时该项结果为 None(待人工复核), 不当作不通过, 也不计入置信度得分
+  - 对该案件不适用的项(如天气理赔的市场价格验证)结果为 NOT_APPLICABLE, 不计入置信度
+阻塞的文件/网络读取放到线程中执行, 不阻塞事件循环。
+批量审核用 verify_frame: 案件按 地区(气象、遥感)或 作物(价格)分组, 每组只取一次
+覆盖全组日期范围的数据, 各案件窗口内的极值用逐日滚动统计一次算出。
+"""
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.weather_store import region_key
+
+DEFAULT_VERIFY_DIR = Path("data/verification")
+
+# 不适用的验证项结果
+NOT_APPLICABLE = '不适用'
+
+
+# ==================== 数据提供方 ====================
+
+class WeatherStoreProvider:
+    """本地气象仓库: query = {region, start, end} → 逐日气象
+
+    站点有坐标且县域位置已知时, 用预存的站点 → 地块反距离权重插值到县域中心;
+    否则退回地区内站点的逐日均值。
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+
+    def fetch_sync(self, query):
+        if self.store is None:
+            from utils.weather_store import WeatherStore
+            self.store = WeatherStore()
+        from utils.spatial_index import county_centroid, parcel_weather
+        region = query['region']
+        if not np.isnan(county_centroid(region)[0]):
+            parcel = pd.DataFrame({'parcel_id': [region], 'county': [region]})
+            days, values = parcel_weather(self.store, region, parcel, query['start'], query['end'])
+            if days is not None:
+                return pd.DataFrame({'date': pd.to_datetime(days), **{c: v[0] for c, v in values.items()}})
+        return self.store.daily_region_mean(region, query['start'], query['end'])
+
+    async def fetch(self, query):
+        return await asyncio.to_thread(self.fetch_sync, query)
+
+
+class PriceStoreProvider:
+    """本地价格仓库: query = {crop, start, end} → 日收盘价"""
+
+    def __init__(self, store=None, market='现货'):
+        self.store = store
+        self.market = market
+
+    def fetch_sync(self, query):
+        if self.store is None:
+            from utils.price_store import PriceStore
+            self.store = PriceStore()
+        return self.store.daily_close(query['crop'], self.market, query['start'], query['end'])
+
+    async def fetch(self, query):
+        return await asyncio.to_thread(self.fetch_sync, query)
+
+
+class LocalFileProvider:
+    """本地 CSV: 含 date 列及 query 中的其他键列(如 region), 文件变化后重新读取"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._cache = (None, pd.DataFrame())
+
+    def fetch_sync(self, query):
+        if not self.path.exists():
+            return pd.DataFrame()
+        mtime = self.path.stat().st_mtime
+        if self._cache[0] != mtime:
+            df = pd.read_csv(self.path, parse_dates=['date'])
+            self._cache = (mtime, df)
+        df = self._cache[1]
+        mask = (df['date'] >= pd.Timestamp(query['start'])) & (df['date'] <= pd.Timestamp(query['end']))
+        for k, v in query.items():
+            if k not in ('start', 'end') and k in df:
+                mask &= df[k] == v
+        return df[mask]
+
+    async def fetch(self, query):
+        return await asyncio.to_thread(self.fetch_sync, query)
+
+
+class HttpProvider:
+    """HTTP JSON 接口: GET base_url?query, 返回记录列表(JSON 数组)"""
+
+    def __init__(self, base_url, timeout=5.0):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def fetch_sync(self, query):
+        params = urllib.parse.urlencode({k: str(v) for k, v in query.items()})
+        with urllib.request.urlopen(f"{self.base_url}?{params}", timeout=self.timeout) as resp:
+            records = json.loads(resp.read().decode('utf-8'))
+        df = pd.DataFrame(records)
+        if 'date' in df:
+            df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    async def fetch(self, query):
+        return await asyncio.to_thread(self.fetch_sync, query)
+
+
+# ==================== 判定规则 ====================
+
+def _event_days(claims):
+    return pd.to_datetime(claims['event_date'], errors='coerce').to_numpy().astype('datetime64[D]')
+
+
+def _window_agg(dates, values, events, before, after, how):
+    """每个事件日 d 在 [d - before, d + after] 内 values 的最大/最小值(how='max'/'min'), 无数据为 NaN"""
+    s = pd.Series(np.asarray(values, dtype=float), index=pd.DatetimeIndex(dates)).dropna()
+    if s.empty:
+        return np.full(len(events), np.nan)
+    daily = getattr(s.groupby(level=0), how)()
+    calendar = pd.date_range(events.min() - np.timedelta64(before, 'D'),
+                             events.max() + np.timedelta64(after, 'D'), freq='D')
+    rolled = getattr(daily.reindex(calendar).rolling(before + after + 1, min_periods=1), how)()
+    return rolled.to_numpy()[calendar.get_indexer(events + np.timedelta64(after, 'D'))]
+
+
+def _groups(keys, valid):
+    """有效行按键分组: {键: 行号数组}"""
+    rows = np.flatnonzero(valid)
+    k = pd.Series(np.asarray(keys, dtype=object)[rows])
+    return {key: rows[pos] for key, pos in k.groupby(k).indices.items()}
+
+
+def _results(passed, known):
+    """(通过, 有数据) → 结果数组: True/False, 无数据为 None"""
+    return np.where(known, passed.astype(object), None)
+
+
+class WeatherCheck:
+    """灾害日前后 window 天内地区日降雨最大值 ≥ 暴雨阈值, 或日最高温 ≥ 高温阈值"""
+    name = '气象数据验证'
+
+    def __init__(self, provider, window=3, rain_mm=50.0, heat_c=37.0):
+        self.provider, self.window, self.rain_mm, self.heat_c = provider, window, rain_mm, heat_c
+
+    def query(self, claim):
+        day = pd.Timestamp(claim['event_date'])
+        return {'region': region_key(claim['region']), 'start': day - pd.Timedelta(days=self.window),
+                'end': day + pd.Timedelta(days=self.window)}
+
+    def judge(self, claim, df):
+        if df.empty:
+            return None, '无气象数据'
+        rain = float(df['rainfall'].max()) if 'rainfall' in df else np.nan
+        heat = float(df['temp_max'].max()) if 'temp_max' in df else np.nan
+        passed = bool(rain >= self.rain_mm or heat >= self.heat_c)
+        return passed, f"最大日降雨 {rain:.0f}mm, 最高温 {heat:.1f}℃"
+
+    def judge_many(self, claims, fetch):
+        """批量判定: 每个地区取一次数据, 返回结果数组(True/False/None)"""
+        events = _event_days(claims)
+        out = np.full(len(claims), None, dtype=object)
+        for region, idx in _groups(claims['region'].map(region_key), ~np.isnat(events)).items():
+            ev = events[idx]
+            df = fetch(self, {'region': region, 'start': pd.Timestamp(ev.min()) - pd.Timedelta(days=self.window),
+                              'end': pd.Timestamp(ev.max()) + pd.Timedelta(days=self.window)})
+            if df is None or df.empty:
+                continue
+            nan = np.full(len(ev), np.nan)
+            rain = _window_agg(df['date'], df['rainfall'], ev, self.window, self.window, 'max') \
+                if 'rainfall' in df else nan
+            heat = _window_agg(df['date'], df['temp_max'], ev, self.window, self.window, 'max') \
+                if 'temp_max' in df else nan
+            out[idx] = _results((rain >= self.rain_mm) | (heat >= self.heat_c), ~(np.isnan(rain) & np.isnan(heat)))
+        return out
+
+
+class RemoteSensingCheck:
+    """灾害日之后 window 天内 NDVI 距平 ≤ 阈值(植被明显受损)"""
+    name = '遥感影像验证'
+
+    def __init__(self, provider, window=15, ndvi_drop=-0.1):
+        self.provider, self.window, self.ndvi_drop = provider, window, ndvi_drop
+
+    def query(self, claim):
+        day = pd.Timestamp(claim['event_date'])
+        return {'region': region_key(claim['region']), 'start': day, 'end': day + pd.Timedelta(days=self.window)}
+
+    def judge(self, claim, df):
+        if df.empty or 'ndvi_anomaly' not in df:
+            return None, '无遥感数据'
+        anomaly = float(df['ndvi_anomaly'].min())
+        return bool(anomaly <= self.ndvi_drop), f"NDVI距平 {anomaly:+.2f}"
+
+    def judge_many(self, claims, fetch):
+        """批量判定: 每个地区取一次数据, 返回结果数组(True/False/None)"""
+        events = _event_days(claims)
+        out = np.full(len(claims), None, dtype=object)
+        for region, idx in _groups(claims['region'].map(region_key), ~np.isnat(events)).items():
+            ev = events[idx]
+            df = fetch(self, {'region': region, 'start': pd.Timestamp(ev.min()),
+                              'end': pd.Timestamp(ev.max()) + pd.Timedelta(days=self.window)})
+            if df is None or df.empty or 'ndvi_anomaly' not in df:
+                continue
+            anomaly = _window_agg(df['date'], df['ndvi_anomaly'], ev, 0, self.window, 'min')
+            out[idx] = _results(anomaly <= self.ndvi_drop, ~np.isnan(anomaly))
+        return out
+
+
+class MarketPriceCheck:
+    """申报的销售价格与销售日前后 window 天的市场收盘价区间相差不超过 tolerance"""
+    name = '市场价格验证'
+
+    def __init__(self, provider, window=3, tolerance=0.1):
+        self.provider, self.window, self.tolerance = provider, window, tolerance
+
+    def query(self, claim):
+        """非价格理赔或未登记作物时不取数(返回 None)"""
+        if _missing(claim.get('sale_price')) or _missing(claim.get('crop')):
+            return None
+        day = pd.Timestamp(claim['event_date'])
+        return {'crop': claim['crop'], 'start': day - pd.Timedelta(days=self.window),
+                'end': day + pd.Timedelta(days=self.window)}
+
+    def judge(self, claim, df):
+        if _missing(claim.get('sale_price')):
+            return NOT_APPLICABLE, '非价格理赔, 不适用'
+        if _missing(claim.get('crop')):
+            return None, '未登记作物, 无法比对市场价'
+        if df.empty:
+            return None, '无市场价格数据'
+        low, high = float(df['price'].min()), float(df['price'].max())
+        sale = float(claim['sale_price'])
+        passed = low * (1 - self.tolerance) <= sale <= high * (1 + self.tolerance)
+        return bool(passed), f"市场价 ¥{low:.2f}~{high:.2f}/斤, 申报 ¥{sale:.2f}/斤"
+
+    def judge_many(self, claims, fetch):
+        """批量判定: 每个作物取一次数据; 非价格理赔为 NOT_APPLICABLE, 未登记作物或无数据为 None"""
+        events = _event_days(claims)
+        sale = pd.to_numeric(claims['sale_price'], errors='coerce').to_numpy(dtype=float)
+        crop = claims['crop'] if 'crop' in claims else pd.Series(None, index=claims.index, dtype=object)
+        out = np.where(np.isnan(sale), NOT_APPLICABLE, None).astype(object)
+        valid = ~np.isnan(sale) & crop.notna().to_numpy() & ~np.isnat(events)
+        for name, idx in _groups(crop, valid).items():
+            ev = events[idx]
+            df = fetch(self, {'crop': name, 'start': pd.Timestamp(ev.min()) - pd.Timedelta(days=self.window),
+                              'end': pd.Timestamp(ev.max()) + pd.Timedelta(days=self.window)})
+            if df is None or df.empty:
+                continue
+            low = _window_agg(df['date'], df['price'], ev, self.window, self.window, 'min')
+            high = _window_agg(df['date'], df['price'], ev, self.window, self.window, 'max')
+            passed = (low * (1 - self.tolerance) <= sale[idx]) & (sale[idx] <= high * (1 + self.tolerance))
+            out[idx] = _results(passed, ~np.isnan(low))
+        return out
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def default_checks(verify_dir=DEFAULT_VERIFY_DIR):
+    """气象读本地气象仓库, 遥感读 data/verification/ndvi.csv, 价格读本地价格仓库"""
+    return [
+        WeatherCheck(WeatherStoreProvider()),
+        RemoteSensingCheck(LocalFileProvider(Path(verify_dir) / 'ndvi.csv')),
+        MarketPriceCheck(PriceStoreProvider()),
+    ]
+
+
+# ==================== 验证服务 ====================
+
+class VerificationService:
+    """并发执行各项验证
+
+    timeout: 单次数据请求超时(秒); retries: 取数失败后重试次数;
+    max_concurrency: 本服务(所有会话、所有调用合计)同时进行的请求上限
+    """
+
+    def __init__(self, checks=None, timeout=3.0, retries=2, backoff=0.2, max_concurrency=16):
+        self.checks = default_checks() if checks is None else checks
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        # 每次 verify 都在新的事件循环里运行, 跨循环共享的限流只能用线程信号量
+        self._limiter = threading.BoundedSemaphore(max_concurrency)
+
+    def _fetch_blocking(self, provider, query):
+        """在取数线程内持有许可: wait_for 超时只取消等待方, 线程读完才归还许可"""
+        if not self._limiter.acquire(timeout=self.timeout):
+            raise TimeoutError('等待取数许可超时')
+        try:
+            return provider.fetch_sync(query)
+        finally:
+            self._limiter.release()
+
+    async def _fetch(self, check, query):
+        provider = check.provider
+        if hasattr(provider, 'fetch_sync'):
+            return await asyncio.wait_for(asyncio.to_thread(self._fetch_blocking, provider, query), self.timeout)
+        # 纯异步的提供方没有后台线程, 取消即停止, 在事件循环中持有许可即可
+        while not self._limiter.acquire(blocking=False):
+            await asyncio.sleep(0.005)
+        try:
+            return await asyncio.wait_for(provider.fetch(query), self.timeout)
+        finally:
+            self._limiter.release()
+
+    async def _run_check(self, check, claim):
+        start = time.perf_counter()
+        query = check.query(claim)
+        df, error, attempt = pd.DataFrame(), None, 0
+        if query is not None:
+            for attempt in range(1, self.retries + 2):
+                try:
+                    df = await self._fetch(check, query)
+                    error = None
+                    break
+                except Exception as exc:  # 超时或数据源错误, 退避后重试
+                    error = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+                    if attempt <= self.retries:
+                        await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        if error is not None:
+            passed, detail = None, f"数据源不可用({error})"
+        else:
+            try:
+                passed, detail = check.judge(claim, df)
+            except Exception as exc:  # 判定规则出错不重试取数
+                passed, detail = None, f"判定出错({type(exc).__name__}: {exc})"
+        return {'check': check.name, 'passed': passed, 'detail': detail, 'attempts': attempt,
+                'latency_ms': (time.perf_counter() - start) * 1000}
+
+    def _fetch_with_retry(self, check, query):
+        """同步取数(批量判定用), 失败时退避重试, 仍失败返回 None(该组待人工复核)"""
+        for attempt in range(1, self.retries + 2):
+            try:
+                return self._fetch_blocking(check.provider, query)
+            except Exception:  # 超时或数据源错误, 退避后重试
+                if attempt <= self.retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+        return None
+
+    def verify_frame(self, claims):
+        """批量验证 DataFrame(列 claim_id, region, event_date, crop, sale_price)
+
+        各项验证按地区/作物分组取数, 返回 DataFrame: claim_id, 各验证项结果, confidence
+        """
+        claims = claims.reset_index(drop=True)
+        out = pd.DataFrame({'claim_id': claims['claim_id']})
+        for check in self.checks:
+            out[check.name] = check.judge_many(claims, self._fetch_with_retry)
+        results = out[[c.name for c in self.checks]].to_numpy(dtype=object)
+        applicable = (results != NOT_APPLICABLE).sum(axis=1)
+        passed = (results == True).sum(axis=1)  # noqa: E712  逐元素比较, None/不适用 均不等于 True
+        out['confidence'] = np.divide(passed, applicable, out=np.zeros(len(out)), where=applicable > 0)
+        return out
+
+    async def verify_async(self, claim):
+        results = await asyncio.gather(*(self._run_check(c, claim) for c in self.checks))
+        return {'claim_id': claim.get('claim_id'), 'results': list(results),
+                'confidence': confidence(results)}
+
+    async def verify_many_async(self, claims):
+        return await asyncio.gather(*(self.verify_async(c) for c in claims))
+
+    def verify(self, claim):
+        """同步入口(页面脚本中调用)"""
+        return asyncio.run(self.verify_async(claim))
+
+    def verify_many(self, claims):
+        return asyncio.run(self.verify_many_async(claims))
+
+
+def confidence(results):
+    """适用项中的通过占比; 不适用项不计入分母, 待人工复核(None)不得分
+
+    数据缺失时置信度只会降低, 不会凭缺失达到自动赔付阈值。
+    """
+    applicable = [r['passed'] for r in results if r['passed'] != NOT_APPLICABLE]
+    if not applicable:
+        return 0.0
+    return sum(p is True for p in applicable) / len(applicable)
+
+
+_shared = None
+
+
+def shared_verification_service():
+    """进程级单例, 各会话共用提供方的数据缓存"""
+    global _shared
+    if _shared is None:
+        _shared = VerificationService()
+    return _shared
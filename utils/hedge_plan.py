@@ -0,0 +1,197 @@
+"""风险管理公司期货对冲方案: 最小方差对冲比例 + 合约展期成本
+
+量化模型后台 Tab1 中, 风险管理公司在期货市场对冲卖出的亚式看跌期权。
+这里按滚动窗口从历史 现货/期货 收益率估计最小方差对冲比例, 并按合约月份
+生成展期计划、模拟展期成本。所有计算对 作物 × 窗口 × 路径 向量化,
+数据更新后可在秒级重算整套对冲方案。
+"""
+import numpy as np
+import pandas as pd
+
+
+def rolling_hedge_ratios(spot, futures, windows, use_log=True):
+    """滚动窗口最小方差对冲比例 h* = Cov(ΔS, ΔF) / Var(ΔF)
+
+    spot, futures: 价格数组, 形状 (n_crops, n_days) 或 (n_days,)
+    windows: 窗口长度(交易日)列表
+    返回 (ratios, hedge_r2), 形状均为 (n_crops, n_windows, n_days - 1),
+    窗口未填满的位置为 NaN; hedge_r2 为对应窗口的对冲有效性(相关系数平方)。
+    """
+    spot = np.atleast_2d(np.asarray(spot, dtype=float))
+    futures = np.atleast_2d(np.asarray(futures, dtype=float))
+    windows = np.atleast_1d(np.asarray(windows, dtype=int))
+
+    if use_log:
+        ds = np.diff(np.log(spot), axis=1)
+        df = np.diff(np.log(futures), axis=1)
+    else:
+        ds = np.diff(spot, axis=1)
+        df = np.diff(futures, axis=1)
+    n_crops, n_ret = ds.shape
+
+    # 前缀和: 任意窗口的矩统计都能 O(1) 得到, 所有窗口共用一份
+    def prefix(x):
+        out = np.zeros((n_crops, n_ret + 1))
+        np.cumsum(x, axis=1, out=out[:, 1:])
+        return out
+
+    c_s, c_f = prefix(ds), prefix(df)
+    c_sf, c_ff, c_ss = prefix(ds * df), prefix(df * df), prefix(ds * ds)
+
+    ratios = np.full((n_crops, len(windows), n_ret), np.nan)
+    hedge_r2 = np.full_like(ratios, np.nan)
+    for j, w in enumerate(windows):
+        if w < 2 or w > n_ret:
+            continue
+        end = np.arange(w, n_ret + 1)
+
+        def window_sum(c):
+            return c[:, end] - c[:, end - w]
+
+        mean_s, mean_f = window_sum(c_s) / w, window_sum(c_f) / w
+        cov_sf = window_sum(c_sf) / w - mean_s * mean_f
+        var_f = window_sum(c_ff) / w - mean_f**2
+        var_s = window_sum(c_ss) / w - mean_s**2
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios[:, j, w - 1:] = np.where(var_f > 0, cov_sf / var_f, np.nan)
+            hedge_r2[:, j, w - 1:] = np.where((var_f > 0) & (var_s > 0),
+                                             cov_sf**2 / (var_f * var_s), np.nan)
+    return ratios, hedge_r2
+
+
+def build_roll_schedule(start, end, contract_months, roll_days_before=15, expiry_day=15):
+    """按合约月份生成展期计划
+
+    contract_months: 可交易合约月份, 如白糖 [1, 3, 5, 7, 9, 11]
+    每次持有最近的、到期日晚于(当前日期 + roll_days_before)的合约,
+    在到期前 roll_days_before 天换到下一个合约。
+    返回 DataFrame: 持有合约, 开始日期, 展期日期
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    months = sorted(contract_months)
+
+    expiries = []
+    for year in range(start.year, end.year + 2):
+        for m in months:
+            expiries.append(pd.Timestamp(year=year, month=m, day=expiry_day))
+
+    rows = []
+    current = start
+    for expiry in expiries:
+        roll_date = expiry - pd.Timedelta(days=roll_days_before)
+        if roll_date <= current:
+            continue
+        rows.append({
+            '持有合约': expiry.strftime('%y%m'),
+            '开始日期': current,
+            '展期日期': min(roll_date, end),
+            '合约到期': expiry,
+        })
+        if roll_date >= end:
+            break
+        current = roll_date
+    return pd.DataFrame(rows)
+
+
+def simulate_roll_costs(
+    F0,
+    sigma,
+    carry,
+    schedule,
+    hedge_ratio,
+    quantity,
+    spread_vol=0.02,
+    fee_rate=0.0003,
+    side=-1,
+    n_paths=5000,
+    seed=None,
+):
+    """多作物展期成本蒙特卡洛
+
+    F0, sigma, carry, hedge_ratio, quantity: 每个作物一个值的数组(长度 n_crops),
+        carry 为年化持有成本(远月相对近月的升水率), quantity 为承保数量(吨)
+    schedule: build_roll_schedule 的结果(各作物共用同一合约月份)
+    spread_vol: 月间价差的年化波动率(相对价格)
+    fee_rate: 单边手续费率, 每次展期平近开远共两次
+    side: 期货头寸方向, 1 为多头, -1 为空头(默认; 保险公司为卖出的看跌期权对冲持有空头)
+
+    每次展期成本 = 头寸 × (方向 × (远月 - 近月价差) + 双边手续费)
+    升水(contango)时多头展期为成本, 空头展期为收益(成本为负); 手续费总是成本
+    返回 dict:
+        roll_costs: (n_crops, n_paths, n_rolls) 每次展期成本(元)
+        total_cost: (n_crops, n_paths) 对冲期内累计展期成本
+        summary: DataFrame, 每个作物的成本均值与分位数
+    """
+    rng = np.random.default_rng(seed)
+    F0, sigma, carry = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (F0, sigma, carry))
+    hedge_ratio = np.atleast_1d(np.asarray(hedge_ratio, dtype=float))
+    quantity = np.atleast_1d(np.asarray(quantity, dtype=float))
+    n_crops = len(F0)
+
+    # 只有最后一段之前的换月才产生展期
+    rolls = schedule.iloc[:-1]
+    n_rolls = len(rolls)
+    if n_rolls == 0:
+        empty = np.zeros((n_crops, n_paths, 0))
+        return {'roll_costs': empty, 'total_cost': np.zeros((n_crops, n_paths)),
+                'summary': pd.DataFrame({'作物序号': np.arange(n_crops), '期望展期成本': 0.0})}
+
+    start = schedule['开始日期'].iloc[0]
+    t_roll = ((rolls['展期日期'] - start).dt.days.to_numpy() / 365.0)
+    # 相邻合约到期间隔(年)
+    gap = ((schedule['合约到期'].iloc[1:].to_numpy() - schedule['合约到期'].iloc[:-1].to_numpy())
+           / np.timedelta64(1, 'D') / 365.0)
+
+    # 近月价格在各展期时点的 GBM 取值, (n_crops, n_paths, n_rolls)
+    dt = np.diff(np.concatenate([[0.0], t_roll]))
+    z = rng.standard_normal((n_crops, n_paths, n_rolls))
+    log_inc = (-0.5 * sigma[:, None, None]**2 * dt[None, None, :]
+               + sigma[:, None, None] * np.sqrt(dt)[None, None, :] * z)
+    F_roll = F0[:, None, None] * np.exp(np.cumsum(log_inc, axis=2))
+
+    spread_noise = rng.standard_normal((n_crops, n_paths, n_rolls))
+    spread = F_roll * (np.expm1(carry[:, None, None] * gap[None, None, :])
+                       + spread_vol * np.sqrt(gap)[None, None, :] * spread_noise)
+    fees = 2 * fee_rate * F_roll
+
+    position = (hedge_ratio * quantity * 1000)[:, None, None]
+    roll_costs = position * (side * spread + fees)
+    total_cost = roll_costs.sum(axis=2)
+
+    summary = pd.DataFrame({
+        '作物序号': np.arange(n_crops),
+        '展期次数': n_rolls,
+        '期望展期成本': total_cost.mean(axis=1),
+        '成本标准差': total_cost.std(axis=1),
+        '成本P5': np.percentile(total_cost, 5, axis=1),
+        '成本P95': np.percentile(total_cost, 95, axis=1),
+    })
+    return {'roll_costs': roll_costs, 'total_cost': total_cost, 'summary': summary}
+
+
+def hedge_plan(crops, spot, futures, windows, F0, sigma, carry, quantity, schedule, **roll_kwargs):
+    """整套对冲方案: 各作物取对冲有效性最高窗口的最新对冲比例, 驱动展期成本模拟
+
+    crops: 作物名称列表, 与 spot/futures 第0维对应
+    返回 DataFrame, 每个作物一行: 各窗口最新对冲比例、采用比例与展期成本统计
+    """
+    ratios, hedge_r2 = rolling_hedge_ratios(spot, futures, windows)
+    latest = ratios[:, :, -1]
+    latest_r2 = hedge_r2[:, :, -1]
+
+    # 采用对冲有效性最高的窗口
+    best = np.nanargmax(np.where(np.isnan(latest_r2), -np.inf, latest_r2), axis=1)
+    chosen = np.nan_to_num(latest[np.arange(len(crops)), best], nan=1.0)
+
+    roll = simulate_roll_costs(F0, sigma, carry, schedule, chosen, quantity, **roll_kwargs)
+
+    plan = pd.DataFrame({'作物': crops})
+    for j, w in enumerate(np.atleast_1d(windows)):
+        plan[f'{w}日窗口对冲比例'] = latest[:, j]
+    plan['采用窗口'] = np.atleast_1d(windows)[best]
+    plan['采用对冲比例'] = chosen
+    plan['对冲有效性R²'] = latest_r2[np.arange(len(crops)), best]
+    plan['期望展期成本'] = roll['summary']['期望展期成本'].to_numpy()
+    plan['展期成本P95'] = roll['summary']['成本P95'].to_numpy()
+    return plan
@@ -0,0 +1,123 @@
+"""理赔照片 EXIF 元数据核验(GPS 位置与拍摄时间)
+
+AI演示页的理赔流程列出"GPS验证: 与投保地块位置吻合", 但没有任何代码读取照片
+元数据。这里只读 EXIF 头, 不解码像素:
+  - Pillow 打开图片是惰性的, getexif() 只解析文件头中的 TIFF/EXIF 目录, 取出
+    GPS 经纬度(度分秒 → 十进制)与拍摄时间(DateTimeOriginal, 缺失时用 DateTime)
+  - 批量读取用线程池(以文件 I/O 为主), 每秒可处理数千张
+  - 核验全部为数组运算: 照片位置与投保地块的大圆距离, 拍摄时间是否落在
+    [灾害日期 - 容差, 理赔申请日期 + 容差] 之内
+地块有精确坐标时按 max_km 判定; 只有县名时按县域中心和 county_km 宽松判定。
+照片没有 GPS 或拍摄时间、或投保地块位置未知时, 对应项结果为 None(待人工复核),
+备注分别说明原因。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from utils.spatial_index import EARTH_RADIUS_KM, county_centroid
+
+GPS_IFD = 0x8825
+EXIF_IFD = 0x8769
+TAG_DATETIME = 306
+TAG_DATETIME_ORIGINAL = 36867
+
+
+def _dms_to_degrees(dms, ref):
+    try:
+        deg = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+    except (TypeError, IndexError, ZeroDivisionError, ValueError):
+        return np.nan
+    return -deg if ref in ('S', 'W', b'S', b'W') else deg
+
+
+def _parse_time(value):
+    if not value:
+        return pd.NaT
+    value = value.decode() if isinstance(value, bytes) else str(value)
+    try:
+        return pd.Timestamp(datetime.strptime(value.strip('\x00 ')[:19], '%Y:%m:%d %H:%M:%S'))
+    except ValueError:
+        return pd.NaT
+
+
+def read_exif(path):
+    """读取单张照片的 GPS 与拍摄时间, 返回 dict: lat, lon, taken_at"""
+    try:
+        with Image.open(path) as img:
+            exif = img.getexif()
+            gps = exif.get_ifd(GPS_IFD)
+            taken = exif.get_ifd(EXIF_IFD).get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME)
+    except (OSError, SyntaxError, ValueError):
+        return {'lat': np.nan, 'lon': np.nan, 'taken_at': pd.NaT}
+    # GPS 目录: 1/2 纬度参考/纬度, 3/4 经度参考/经度
+    lat = _dms_to_degrees(gps.get(2), gps.get(1)) if gps else np.nan
+    lon = _dms_to_degrees(gps.get(4), gps.get(3)) if gps else np.nan
+    return {'lat': lat, 'lon': lon, 'taken_at': _parse_time(taken)}
+
+
+def read_exif_batch(paths, max_workers=8):
+    """批量读取, 返回 DataFrame: path, lat, lon, taken_at(与 paths 顺序一致)"""
+    paths = [str(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        records = list(pool.map(read_exif, paths))
+    df = pd.DataFrame(records, index=range(len(paths)))
+    df.insert(0, 'path', paths)
+    df['taken_at'] = pd.to_datetime(df['taken_at'])
+    return df
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def verify_photos(photos, max_km=2.0, county_km=40.0, days_before=1, days_after=1, max_workers=8):
+    """批量核验照片
+
+    photos: DataFrame, 列 path, disaster_date, claim_date, 地块位置 lat/lon 或 county(县名)
+    返回原表加列: photo_lat, photo_lon, taken_at, distance_km, gps_ok, time_ok, note
+    """
+    meta = read_exif_batch(photos['path'], max_workers)
+    out = photos.reset_index(drop=True).copy()
+    out['photo_lat'], out['photo_lon'], out['taken_at'] = meta['lat'], meta['lon'], meta['taken_at']
+
+    n = len(out)
+    lat = np.array(out['lat'], dtype=float) if 'lat' in out else np.full(n, np.nan)
+    lon = np.array(out['lon'], dtype=float) if 'lon' in out else np.full(n, np.nan)
+    exact = ~(np.isnan(lat) | np.isnan(lon))
+    if (~exact).any() and 'county' in out:
+        centroids = out.loc[~exact, 'county'].map(county_centroid)
+        lat[~exact] = [c[0] for c in centroids]
+        lon[~exact] = [c[1] for c in centroids]
+
+    dist = haversine_km(meta['lat'], meta['lon'], lat, lon)
+    limit = np.where(exact, max_km, county_km)
+    has_gps = ~(np.isnan(meta['lat'].to_numpy(dtype=float)) | np.isnan(meta['lon'].to_numpy(dtype=float)))
+    parcel_known = ~(np.isnan(lat) | np.isnan(lon))
+    comparable = has_gps & parcel_known
+    gps_ok = [bool(ok) if known else None for ok, known in zip(dist <= limit, comparable)]
+
+    taken = out['taken_at']
+    lo = pd.to_datetime(out['disaster_date']) - pd.Timedelta(days=days_before)
+    hi = pd.to_datetime(out['claim_date']) + pd.Timedelta(days=days_after)
+    has_time = taken.notna().to_numpy()
+    in_window = ((taken >= lo) & (taken < hi + pd.Timedelta(days=1))).to_numpy()
+    time_ok = [bool(ok) if known else None for ok, known in zip(in_window, has_time)]
+
+    note = np.full(n, '', dtype=object)
+    note[~has_gps] += '无GPS信息;'
+    note[has_gps & ~parcel_known] += '投保地块位置未知;'
+    note[comparable & (dist > limit)] += '拍摄位置与投保地块不符;'
+    note[~has_time] += '无拍摄时间;'
+    note[has_time & ~in_window] += '拍摄时间不在灾害期间;'
+
+    out['distance_km'] = np.round(dist, 2)
+    out['gps_ok'] = gps_ok
+    out['time_ok'] = time_ok
+    out['note'] = note
+    return out
@@ -0,0 +1,197 @@
+"""理赔照片感知哈希与近重复检索
+
+"AI风控 防范虚假理赔风险"目前没有任何查重: 同一张灾害照片换个农户、换个年份
+再报一次无法发现。这里:
+  - 每张照片计算 64 位感知哈希: pHash(32×32 灰度图 DCT 低频 8×8 与中位数比较)
+    与 dHash(9×8 灰度图相邻像素比较); 压缩、缩放、轻微调色后汉明距离仍很小
+  - 多索引哈希(multi-index hashing): 64 位切成 4 段 16 位, 每段各建一个有序表;
+    汉明距离 ≤ r 的两个哈希至少有一段距离 ≤ r // 4, 只需在各段有序表里二分查找
+    该段的邻近取值, 得到少量候选后再用整段异或 + popcount 精确过滤
+  - 新增记录先进入小的增量缓冲区(暴力比对), 超过阈值再并入有序表
+上传时只查询(find_similar), 理赔正式提交后才用申请编号登记(register), 放弃的
+草稿不会进入索引。记录以追加方式写入 data/photos/phash.log, 进程内只加载一次。
+"""
+import itertools
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from scipy.fft import dctn
+
+DEFAULT_INDEX_PATH = Path("data/photos/phash.log")
+
+N_CHUNKS = 4
+CHUNK_BITS = 16
+DUPLICATE_DISTANCE = 10       # pHash 汉明距离 ≤ 10 视为近重复
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(x):
+        return np.bitwise_count(x)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(x):
+        x = np.ascontiguousarray(x, dtype=np.uint64)
+        return _BYTE_COUNTS[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+def _bits_to_int(bits):
+    return int(np.packbits(bits.astype(np.uint8).ravel()).view('>u8')[0])
+
+
+def _gray(source, size):
+    """路径或 PIL 图片 → size 灰度数组; JPEG 用 draft 模式小尺寸解码"""
+    if not isinstance(source, Image.Image):
+        with Image.open(source) as img:
+            img.draft('L', (size[0] * 4, size[1] * 4))
+            return _gray(img.convert('L'), size)
+    return np.asarray(source.convert('L').resize(size, Image.Resampling.BILINEAR), dtype=np.float32)
+
+
+def phash(source):
+    """64 位 pHash"""
+    coeffs = dctn(_gray(source, (32, 32)), norm='ortho')[:8, :8].ravel()
+    return _bits_to_int(coeffs > np.median(coeffs[1:]))
+
+
+def dhash(source):
+    """64 位 dHash(水平梯度)"""
+    g = _gray(source, (9, 8))
+    return _bits_to_int(g[:, 1:] > g[:, :-1])
+
+
+def hamming(a, b):
+    return int(popcount(np.uint64(a) ^ np.uint64(b)))
+
+
+def _chunk(hashes, i):
+    return ((hashes >> np.uint64(i * CHUNK_BITS)) & np.uint64((1 << CHUNK_BITS) - 1)).astype(np.uint32)
+
+
+def _flip_masks(radius):
+    """16 位内翻转不超过 radius 位的全部异或掩码"""
+    masks = [0]
+    for k in range(1, radius + 1):
+        masks += [sum(1 << b for b in combo) for combo in itertools.combinations(range(CHUNK_BITS), k)]
+    return np.array(masks, dtype=np.uint32)
+
+
+class HashIndex:
+    """64 位哈希的近邻索引(多索引哈希)"""
+
+    def __init__(self, delta_limit=4096):
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.digests = np.empty(0, dtype=object)
+        self.claim_ids = np.empty(0, dtype=object)
+        self._sorted_keys = []       # 每段: 已排序的段值
+        self._sorted_rows = []       # 每段: 对应的行号
+        self._n_indexed = 0          # 前 n 行已进入有序表, 其后为增量缓冲区
+        self.delta_limit = delta_limit
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add_many(self, hashes, digests, claim_ids):
+        with self._lock:
+            self.hashes = np.concatenate([self.hashes, np.asarray(hashes, dtype=np.uint64)])
+            self.digests = np.concatenate([self.digests, np.asarray(digests, dtype=object)])
+            self.claim_ids = np.concatenate([self.claim_ids, np.asarray(claim_ids, dtype=object)])
+            if len(self.hashes) - self._n_indexed > self.delta_limit:
+                self.rebuild()
+
+    def add(self, hash_value, digest, claim_id):
+        self.add_many([hash_value], [digest], [claim_id])
+
+    def rebuild(self):
+        self._sorted_keys, self._sorted_rows = [], []
+        for i in range(N_CHUNKS):
+            keys = _chunk(self.hashes, i)
+            order = np.argsort(keys, kind='stable')
+            self._sorted_keys.append(keys[order])
+            self._sorted_rows.append(order)
+        self._n_indexed = len(self.hashes)
+
+    def _candidates(self, h, max_distance):
+        masks = _flip_masks(max_distance // N_CHUNKS)
+        pieces = [np.arange(self._n_indexed, len(self.hashes))]
+        for i in range(N_CHUNKS):
+            if self._n_indexed == 0:
+                break
+            probes = np.unique(_chunk(np.array([h], dtype=np.uint64), i)[0] ^ masks)
+            keys = self._sorted_keys[i]
+            lo = np.searchsorted(keys, probes, side='left')
+            hi = np.searchsorted(keys, probes, side='right')
+            hit = hi > lo
+            if hit.any():
+                counts = hi[hit] - lo[hit]
+                starts = np.repeat(lo[hit] - np.cumsum(counts) + counts, counts)
+                pieces.append(self._sorted_rows[i][starts + np.arange(counts.sum())])
+        return np.unique(np.concatenate(pieces))
+
+    def query(self, hash_value, max_distance=DUPLICATE_DISTANCE, exclude_claim=None):
+        """汉明距离 ≤ max_distance 的记录, DataFrame: digest, claim_id, distance(升序)"""
+        with self._lock:
+            h = np.uint64(hash_value)
+            rows = self._candidates(h, max_distance)
+            dist = popcount(self.hashes[rows] ^ h)
+            keep = dist <= max_distance
+            rows, dist = rows[keep], dist[keep]
+            result = pd.DataFrame({'digest': self.digests[rows], 'claim_id': self.claim_ids[rows],
+                                   'distance': dist.astype(int)})
+        if exclude_claim is not None:
+            result = result[result['claim_id'] != exclude_claim]
+        return result.sort_values('distance', ignore_index=True)
+
+
+class PhotoDuplicateIndex:
+    """照片查重: pHash 索引 + 追加日志持久化"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.index = HashIndex()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            log = pd.read_csv(self.path, header=None, names=['phash', 'digest', 'claim_id'], dtype=str)
+            self.index.add_many([int(h, 16) for h in log['phash']], log['digest'].to_numpy(),
+                                log['claim_id'].to_numpy())
+            self.index.rebuild()
+
+    def find_similar(self, source, max_distance=DUPLICATE_DISTANCE):
+        """只查询不登记(上传时调用): 返回 (本照片 pHash, 近似历史照片 DataFrame: digest, claim_id, distance)"""
+        h = phash(source)
+        return h, self.index.query(h, max_distance)
+
+    def register(self, hash_value, digest, claim_id):
+        """理赔提交后按正式申请编号登记照片; 同一案件重复登记同一照片时忽略"""
+        with self._lock:
+            known = self.index.query(hash_value, 0)
+            if ((known['digest'] == digest) & (known['claim_id'] == claim_id)).any():
+                return
+            self.index.add(hash_value, digest, claim_id)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(f"{hash_value:016x},{digest},{claim_id}\n")
+
+
+def duplicate_note(similar):
+    """近似照片 → 案件审核意见(写入转人工复核的案件); 无近似照片返回 None"""
+    if similar is None or similar.empty:
+        return None
+    ids = '、'.join(similar.drop_duplicates('claim_id')['claim_id'].head(3))
+    return f"照片与历史案件 {ids} 高度相似(汉明距离 {similar['distance'].min()}), 转人工复核"
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_photo_index():
+    """进程级单例, 日志只在首次使用时加载"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PhotoDuplicateIndex()
+        return _shared
@@ -0,0 +1,173 @@
+"""理赔照片存储与预处理
+
+农户端、AI演示页、量化后台上传的受灾照片直接以原图交给 st.image 显示, 随后
+丢弃; 手机照片动辄上千万像素, 每次刷新都要重新传输和解码整张原图。这里:
+  - 上传按块流式写入临时文件, 同时计算 SHA-256, 以内容哈希为名存入本地仓库,
+    同一张照片重复上传只保留一份
+  - 缩略图与模型输入张量只生成一次: JPEG 用 draft 模式在 DCT 阶段按 1/2~1/8
+    缩小解码, 其余格式用 reduce 整数倍缩小后再精确缩放
+  - 之后再次查看直接读取缓存的缩略图/张量文件
+目录结构:
+    data/photos/
+        blobs/<前2位>/<哈希>.<扩展名>          原图
+        thumbs/<前2位>/<哈希>_<尺寸>.jpg        缩略图
+        tensors/<前2位>/<哈希>_<尺寸>.npy       模型输入 (尺寸, 尺寸, 3) float32, 0~1
+"""
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+DEFAULT_PHOTO_ROOT = Path("data/photos")
+
+THUMB_SIZE = 640
+TENSOR_SIZE = 224
+CHUNK_SIZE = 1 << 20
+
+
+def _open_scaled(path, size):
+    """打开图片并尽量在解码阶段缩小到不小于 size 的尺寸, 按 EXIF 方向摆正"""
+    img = Image.open(path)
+    img.draft('RGB', (size, size))          # 仅对 JPEG 生效, 其余格式忽略
+    img = ImageOps.exif_transpose(img)
+    return img.convert('RGB')
+
+
+class PhotoStore:
+    """按内容哈希寻址的照片仓库"""
+
+    def __init__(self, root=DEFAULT_PHOTO_ROOT):
+        self.root = Path(root)
+        for sub in ('blobs', 'thumbs', 'tensors'):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, kind, name):
+        return self.root / kind / name[:2] / name
+
+    def blob_path(self, digest):
+        """原图路径; 不存在返回 None"""
+        folder = self.root / 'blobs' / digest[:2]
+        matches = list(folder.glob(f'{digest}.*')) if folder.exists() else []
+        return matches[0] if matches else None
+
+    # ==================== 导入 ====================
+
+    def ingest(self, fileobj, filename=''):
+        """流式导入上传文件, 返回 (内容哈希, 是否为已有照片)"""
+        suffix = Path(filename).suffix.lower() or '.jpg'
+        sha = hashlib.sha256()
+        tmp_dir = self.root / 'blobs'
+        fd, tmp_name = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if hasattr(fileobj, 'seek'):
+                    fileobj.seek(0)
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    out.write(chunk)
+            digest = sha.hexdigest()
+            if self.blob_path(digest) is not None:
+                return digest, True
+            target = self._path('blobs', digest + suffix)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, target)
+            tmp_name = None
+            return digest, False
+        finally:
+            if tmp_name is not None and os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    # ==================== 派生文件 ====================
+
+    def thumbnail_path(self, digest, size=THUMB_SIZE):
+        """缩略图(长边不超过 size), 首次调用时生成"""
+        path = self._path('thumbs', f'{digest}_{size}.jpg')
+        if not path.exists():
+            img = _open_scaled(self.blob_path(digest), size)
+            img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            _atomic_save(path, lambda f: img.save(f, 'JPEG', quality=85, optimize=True))
+        return path
+
+    def thumbnail_bytes(self, digest, size=THUMB_SIZE):
+        return _read_cached(str(self.thumbnail_path(digest, size)))
+
+    def tensor_path(self, digest, size=TENSOR_SIZE):
+        """模型输入: 居中裁成正方形后缩放到 size × size, 首次调用时生成"""
+        path = self._path('tensors', f'{digest}_{size}.npy')
+        if not path.exists():
+            img = _open_scaled(self.blob_path(digest), size)
+            w, h = img.size
+            side = min(w, h)
+            box = ((w - side) / 2, (h - side) / 2, (w + side) / 2, (h + side) / 2)
+            img = img.resize((size, size), Image.Resampling.BILINEAR, box=box, reducing_gap=2.0)
+            arr = np.asarray(img, dtype=np.float32) / 255.0
+            _atomic_save(path, lambda f: np.save(f, arr))
+        return path
+
+    def tensor(self, digest, size=TENSOR_SIZE):
+        return np.load(self.tensor_path(digest, size), mmap_mode='r')
+
+    def process_upload(self, uploaded_file, cache=None, key='photo_upload'):
+        """页面上传入口: 入库并生成缩略图与模型输入, 返回 dict
+
+        cache 传入 st.session_state 时, 结果按上传控件的 file_id 缓存在 cache[key]:
+        页面每次重跑都会拿到同一个上传文件, 不必重新读取、哈希和查找原图。
+        """
+        file_id = getattr(uploaded_file, 'file_id', None) or (
+            getattr(uploaded_file, 'name', ''), getattr(uploaded_file, 'size', None))
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None and cached[0] == file_id:
+                return cached[1]
+
+        digest, duplicate = self.ingest(uploaded_file, getattr(uploaded_file, 'name', ''))
+        with Image.open(self.blob_path(digest)) as img:
+            width, height = img.size
+        photo = {
+            'digest': digest,
+            'duplicate': duplicate,
+            'width': width,
+            'height': height,
+            'thumbnail': self.thumbnail_bytes(digest),
+            'tensor_path': str(self.tensor_path(digest)),
+        }
+        if cache is not None:
+            cache[key] = (file_id, photo)
+        return photo
+
+
+def _atomic_save(path, writer):
+    """写到同目录临时文件后替换, 并发生成同一文件时不会读到半截内容"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer(f)
+        os.replace(tmp_name, path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+@functools.lru_cache(maxsize=256)
+def _read_cached(path):
+    """内容寻址的文件不会变化, 读过的缩略图留在内存中"""
+    return Path(path).read_bytes()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_photo_store():
+    """进程级单例"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PhotoStore()
+        return _shared
@@ -0,0 +1,216 @@
+"""农产品价格预测: 阻尼趋势 Holt-Winters(加法季节)
+
+农户端价格预测图里的"AI预测"是写死的 [3.8, 3.5, 3.3], AI演示页的预测也是
+固定随机种子加线性偏移。本模块用纯 NumPy/SciPy 实现指数平滑模型:
+  - 模型: ETS(A, Ad, A), 季节周期按数据频率确定(月度 12, 历史不足两个周期时不含季节项)
+  - 拟合: L-BFGS-B 最小化一步预测误差平方和, 参数 α, β, γ, φ
+  - 预测区间: 按 ETS 解析方差 σ²(1 + Σ c_j²)
+所有 (作物, 地区) 的模型离线并行拟合(进程池), 参数与末期状态存为 JSON;
+页面只读取参数做外推, 不重新拟合, 没有模型时退回季节朴素预测(baseline_forecast)。
+离线拟合: python -m utils.price_forecast(读取价格仓库中全部作物的月均价)
+"""
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.stats import norm
+
+DEFAULT_MODEL_PATH = Path("data/models/price_forecast.json")
+
+
+def _init_state(y, m):
+    if m > 1:
+        level = y[:m].mean()
+        trend = (y[m:2 * m].mean() - level) / m
+        season = y[:m] - level
+    else:
+        level = y[0]
+        trend = y[1] - y[0] if len(y) > 1 else 0.0
+        season = np.zeros(1)
+    return level, trend, season
+
+
+def _filter(y, m, alpha, beta, gamma, phi):
+    """逐期更新, 返回 (一步预测误差, 末期 level, trend, 最近 m 期季节项)"""
+    level, trend, season = _init_state(y, m)
+    season = list(season)
+    errors = np.empty(len(y))
+    for t, obs in enumerate(y):
+        s = season[-m] if m > 1 else 0.0
+        fitted = level + phi * trend + s
+        e = obs - fitted
+        errors[t] = e
+        new_level = level + phi * trend + alpha * e
+        trend = phi * trend + alpha * beta * e
+        level = new_level
+        if m > 1:
+            season.append(s + gamma * e)
+    return errors, level, trend, np.array(season[-m:]) if m > 1 else np.zeros(1)
+
+
+def season_length(dates, n_obs):
+    """由日期间隔判断季节周期: 月度数据 12; 历史不足两个完整周期时不建季节项"""
+    step = np.median(np.diff(pd.to_datetime(dates).values).astype('timedelta64[D]').astype(int)) \
+        if n_obs > 1 else 1
+    m = 12 if step >= 28 else (7 if step == 1 else 1)
+    return m if n_obs >= 2 * m + 2 else 1
+
+
+def fit_series(dates, values, m=None):
+    """拟合单条价格序列, 返回可 JSON 序列化的模型 dict"""
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    y = np.asarray(values, dtype=float)
+    m = season_length(dates, len(y)) if m is None else m
+
+    def sse(p):
+        e = _filter(y, m, *p)[0]
+        return float(e @ e)
+
+    bounds = [(0.01, 0.99), (0.0, 0.99), (0.0, 0.99 if m > 1 else 0.0), (0.8, 0.98)]
+    res = minimize(sse, x0=[0.3, 0.1, 0.1 if m > 1 else 0.0, 0.95], method='L-BFGS-B', bounds=bounds)
+    alpha, beta, gamma, phi = (float(v) for v in res.x)
+    errors, level, trend, season = _filter(y, m, alpha, beta, gamma, phi)
+    # 前 m 期用于初始化, 不计入残差方差
+    burn = min(m, len(errors) - 2) if len(errors) > 2 else 0
+    sigma = float(np.sqrt(np.mean(errors[burn:] ** 2)))
+
+    freq = pd.infer_freq(dates) if len(dates) >= 3 else None
+    return {
+        'alpha': alpha, 'beta': beta, 'gamma': gamma, 'phi': phi, 'm': int(m),
+        'level': float(level), 'trend': float(trend), 'season': season.tolist(),
+        'sigma': sigma, 'last_date': str(dates.iloc[-1].date()),
+        'freq': freq or ('ME' if m == 12 else 'D'), 'n_obs': int(len(y)),
+    }
+
+
+def forecast_model(model, horizon, level=0.95):
+    """按已拟合模型外推 horizon 期, 返回 DataFrame: date, forecast, lower, upper"""
+    h = np.arange(1, horizon + 1)
+    phi, m = model['phi'], model['m']
+    damp = np.cumsum(phi ** h)                         # φ + φ² + ... + φ^h
+    season = np.asarray(model['season'])
+    s = season[(h - 1) % m] if m > 1 else 0.0
+    mean = model['level'] + damp * model['trend'] + s
+
+    # c_j = α(1 + β·Σφ^i) + γ·[j 为季节周期整数倍]
+    j = np.arange(1, horizon)
+    c = model['alpha'] * (1 + model['beta'] * np.cumsum(phi ** j))
+    if m > 1:
+        c = c + model['gamma'] * (j % m == 0)
+    var = model['sigma'] ** 2 * (1 + np.concatenate([[0.0], np.cumsum(c ** 2)]))
+    z = norm.ppf(0.5 + level / 2)
+
+    dates = pd.date_range(pd.Timestamp(model['last_date']), periods=horizon + 1, freq=model['freq'])[1:]
+    return pd.DataFrame({'date': dates, 'forecast': mean,
+                         'lower': mean - z * np.sqrt(var), 'upper': mean + z * np.sqrt(var)})
+
+
+def baseline_forecast(dates, values, horizon, level=0.95):
+    """没有已拟合模型时的基准预测: 满一年历史用去年同期值, 否则沿用最后一期"""
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    y = np.asarray(values, dtype=float)
+    m = 12 if len(y) >= 13 else 1
+    h = np.arange(1, horizon + 1)
+    mean = y[len(y) - m + (h - 1) % m]
+    errors = y[m:] - y[:-m]
+    sigma = float(np.sqrt(np.mean(errors ** 2))) if len(errors) else 0.0
+    spread = norm.ppf(0.5 + level / 2) * sigma * np.sqrt((h - 1) // m + 1)
+    freq = pd.infer_freq(dates) if len(dates) >= 3 else None
+    future = pd.date_range(dates.iloc[-1], periods=horizon + 1, freq=freq or 'ME')[1:]
+    return pd.DataFrame({'date': future, 'forecast': mean, 'lower': mean - spread, 'upper': mean + spread})
+
+
+def _fit_group(args):
+    key, dates, values = args
+    return key, fit_series(dates, values)
+
+
+class PriceForecastRegistry:
+    """各 (作物, 地区) 价格模型的存取; 同一进程内 JSON 只在文件变化后重新读取"""
+
+    _cache = {}
+
+    def __init__(self, path=DEFAULT_MODEL_PATH):
+        self.path = Path(path)
+
+    @staticmethod
+    def key(crop, region='全区'):
+        return f"{crop}|{region}"
+
+    @property
+    def models(self):
+        if not self.path.exists():
+            return {}
+        mtime = self.path.stat().st_mtime
+        cached = self._cache.get(self.path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, json.loads(self.path.read_text(encoding='utf-8')))
+            self._cache[self.path] = cached
+        return cached[1]
+
+    def save(self, models):
+        """与已保存的模型合并后写入; 各写入方用各自的临时文件, 再原子替换"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        merged = {**self.models, **models}
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, suffix='.part')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(tmp_name, self.path)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    def fit_all(self, history, max_workers=None):
+        """离线拟合: history 为 DataFrame[crop, region(可缺省), date, price], 各组并行拟合并保存"""
+        history = history.copy()
+        if 'region' not in history:
+            history['region'] = '全区'
+        history = history.sort_values('date')
+        tasks = [(self.key(crop, region), g['date'].to_numpy(), g['price'].to_numpy())
+                 for (crop, region), g in history.groupby(['crop', 'region'])]
+        if max_workers == 1 or len(tasks) <= 1:
+            fitted = dict(map(_fit_group, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                fitted = dict(pool.map(_fit_group, tasks))
+        self.save(fitted)
+        return fitted
+
+    def get(self, crop, region='全区'):
+        """只读: 先找 (作物, 地区) 的模型, 再找全区模型, 都没有返回 None"""
+        models = self.models
+        return models.get(self.key(crop, region)) or models.get(self.key(crop))
+
+    def forecast(self, crop, region='全区', horizon=3, level=0.95):
+        """与 get 相同的查找顺序(地区模型 → 全区模型), 都没有时抛出 KeyError"""
+        model = self.get(crop, region)
+        if model is None:
+            raise KeyError(f"尚未拟合价格模型: {crop} / {region}")
+        return forecast_model(model, horizon, level)
+
+
+def fit_from_store(store=None, registry=None, market='现货', max_workers=None):
+    """离线拟合入口: 价格仓库中每个作物的月均价拟合一个全区模型"""
+    if store is None:
+        from utils.price_store import PriceStore
+        store = PriceStore()
+    registry = PriceForecastRegistry() if registry is None else registry
+    frames = []
+    for crop in store.crops():
+        monthly = store.monthly_mean(crop, market)
+        if len(monthly) >= 3:
+            frames.append(pd.DataFrame({'crop': crop, 'date': monthly['month'], 'price': monthly['price']}))
+    if not frames:
+        return {}
+    return registry.fit_all(pd.concat(frames, ignore_index=True), max_workers)
+
+
+if __name__ == '__main__':
+    fitted = fit_from_store()
+    print(f"已拟合 {len(fitted)} 个价格模型: {', '.join(fitted) or '价格仓库无数据'}")
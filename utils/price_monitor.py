@@ -0,0 +1,180 @@
+"""价格保险实时触发监控
+
+农户端的价格理赔只在农户手工填写时比较一次 actual_price < insured_price。
+自动理赔需要每来一笔市场价格就检查所有在保的价格保单。这里:
+  - 保单按 (作物, 均价窗口天数) 分组, 每组的约定价格(strike)升序存成数组
+  - 每组记录"已触发前缀的起点": 均价 p 触发的是 strike > p 的后缀, 用二分查找
+    定位, 只有新落入后缀的保单产生理赔事件, 每笔行情 O(log n + 新触发数)
+  - 各作物按日维护收盘价, 每个窗口保存滚动和, 每笔行情 O(窗口种类数) 更新均价
+行情来源可以是不断追加的文件(tail)或本地 socket, 每行 "时间,作物,价格"。
+"""
+import socket
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class _StrikeGroup:
+    """同一作物、同一均价窗口的保单, strike 升序"""
+
+    def __init__(self, policies):
+        order = np.argsort(policies['strike'].to_numpy(), kind='stable')
+        self.strike = policies['strike'].to_numpy(dtype=float)[order]
+        self.policy_id = policies['policy_id'].to_numpy()[order]
+        self.quantity = policies['quantity'].to_numpy(dtype=float)[order]
+        # [fired_from, n) 为已触发的保单
+        self.fired_from = len(self.strike)
+
+    def trigger(self, price):
+        """均价为 price 时新触发的保单下标区间 [lo, hi)"""
+        lo = np.searchsorted(self.strike, price, side='right')
+        hi = self.fired_from
+        if lo < hi:
+            self.fired_from = lo
+            return lo, hi
+        return hi, hi
+
+
+class _DailyAverager:
+    """按日收盘价维护若干窗口的最近 N 天均价(当天以最新一笔价格为收盘)
+
+    每个窗口保存滚动和: 新的一天加上当天收盘、减去滑出窗口的那天; 同一天内
+    的新价格只修正差额。多保留一天收盘价用于减去滑出的值。
+    """
+
+    def __init__(self, windows):
+        self.windows = sorted(set(windows))
+        self.closes = deque(maxlen=self.windows[-1] + 1)
+        self.sums = dict.fromkeys(self.windows, 0.0)
+        self.day = None
+
+    def update(self, day, price):
+        if day != self.day:
+            self.closes.append(price)
+            self.day = day
+            for w in self.windows:
+                self.sums[w] += price
+                if len(self.closes) > w:
+                    self.sums[w] -= self.closes[-w - 1]
+        else:
+            delta = price - self.closes[-1]
+            self.closes[-1] = price
+            for w in self.windows:
+                self.sums[w] += delta
+
+    def average(self, window):
+        if len(self.closes) < window:
+            return None
+        return self.sums[window] / window
+
+
+class PriceTriggerMonitor:
+    """价格保单触发监控
+
+    policies: DataFrame, 列 policy_id, crop, strike(约定价格 元/斤), quantity(斤),
+              window(均价天数, 1 为当日价格, 缺省为 1)
+    """
+
+    def __init__(self, policies=None):
+        self.groups = {}
+        self.crop_groups = {}
+        self.averagers = {}
+        if policies is not None:
+            self.load_policies(policies)
+
+    def load_policies(self, policies):
+        """(重新)建立索引; 已触发状态清零"""
+        policies = policies.copy()
+        if 'window' not in policies:
+            policies['window'] = 1
+        self.groups = {(crop, int(window)): _StrikeGroup(g)
+                       for (crop, window), g in policies.groupby(['crop', 'window'])}
+        self.crop_groups = {}
+        for (crop, window), group in self.groups.items():
+            self.crop_groups.setdefault(crop, []).append((window, group))
+        self.averagers = {crop: _DailyAverager([w for w, _ in groups])
+                          for crop, groups in self.crop_groups.items()}
+
+    def on_tick(self, ts, crop, price):
+        """处理一笔行情, 返回本笔新产生的理赔事件列表"""
+        averager = self.averagers.get(crop)
+        if averager is None:
+            return []
+        ts = pd.Timestamp(ts)
+        averager.update(ts.normalize(), float(price))
+
+        events = []
+        for window, group in self.crop_groups[crop]:
+            avg = averager.average(window)
+            if avg is None:
+                continue
+            lo, hi = group.trigger(avg)
+            for i in range(lo, hi):
+                events.append({
+                    'ts': ts, 'policy_id': group.policy_id[i], 'crop': crop, 'window': window,
+                    'strike': group.strike[i], 'avg_price': avg,
+                    'payout': (group.strike[i] - avg) * group.quantity[i],
+                })
+        return events
+
+    def run(self, feed, on_claim=None, max_ticks=None):
+        """消费行情流, 每个理赔事件调用 on_claim(event); 返回全部事件"""
+        all_events = []
+        for n, (ts, crop, price) in enumerate(feed, 1):
+            events = self.on_tick(ts, crop, price)
+            for e in events:
+                if on_claim is not None:
+                    on_claim(e)
+            all_events.extend(events)
+            if max_ticks is not None and n >= max_ticks:
+                break
+        return all_events
+
+    def pending_count(self):
+        """各组尚未触发的保单数"""
+        return {k: g.fired_from for k, g in self.groups.items()}
+
+
+# ==================== 行情来源 ====================
+
+def parse_tick(line):
+    """'2024-11-15 10:30:00,沃柑,2.85' → (Timestamp, 作物, 价格); 空行或表头返回 None"""
+    parts = line.strip().split(',')
+    if len(parts) < 3:
+        return None
+    try:
+        return pd.Timestamp(parts[0]), parts[1].strip(), float(parts[2])
+    except ValueError:
+        return None
+
+
+def tail_file(path, poll_interval=0.5, from_start=True, stop=None):
+    """跟随读取不断追加的行情文件(类似 tail -f); stop() 返回 True 时结束"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if not from_start:
+            f.seek(0, 2)
+        buffer = ''
+        while stop is None or not stop():
+            chunk = f.readline()
+            if not chunk:
+                time.sleep(poll_interval)
+                continue
+            buffer += chunk
+            if not buffer.endswith('\n'):
+                continue  # 行未写完整, 等下一次读取
+            tick = parse_tick(buffer)
+            buffer = ''
+            if tick is not None:
+                yield tick
+
+
+def socket_feed(host='127.0.0.1', port=9009, timeout=None):
+    """从本地 TCP socket 读取按行分隔的行情, 对端关闭连接时结束"""
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        with conn.makefile('r', encoding='utf-8') as stream:
+            for line in stream:
+                tick = parse_tick(line)
+                if tick is not None:
+                    yield tick
@@ -0,0 +1,186 @@
+"""价格历史列式存储
+
+各页面的价格数据都是行内列表('price': [3.5, 3.2, 2.8, ...])或临时生成的数组。
+本模块与 weather_store 相同的思路, 把现货/期货的逐笔成交(tick)或日线(bar)按
+类型 × 作物 × 市场 × 月份 分区存成列式 .npy 文件:
+    data/prices/
+        <tick|bar>/<作物>/<市场>/<YYYY-MM>/ts.npy       时间戳(datetime64[ms]), 分区内有序
+                                          price.npy ...  各数值列(float64)
+区间查询在内存映射的 ts 列上二分查找起止位置, 单分区内返回的是切片视图(不复制),
+跨分区时逐分区 yield 视图, 或按需拼接。
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ROOT = Path("data/prices")
+
+# 各类型的数值列
+KIND_COLUMNS = {
+    'tick': ['price', 'volume'],
+    'bar': ['open', 'high', 'low', 'close', 'volume'],
+}
+
+COLUMN_ALIASES = {
+    '时间': 'ts', '日期': 'ts', '作物': 'crop', '品种': 'crop', '市场': 'market',
+    '价格': 'price', '成交量': 'volume', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close',
+}
+
+
+class PriceStore:
+    """分区列式价格仓库"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # ==================== 导入 ====================
+
+    def ingest_frame(self, df, kind='bar'):
+        """导入 DataFrame(列 crop, market, ts 及该类型的数值列), 返回写入的分区数"""
+        df = df.rename(columns=COLUMN_ALIASES)
+        if 'market' not in df:
+            df = df.assign(market='现货')
+        ts = pd.to_datetime(df['ts']).to_numpy().astype('datetime64[ms]')
+        month = ts.astype('datetime64[M]')
+        columns = [c for c in KIND_COLUMNS[kind] if c in df]
+        values = {c: df[c].to_numpy(dtype=np.float64) for c in columns}
+
+        keys = pd.DataFrame({'crop': df['crop'].astype(str).to_numpy(),
+                             'market': df['market'].astype(str).to_numpy(), 'month': month})
+        written = 0
+        for (crop, market, mon), idx in keys.groupby(['crop', 'market', 'month']).indices.items():
+            self._merge_partition(kind, crop, market, str(np.datetime64(mon, 'M')), ts[idx],
+                                  {c: v[idx] for c, v in values.items()})
+            written += 1
+        return written
+
+    def _merge_partition(self, kind, crop, market, month, ts, values):
+        part_dir = self.root / kind / crop / market / month
+        if part_dir.exists():
+            old = self.load_partition(kind, crop, market, month, mmap=False)
+            n_old = len(old['ts'])
+            ts = np.concatenate([old['ts'], ts])
+            for c in set(values) | (set(old) - {'ts'}):
+                old_col = old.get(c, np.full(n_old, np.nan))
+                new_col = values.get(c, np.full(len(ts) - n_old, np.nan))
+                values[c] = np.concatenate([old_col, new_col])
+
+        # 按时间排序; bar 同一时间重复导入时保留最后一条, tick 允许同一时刻多笔
+        order = np.lexsort((np.arange(len(ts)), ts))
+        ts = ts[order]
+        keep = np.ones(len(ts), dtype=bool)
+        if kind == 'bar':
+            keep[:-1] = ts[1:] != ts[:-1]
+
+        tmp_dir = part_dir.with_name(month + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+        np.save(tmp_dir / 'ts.npy', ts[keep])
+        for c, v in values.items():
+            np.save(tmp_dir / f'{c}.npy', v[order][keep])
+
+        # 先写临时目录再整体替换
+        if part_dir.exists():
+            backup = part_dir.with_name(month + '.old')
+            os.replace(part_dir, backup)
+            os.replace(tmp_dir, part_dir)
+            shutil.rmtree(backup)
+        else:
+            os.replace(tmp_dir, part_dir)
+
+    def ingest_csv(self, path, kind='bar', **defaults):
+        """导入 CSV, 文件中缺少的 crop/market 列可用关键字参数补齐"""
+        df = pd.read_csv(path).rename(columns=COLUMN_ALIASES)
+        for k, v in defaults.items():
+            if k not in df:
+                df[k] = v
+        return self.ingest_frame(df, kind)
+
+    # ==================== 读取 ====================
+
+    def crops(self, kind=None):
+        """有数据的作物; kind 为 None 时合并 K 线与逐笔两类(daily_close 两类都能读取)"""
+        kinds = KIND_COLUMNS if kind is None else [kind]
+        names = set()
+        for k in kinds:
+            base = self.root / k
+            if base.exists():
+                names.update(p.name for p in base.iterdir() if p.is_dir())
+        return sorted(names)
+
+    def markets(self, crop, kind='bar'):
+        base = self.root / kind / crop
+        return sorted(p.name for p in base.iterdir() if p.is_dir()) if base.exists() else []
+
+    def months(self, crop, market, kind='bar'):
+        base = self.root / kind / crop / market
+        if not base.exists():
+            return []
+        return sorted(p.name for p in base.iterdir()
+                      if p.is_dir() and not p.name.endswith(('.tmp', '.old')))
+
+    def load_partition(self, kind, crop, market, month, columns=None, mmap=True):
+        part_dir = self.root / kind / crop / market / month
+        mode = 'r' if mmap else None
+        names = ['ts'] + ([p.stem for p in part_dir.glob('*.npy') if p.stem != 'ts']
+                          if columns is None else list(columns))
+        return {n: np.load(part_dir / f'{n}.npy', mmap_mode=mode)
+                for n in names if (part_dir / f'{n}.npy').exists()}
+
+    def iter_range(self, crop, market='现货', start=None, end=None, kind='bar', columns=None):
+        """逐分区 yield 时间区间 [start, end] 内的数据, 每块都是内存映射上的切片视图"""
+        start = np.datetime64(pd.Timestamp(start), 'ms') if start is not None else None
+        end = np.datetime64(pd.Timestamp(end), 'ms') if end is not None else None
+        for m in self.months(crop, market, kind):
+            mon = np.datetime64(m, 'M')
+            if start is not None and mon < start.astype('datetime64[M]'):
+                continue
+            if end is not None and mon > end.astype('datetime64[M]'):
+                break
+            part = self.load_partition(kind, crop, market, m, columns)
+            ts = part['ts']
+            lo = np.searchsorted(ts, start, side='left') if start is not None else 0
+            hi = np.searchsorted(ts, end, side='right') if end is not None else len(ts)
+            if hi > lo:
+                yield {k: v[lo:hi] for k, v in part.items()}
+
+    def query(self, crop, market='现货', start=None, end=None, kind='bar', columns=None):
+        """区间查询, 返回 {列名: 数组}; 只落在一个分区时为零拷贝视图, 跨分区时拼接"""
+        pieces = list(self.iter_range(crop, market, start, end, kind, columns))
+        if not pieces:
+            return {}
+        if len(pieces) == 1:
+            return pieces[0]
+        keys = set.intersection(*(set(p) for p in pieces))
+        return {k: np.concatenate([p[k] for p in pieces]) for k in keys}
+
+    def query_frame(self, crop, market='现货', start=None, end=None, kind='bar', columns=None):
+        data = self.query(crop, market, start, end, kind, columns)
+        return pd.DataFrame({k: np.asarray(v) for k, v in data.items()})
+
+    def daily_close(self, crop, market='现货', start=None, end=None):
+        """日收盘价序列(DataFrame: date, price); 有日线用日线, 否则由逐笔成交取每日最后一笔"""
+        if self.months(crop, market, 'bar'):
+            data = self.query(crop, market, start, end, 'bar', ['close'])
+            price = data.get('close')
+        else:
+            data = self.query(crop, market, start, end, 'tick', ['price'])
+            price = data.get('price')
+        if not data or price is None:
+            return pd.DataFrame(columns=['date', 'price'])
+        day = np.asarray(data['ts']).astype('datetime64[D]')
+        last = np.r_[day[1:] != day[:-1], True]
+        return pd.DataFrame({'date': day[last], 'price': np.asarray(price)[last]})
+
+    def monthly_mean(self, crop, market='现货', start=None, end=None):
+        """月均价(DataFrame: month(月末), price), 供价格走势图与预测模型使用"""
+        daily = self.daily_close(crop, market, start, end)
+        if daily.empty:
+            return pd.DataFrame(columns=['month', 'price'])
+        monthly = daily.set_index(pd.to_datetime(daily['date']))['price'].resample('ME').mean().dropna()
+        return pd.DataFrame({'month': monthly.index, 'price': monthly.to_numpy()})
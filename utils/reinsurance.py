@@ -0,0 +1,249 @@
+"""再保险分层定价: 赔付累计超额(Stop-Loss) 与 险位超赔(XoL)
+
+量化模型后台 Tab1 的损益只算到单张保单。整个农险账簿购买赔付累计超额再保险,
+定价需要全年总赔付的分布。本模块支持两类输入:
+  1) 模拟得到的组合总损失向量(如 revenue_insurance 的 book_payouts)
+  2) 频率-强度复合模型, 用 Panjer 递推或 FFT 直接得到总损失分布,
+     不需要逐次模拟
+并返回分出/自留损失分布及分层纯保费。
+"""
+import numpy as np
+import pandas as pd
+
+
+# ==================== 基于模拟损失向量 ====================
+
+def apply_layer(losses, attachment, limit=np.inf):
+    """分层分出: ceded = min(max(L - attachment, 0), limit), 返回 (ceded, retained)"""
+    losses = np.asarray(losses, dtype=float)
+    ceded = np.minimum(np.maximum(losses - attachment, 0), limit)
+    return ceded, losses - ceded
+
+
+def price_layers_from_losses(losses, layers, loading=0.2, std_loading=0.0):
+    """按模拟损失向量批量给多个层定价
+
+    losses: (n_sims,) 年度总损失
+    layers: [(attachment, limit), ...], limit 可为 np.inf
+    保费 = (1 + loading) × E[分出] + std_loading × Std[分出]
+    返回 DataFrame, 每层一行
+    """
+    losses = np.asarray(losses, dtype=float)
+    att = np.array([l[0] for l in layers], dtype=float)
+    lim = np.array([l[1] for l in layers], dtype=float)
+
+    # (n_sims, n_layers) 一次性计算
+    ceded = np.minimum(np.maximum(losses[:, None] - att[None, :], 0), lim[None, :])
+    expected = ceded.mean(axis=0)
+    std = ceded.std(axis=0)
+    premium = (1 + loading) * expected + std_loading * std
+
+    return pd.DataFrame({
+        '起赔点': att,
+        '责任限额': lim,
+        '期望分出损失': expected,
+        '分出损失标准差': std,
+        '触及概率': (ceded > 0).mean(axis=0),
+        '耗尽概率': np.where(np.isfinite(lim), (ceded >= lim[None, :]).mean(axis=0), 0.0),
+        '再保费': premium,
+        '费率(ROL)': np.where(np.isfinite(lim) & (lim > 0), premium / np.where(lim > 0, lim, 1), np.nan),
+    })
+
+
+# ==================== 频率-强度复合模型 ====================
+
+def discretize_severity(dist, h, n):
+    """强度分布离散化(中点法), 返回长度 n 的概率向量, 网格为 0, h, 2h, ...
+
+    dist: scipy.stats 冻结分布, 如 lognorm(s=1.0, scale=5e4)
+    末格吸收尾部概率, 保证总和为 1。
+    """
+    edges = (np.arange(n + 1) - 0.5) * h
+    edges[0] = 0.0
+    cdf = dist.cdf(edges)
+    pmf = np.diff(cdf)
+    pmf[0] += cdf[0]
+    pmf[-1] += 1 - cdf[-1]
+    return pmf
+
+
+def _abk(frequency, params):
+    """(a, b, 0) 类频率分布的 a, b, p0"""
+    if frequency == 'poisson':
+        lam = params['lam']
+        return 0.0, lam, np.exp(-lam)
+    if frequency == 'negbin':
+        r, beta = params['r'], params['beta']
+        return beta / (1 + beta), (r - 1) * beta / (1 + beta), (1 + beta) ** (-r)
+    if frequency == 'binomial':
+        m, q = params['m'], params['q']
+        return -q / (1 - q), (m + 1) * q / (1 - q), (1 - q) ** m
+    raise ValueError(f"不支持的频率分布: {frequency}")
+
+
+def panjer_recursion(frequency, params, severity_pmf, n=None):
+    """Panjer 递推计算复合分布的总损失概率
+
+    frequency: 'poisson' / 'negbin' / 'binomial'
+    params: poisson {'lam'}, negbin {'r', 'beta'}, binomial {'m', 'q'}
+    severity_pmf: 离散化强度分布(网格步长 h), 返回总损失在同一网格上的概率
+    复杂度 O(n²), 网格较大时建议使用 compound_fft
+    """
+    f = np.asarray(severity_pmf, dtype=float)
+    n = len(f) if n is None else n
+    f = np.pad(f, (0, max(n - len(f), 0)))[:n]
+    a, b, p0 = _abk(frequency, params)
+
+    g = np.zeros(n)
+    pgf_at_f0 = {
+        'poisson': lambda: np.exp(params['lam'] * (f[0] - 1)),
+        'negbin': lambda: (1 - params['beta'] * (f[0] - 1)) ** (-params['r']),
+        'binomial': lambda: (1 + params['q'] * (f[0] - 1)) ** params['m'],
+    }[frequency]
+    g[0] = pgf_at_f0()
+
+    j = np.arange(1, n)
+    denom = 1 - a * f[0]
+    for k in range(1, n):
+        jj = j[:k]
+        g[k] = np.dot((a + b * jj / k) * f[jj], g[k - jj]) / denom
+    return g
+
+
+def compound_fft(frequency, params, severity_pmf, n=None, pad_factor=2):
+    """FFT 计算复合分布的总损失概率
+
+    在频域上对强度分布的特征函数代入频率分布的概率母函数,
+    n 为输出网格长度, 内部补零到 pad_factor × n 以减少循环卷积的尾部回绕。
+    """
+    f = np.asarray(severity_pmf, dtype=float)
+    n = len(f) if n is None else n
+    m = int(2 ** np.ceil(np.log2(pad_factor * n)))
+    phi = np.fft.rfft(np.pad(f, (0, m - len(f)))[:m])
+
+    if frequency == 'poisson':
+        pgf = np.exp(params['lam'] * (phi - 1))
+    elif frequency == 'negbin':
+        pgf = (1 - params['beta'] * (phi - 1)) ** (-params['r'])
+    elif frequency == 'binomial':
+        pgf = (1 + params['q'] * (phi - 1)) ** params['m']
+    else:
+        raise ValueError(f"不支持的频率分布: {frequency}")
+
+    g = np.fft.irfft(pgf, m)[:n]
+    return np.clip(g, 0, None)
+
+
+def layer_severity(severity_pmf, h, retention, limit=np.inf):
+    """险位超赔: 把单次损失强度分布拆成 (分出, 自留) 两个离散分布
+
+    每次损失 X 分出 min(max(X - retention, 0), limit), 其余自留;
+    retention 和 limit 按网格步长 h 取整。
+    """
+    f = np.asarray(severity_pmf, dtype=float)
+    x = np.arange(len(f))
+    d = int(round(retention / h))
+    l = len(f) if not np.isfinite(limit) else int(round(limit / h))
+
+    ceded_idx = np.minimum(np.maximum(x - d, 0), l)
+    retained_idx = x - ceded_idx
+    ceded = np.bincount(ceded_idx, weights=f, minlength=len(f))
+    retained = np.bincount(retained_idx, weights=f, minlength=len(f))
+    return ceded, retained
+
+
+def stop_loss_from_pmf(pmf, h, attachment, limit=np.inf):
+    """总损失离散分布上的赔付累计超额层: 返回 (期望分出, 分出分布, 自留分布)
+
+    分出/自留分布均在同一网格 0, h, 2h, ... 上。
+    """
+    g = np.asarray(pmf, dtype=float)
+    s = np.arange(len(g)) * h
+    ceded_value = np.minimum(np.maximum(s - attachment, 0), limit)
+    expected = float(np.dot(ceded_value, g))
+
+    ceded_idx = np.rint(ceded_value / h).astype(int)
+    retained_idx = np.arange(len(g)) - ceded_idx
+    ceded = np.bincount(ceded_idx, weights=g, minlength=len(g))
+    retained = np.bincount(retained_idx, weights=g, minlength=len(g))
+    return expected, ceded, retained
+
+
+def price_aggregate_stop_loss(
+    frequency,
+    params,
+    severity_dist,
+    h,
+    n,
+    layers,
+    per_risk_layer=None,
+    method='fft',
+    loading=0.2,
+):
+    """复合模型下的再保险分层定价
+
+    frequency, params: 年度赔案次数分布, 见 panjer_recursion
+    severity_dist: scipy.stats 冻结分布, 单次赔款金额
+    h, n: 离散化网格步长与长度(总损失上限约为 n × h)
+    layers: 赔付累计超额层 [(attachment, limit), ...]
+    per_risk_layer: 可选 (retention, limit), 先按险位超赔分出单次损失,
+        累计超额层作用在险位超赔后的自留总损失上
+    method: 'fft' 或 'panjer'
+
+    返回 dict:
+        grid: 总损失网格(元)
+        aggregate_pmf: 自留(或未分层)总损失分布
+        per_risk_ceded_pmf: 险位超赔分出总额分布(若指定 per_risk_layer)
+        layers: DataFrame, 各层的期望分出与再保费; 指定 per_risk_layer 时第一行为险位超赔层
+        layer_pmfs: {(attachment, limit): (分出分布, 自留分布)}
+    """
+    compound = compound_fft if method == 'fft' else panjer_recursion
+    f = discretize_severity(severity_dist, h, n)
+
+    result = {'grid': np.arange(n) * h}
+    if per_risk_layer is not None:
+        xl_ceded, f = layer_severity(f, h, *per_risk_layer)
+        result['per_risk_ceded_pmf'] = compound(frequency, params, xl_ceded, n)
+
+    g = compound(frequency, params, f, n)
+    result['aggregate_pmf'] = g
+
+    rows, layer_pmfs = [], {}
+    grid = result['grid']
+    if per_risk_layer is not None:
+        retention, limit = per_risk_layer
+        xl_pmf = result['per_risk_ceded_pmf']
+        expected = float(np.dot(grid, xl_pmf))
+        std = np.sqrt(max(np.dot(grid**2, xl_pmf) - expected**2, 0))
+        premium = (1 + loading) * expected
+        rows.append({
+            '层类型': '险位超赔',
+            '起赔点': retention,
+            '责任限额': limit,
+            '期望分出损失': expected,
+            '分出损失标准差': std,
+            '触及概率': float(xl_pmf[1:].sum()),
+            '再保费': premium,
+            '费率(ROL)': premium / limit if np.isfinite(limit) and limit > 0 else np.nan,
+        })
+
+    for attachment, limit in layers:
+        expected, ceded, retained = stop_loss_from_pmf(g, h, attachment, limit)
+        ceded_value = np.minimum(np.maximum(grid - attachment, 0), limit)
+        std = np.sqrt(max(np.dot(ceded_value**2, g) - expected**2, 0))
+        premium = (1 + loading) * expected
+        rows.append({
+            '层类型': '累计超额',
+            '起赔点': attachment,
+            '责任限额': limit,
+            '期望分出损失': expected,
+            '分出损失标准差': std,
+            '触及概率': float(g[grid > attachment].sum()),
+            '再保费': premium,
+            '费率(ROL)': premium / limit if np.isfinite(limit) and limit > 0 else np.nan,
+        })
+        layer_pmfs[(attachment, limit)] = (ceded, retained)
+
+    result['layers'] = pd.DataFrame(rows)
+    result['layer_pmfs'] = layer_pmfs
+    return result
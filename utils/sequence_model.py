@@ -0,0 +1,207 @@
+"""NumPy 循环网络价格模型(回声状态网络)
+
+README 和 AI演示页宣传 LSTM 价格模型, 实际是固定种子的正态噪声加正弦项, 外面
+包一层 time.sleep(1.5)。这里用纯 NumPy 实现一个小型循环网络:
+  - 输入: 对数收益率与年内季节 sin/cos
+  - 隐层: 带泄漏积分的随机循环储备池(谱半径 < 1), 权重固定
+  - 输出层: 从隐状态直接回归未来 1..H 天的累计对数收益(多步直出), 岭回归闭式求解
+训练离线完成(python -m utils.sequence_model, 用价格仓库中全部作物的日收盘价),
+权重存为 .npz; 每个进程只加载一次。预测区间的残差标准差取自训练时留出的末段
+样本(样本外), 留出段覆盖不到的长步长按 √k 外推。推理时所有序列同时推进隐状态,
+最后一次矩阵乘法得到全部预测步长, 单次调用耗时为毫秒级。
+"""
+import functools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+DEFAULT_RNN_PATH = Path("data/models/price_rnn.npz")
+
+
+def _features(prices, dates):
+    """(n_series, T) 价格 → (n_series, T, 3) 输入特征, 首日收益记 0"""
+    logp = np.log(np.asarray(prices, dtype=float))
+    ret = np.concatenate([np.zeros((logp.shape[0], 1)), np.diff(logp, axis=1)], axis=1)
+    doy = pd.DatetimeIndex(dates).dayofyear.to_numpy()
+    angle = 2 * np.pi * doy / 365.25
+    season = np.broadcast_to(np.stack([np.sin(angle), np.cos(angle)], axis=-1), ret.shape + (2,))
+    return np.concatenate([ret[..., None] * 20.0, season], axis=-1), logp
+
+
+class PriceRNN:
+    """回声状态网络: 储备池权重随机固定, 只训练线性输出层"""
+
+    def __init__(self, hidden=128, horizon=90, spectral_radius=0.9, leak=0.3, input_scale=0.5,
+                 ridge=1e-2, washout=20, seed=0):
+        rng = np.random.default_rng(seed)
+        self.horizon = horizon
+        self.leak = leak
+        self.ridge = ridge
+        self.washout = washout
+        self.w_in = rng.uniform(-input_scale, input_scale, (3, hidden))
+        w = rng.standard_normal((hidden, hidden)) * (rng.random((hidden, hidden)) < 0.1)
+        self.w = w * (spectral_radius / np.max(np.abs(np.linalg.eigvals(w))))
+        self.bias = rng.uniform(-0.2, 0.2, hidden)
+        self.w_out = np.zeros((hidden + 1, horizon))
+        self.resid_sd = np.zeros(horizon)
+
+    def states(self, x):
+        """逐步推进隐状态, x: (n_series, T, 3), 返回 (n_series, T, hidden)"""
+        n, T, _ = x.shape
+        h = np.zeros((n, self.w.shape[0]))
+        out = np.empty((n, T, self.w.shape[0]))
+        drive = x @ self.w_in + self.bias
+        for t in range(T):
+            h = (1 - self.leak) * h + self.leak * np.tanh(drive[:, t] + h @ self.w)
+            out[:, t] = h
+        return out
+
+    def _solve(self, design, logp, end):
+        """只用 end 之前的数据(起点与目标都在 [0, end) 内)逐步长解岭回归"""
+        hidden = design.shape[-1]
+        w_out = np.zeros((hidden, self.horizon))
+        for k in range(1, self.horizon + 1):
+            t_max = end - k
+            if t_max <= self.washout:
+                w_out[:, k - 1] = w_out[:, k - 2] if k > 1 else 0.0
+                continue
+            a = design[:, self.washout:t_max].reshape(-1, hidden)
+            y = (logp[:, self.washout + k:end] - logp[:, self.washout:t_max]).reshape(-1)
+            gram = a.T @ a + self.ridge * np.eye(hidden)
+            w_out[:, k - 1] = np.linalg.solve(gram, a.T @ y)
+        return w_out
+
+    def _residual_sd(self, design, logp, w_out, start):
+        """起点在 [start, T - k) 的预测误差标准差; 没有样本的步长为 NaN"""
+        T = logp.shape[1]
+        sd = np.full(self.horizon, np.nan)
+        for k in range(1, self.horizon + 1):
+            if T - k <= start:
+                break
+            a = design[:, start:T - k].reshape(-1, design.shape[-1])
+            y = (logp[:, start + k:] - logp[:, start:T - k]).reshape(-1)
+            sd[k - 1] = np.std(y - a @ w_out[:, k - 1])
+        return sd
+
+    def fit(self, prices, dates, holdout=0.25):
+        """prices: (n_series, T) 等长价格序列(各作物), dates: 长度 T 的日期
+
+        先用前 1 - holdout 的历史训练, 在留出的末段上计算样本外残差标准差,
+        再用全部历史重新训练输出层。
+        """
+        x, logp = _features(prices, dates)
+        s = self.states(x)
+        n, T, hidden = s.shape
+        design = np.concatenate([s, np.ones((n, T, 1))], axis=-1)
+
+        split = int(T * (1 - holdout))
+        sd = np.full(self.horizon, np.nan)
+        if holdout > 0 and split > self.washout + 1:
+            sd = self._residual_sd(design, logp, self._solve(design, logp, split), split)
+        self.w_out = self._solve(design, logp, T)
+        if np.isnan(sd).all():
+            # 留出段太短, 退回样本内残差
+            sd = self._residual_sd(design, logp, self.w_out, self.washout)
+        # 没有样本的长步长按 √k 外推
+        k = np.arange(1, self.horizon + 1)
+        last = np.flatnonzero(~np.isnan(sd))[-1]
+        self.resid_sd = np.where(np.isnan(sd), sd[last] * np.sqrt(k / (last + 1)), sd)
+        return self
+
+    def predict(self, prices, dates, horizon=None, level=0.95, context=250):
+        """批量预测: 返回 (均值, 下界, 上界), 均为 (n_series, horizon) 价格数组
+
+        储备池记忆随时间衰减, 只用最近 context 天推进隐状态即可。
+        """
+        horizon = self.horizon if horizon is None else min(horizon, self.horizon)
+        prices = np.atleast_2d(prices)[:, -context:]
+        dates = pd.DatetimeIndex(dates)[-prices.shape[1]:]
+        x, logp = _features(prices, dates)
+        last = self.states(x)[:, -1]
+        design = np.concatenate([last, np.ones((len(last), 1))], axis=1)
+        drift = design @ self.w_out[:, :horizon]
+        z = norm.ppf(0.5 + level / 2)
+        base = logp[:, -1:]
+        sd = self.resid_sd[:horizon]
+        return np.exp(base + drift), np.exp(base + drift - z * sd), np.exp(base + drift + z * sd)
+
+    def save(self, path=DEFAULT_RNN_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, w_in=self.w_in, w=self.w, bias=self.bias, w_out=self.w_out, resid_sd=self.resid_sd,
+                 meta=np.array([self.leak, self.ridge, self.washout, self.horizon], dtype=float))
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RNN_PATH):
+        with np.load(path) as f:
+            model = cls.__new__(cls)
+            model.w_in, model.w, model.bias = f['w_in'], f['w'], f['bias']
+            model.w_out, model.resid_sd = f['w_out'], f['resid_sd']
+            leak, ridge, washout, horizon = f['meta']
+        model.leak, model.ridge, model.washout, model.horizon = float(leak), float(ridge), int(washout), int(horizon)
+        return model
+
+
+@functools.lru_cache(maxsize=4)
+def _load_cached(path, mtime):
+    return PriceRNN.from_file(path)
+
+
+def load_price_rnn(path=DEFAULT_RNN_PATH):
+    """进程内只加载一次(文件更新后重新加载); 文件不存在时返回 None"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return _load_cached(str(path), path.stat().st_mtime)
+
+
+def train_price_rnn(prices, dates, path=DEFAULT_RNN_PATH, **kwargs):
+    """离线训练并保存, prices 为 (n_series, T) 或 {作物: 序列}"""
+    if isinstance(prices, dict):
+        prices = np.vstack([np.asarray(v, dtype=float) for v in prices.values()])
+    model = PriceRNN(**kwargs).fit(prices, dates)
+    model.save(path)
+    return model
+
+
+def random_walk_forecast(prices, horizon, level=0.95):
+    """没有训练好的模型时的基准: 价格不变, 区间按历史日对数收益波动率 √h 扩张"""
+    logp = np.log(np.atleast_2d(np.asarray(prices, dtype=float)))
+    sd = np.std(np.diff(logp, axis=1), axis=1, keepdims=True)
+    spread = norm.ppf(0.5 + level / 2) * sd * np.sqrt(np.arange(1, horizon + 1))
+    base = np.repeat(np.exp(logp[:, -1:]), horizon, axis=1)
+    return base, base * np.exp(-spread), base * np.exp(spread)
+
+
+def price_panel(store=None, market='现货', start=None, end=None):
+    """价格仓库中各作物的日收盘价面板(DataFrame: 日期索引 × 作物列), 无数据时为空表
+
+    各作物交易日不完全一致: 对齐到日历日, 缺失日沿用前一日收盘, 只保留各作物都有数据的区间。
+    训练与页面推理共用, 所有作物可一次 predict。
+    """
+    if store is None:
+        from utils.price_store import PriceStore
+        store = PriceStore()
+    series = {}
+    for crop in store.crops():
+        daily = store.daily_close(crop, market, start, end)
+        if len(daily):
+            series[crop] = daily.set_index(pd.to_datetime(daily['date']))['price']
+    if not series:
+        return pd.DataFrame()
+    return pd.DataFrame(series).asfreq('D').ffill().dropna()
+
+
+def train_from_store(store=None, market='现货', path=DEFAULT_RNN_PATH, min_days=250, **kwargs):
+    """离线训练入口: 价格仓库中各作物的日收盘价按共同日期对齐成面板后训练"""
+    panel = price_panel(store, market)
+    if len(panel) < min_days:
+        return None
+    return train_price_rnn(panel.to_numpy().T, panel.index, path, **kwargs)
+
+
+if __name__ == '__main__':
+    model = train_from_store()
+    print("价格循环网络已训练并保存" if model is not None else "价格仓库数据不足, 未训练")
@@ -0,0 +1,262 @@
+"""地块 → 气象站/格点 空间索引
+
+农户地块目前只用县名字符串标识("广西南宁-武鸣"), 保险公司端的区域坐标也只是
+五行的 DataFrame。本模块把每个投保地块映射到最近的若干气象站(cKDTree, 反距离
+加权)或规则格点(双线性插值), 插值权重预先计算并保存为 .npz, 之后按保单取气象
+数据只需 O(1) 查表加一次加权求和, 不再每次请求重新计算。理赔交叉验证按案件
+取气象数据时经 parcel_weather 使用站点权重。
+"""
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from utils.weather_store import region_key
+
+EARTH_RADIUS_KM = 6371.0
+
+DEFAULT_WEIGHTS_DIR = Path("data/models/station_weights")
+
+# 县域中心坐标, 与保险公司端区域风险地图一致
+COUNTY_COORDS = {
+    '南宁-武鸣': (23.1566, 108.2733),
+    '钦州-灵山': (22.2893, 109.3122),
+    '崇左-扶绥': (22.6362, 107.9043),
+    '百色-田阳': (23.7368, 106.9152),
+    '河池-宜州': (24.4925, 108.6364),
+}
+
+
+def county_centroid(county):
+    """县名(可带"广西"前缀)对应的中心坐标, 未知县返回 (nan, nan)"""
+    key = str(county).replace('广西', '', 1)
+    return COUNTY_COORDS.get(key, (np.nan, np.nan))
+
+
+def parcel_coordinates(parcels):
+    """地块坐标: 有 lat/lon 列时直接使用, 缺失的按 county 列取县域中心"""
+    n = len(parcels)
+    lat = np.array(parcels['lat'], dtype=float) if 'lat' in parcels else np.full(n, np.nan)
+    lon = np.array(parcels['lon'], dtype=float) if 'lon' in parcels else np.full(n, np.nan)
+    missing = np.isnan(lat) | np.isnan(lon)
+    if missing.any() and 'county' in parcels:
+        centroids = parcels.loc[missing, 'county'].map(county_centroid)
+        lat[missing] = [c[0] for c in centroids]
+        lon[missing] = [c[1] for c in centroids]
+    return lat, lon
+
+
+def _to_xyz(lat, lon):
+    """经纬度 → 单位球面直角坐标, 使 KD 树的欧氏距离与球面距离单调一致"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _fingerprint(*arrays):
+    h = hashlib.sha1()
+    for a in arrays:
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
+
+def _station_fingerprint(stations, k, power, max_km):
+    """站点表与插值参数的指纹, 任一变化时已保存的权重失效"""
+    k = min(k, len(stations))
+    return _fingerprint(stations['station_id'].astype(str).str.cat(sep=',').encode(),
+                        stations['lat'].to_numpy(dtype=float), stations['lon'].to_numpy(dtype=float),
+                        np.array([k, power, -1 if max_km is None else max_km], dtype=float))
+
+
+def _parcel_fingerprint(parcels):
+    """地块编号与坐标的指纹, 地块位置修改后已保存的权重失效"""
+    lat, lon = parcel_coordinates(parcels)
+    return _fingerprint(parcels['parcel_id'].astype(str).str.cat(sep=',').encode(), lat, lon)
+
+
+def _plain(ids):
+    """object 数组(字符串编号)转成定长 unicode, 以便不依赖 pickle 保存"""
+    ids = np.asarray(ids)
+    return ids.astype(str) if ids.dtype == object else ids
+
+
+class SpatialWeights:
+    """预计算的插值权重: 每个地块对应 k 个数据源(站点或格点)的下标与权重"""
+
+    def __init__(self, parcel_ids, neighbors, weights, source_ids, distances=None, fingerprint=''):
+        self.parcel_ids = np.asarray(parcel_ids)
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.source_ids = np.asarray(source_ids)
+        self.distances = None if distances is None else np.asarray(distances, dtype=np.float32)
+        self.fingerprint = fingerprint
+        # 哈希索引: 按地块编号 O(1) 取行号
+        self._row = pd.Index(self.parcel_ids)
+
+    def rows(self, parcel_ids):
+        rows = self._row.get_indexer(np.atleast_1d(parcel_ids))
+        if (rows < 0).any():
+            raise KeyError(f"未建立空间索引的地块: {np.atleast_1d(parcel_ids)[rows < 0][:5].tolist()}")
+        return rows
+
+    def lookup(self, parcel_id):
+        """单个地块: 返回 (数据源编号数组, 权重数组)"""
+        r = self.rows(parcel_id)[0]
+        return self.source_ids[self.neighbors[r]], self.weights[r]
+
+    def interpolate(self, source_values, parcel_ids=None):
+        """按权重插值
+
+        source_values: (n_sources, ...) 数组, 如 (站点数, 天数) 的降雨量
+        返回 (n_parcels, ...) 数组; parcel_ids 缺省为全部地块; 位置未知的地块为 NaN
+        """
+        rows = slice(None) if parcel_ids is None else self.rows(parcel_ids)
+        idx, w = self.neighbors[rows], self.weights[rows]
+        values = np.asarray(source_values)[idx]          # (n, k, ...)
+        w = w.reshape(w.shape + (1,) * (values.ndim - 2))
+        return (values * w).sum(axis=1)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, parcel_ids=_plain(self.parcel_ids), neighbors=self.neighbors,
+                 weights=self.weights, source_ids=_plain(self.source_ids),
+                 distances=self.distances if self.distances is not None else np.empty(0),
+                 fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            distances = f['distances'] if f['distances'].size else None
+            return cls(f['parcel_ids'], f['neighbors'], f['weights'], f['source_ids'],
+                       distances, str(f['fingerprint']))
+
+
+def build_station_weights(parcels, stations, k=3, power=2.0, max_km=None):
+    """最近 k 个气象站的反距离加权
+
+    parcels: DataFrame, 列 parcel_id 及 lat/lon(或 county)
+    stations: DataFrame, 列 station_id, lat, lon
+    max_km: 超过该距离的站点权重置 0(全部超出时退回最近站点)
+    没有坐标且县名未知的地块(如"其他地区")不参与查询, 其权重与距离为 NaN,
+    插值结果也为 NaN。
+    """
+    p_lat, p_lon = parcel_coordinates(parcels)
+    s_lat = stations['lat'].to_numpy(dtype=float)
+    s_lon = stations['lon'].to_numpy(dtype=float)
+    k = min(k, len(stations))
+    known = ~(np.isnan(p_lat) | np.isnan(p_lon))
+
+    tree = cKDTree(_to_xyz(s_lat, s_lon))
+    chord = np.full((len(parcels), k), np.nan)
+    idx = np.zeros((len(parcels), k), dtype=np.int64)
+    if known.any():
+        c, i = tree.query(_to_xyz(p_lat[known], p_lon[known]), k=k)
+        chord[known], idx[known] = c.reshape(-1, k), i.reshape(-1, k)
+    dist = _chord_to_km(chord)
+
+    with np.errstate(divide='ignore'):
+        w = 1.0 / np.power(dist, power)
+    exact = dist < 1e-6
+    # 地块与站点重合时全部权重给该站点
+    w = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), w)
+    if max_km is not None:
+        far = dist > max_km
+        w = np.where(far & ~far.all(axis=1, keepdims=True), 0.0, w)
+        w[far.all(axis=1), 1:] = 0.0
+    w = w / w.sum(axis=1, keepdims=True)
+
+    fp = _fingerprint(_station_fingerprint(stations, k, power, max_km).encode(),
+                      _parcel_fingerprint(parcels).encode())
+    return SpatialWeights(parcels['parcel_id'].to_numpy(), idx, w, stations['station_id'].to_numpy(),
+                          dist, fp)
+
+
+def build_grid_weights(parcels, lat0, lon0, dlat, dlon, nlat, nlon):
+    """规则格点的双线性插值权重, 格点 (i, j) 中心为 (lat0 + i·dlat, lon0 + j·dlon)
+
+    格点按行优先编号 i·nlon + j, 与 (nlat, nlon) 数组 reshape 后的顺序一致。
+    位置未知的地块指向格点 0, 权重为 NaN(插值结果为 NaN), 与站点权重一致。
+    """
+    p_lat, p_lon = parcel_coordinates(parcels)
+    known = ~(np.isnan(p_lat) | np.isnan(p_lon))
+    fi = np.clip((np.where(known, p_lat, lat0) - lat0) / dlat, 0, nlat - 1)
+    fj = np.clip((np.where(known, p_lon, lon0) - lon0) / dlon, 0, nlon - 1)
+    i0 = np.minimum(np.floor(fi).astype(int), max(nlat - 2, 0))
+    j0 = np.minimum(np.floor(fj).astype(int), max(nlon - 2, 0))
+    ti, tj = fi - i0, fj - j0
+    i1, j1 = np.minimum(i0 + 1, nlat - 1), np.minimum(j0 + 1, nlon - 1)
+
+    neighbors = np.column_stack([i0 * nlon + j0, i0 * nlon + j1, i1 * nlon + j0, i1 * nlon + j1])
+    weights = np.column_stack([(1 - ti) * (1 - tj), (1 - ti) * tj, ti * (1 - tj), ti * tj])
+    weights[~known] = np.nan
+
+    fp = _fingerprint(np.array([lat0, lon0, dlat, dlon, nlat, nlon], dtype=float))
+    return SpatialWeights(parcels['parcel_id'].to_numpy(), neighbors, weights,
+                          np.arange(nlat * nlon), None, fp)
+
+
+def stations_from_store(store, region=None):
+    """从 WeatherStore 站点表取有坐标的站点, 返回 DataFrame(station_id, region, lat, lon)"""
+    coords = store.catalog.get('station_coords', {})
+    regions = store.catalog.get('station_region', {})
+    rows = [(s, regions.get(s), c[0], c[1]) for s, c in coords.items()
+            if region is None or regions.get(s) == region_key(region)]
+    return pd.DataFrame(rows, columns=['station_id', 'region', 'lat', 'lon'])
+
+
+def load_or_build_station_weights(path, parcels, stations, k=3, power=2.0, max_km=None):
+    """优先读取已保存的权重; 站点表/参数、地块编号或坐标变化时重新计算并保存"""
+    path = Path(path)
+    if path.exists():
+        cached = SpatialWeights.load(path)
+        fp = _fingerprint(_station_fingerprint(stations, k, power, max_km).encode(),
+                          _parcel_fingerprint(parcels).encode())
+        if cached.fingerprint == fp:
+            return cached
+    weights = build_station_weights(parcels, stations, k, power, max_km)
+    weights.save(path)
+    return weights
+
+
+def parcel_weather(store, region, parcels, start=None, end=None, columns=('temp_max', 'temp_min', 'rainfall'),
+                   k=3, power=2.0, max_km=None, weights_dir=DEFAULT_WEIGHTS_DIR):
+    """按保单取地块逐日气象: 地区内各站点逐日值按持久化的反距离权重插值
+
+    权重按地区保存在 weights_dir/<地区>.npz, 站点表或地块变化时才重新计算。
+    某站点当天缺测时, 其余站点按权重重新归一。
+    返回 (日期数组, {要素: (n_parcels, n_days) 数组}); 地区没有带坐标的站点或无数据时返回 (None, {})
+    """
+    stations = stations_from_store(store, region)
+    if stations.empty:
+        return None, {}
+    weights = load_or_build_station_weights(Path(weights_dir) / f'{region_key(region)}.npz',
+                                            parcels, stations, k, power, max_km)
+    data = store.query(region, start, end, stations=list(stations['station_id']), columns=list(columns))
+    if not data or not len(data['date']):
+        return None, {}
+
+    names = np.asarray(store.catalog['stations'])[np.asarray(data['station'])]
+    src = pd.Index(weights.source_ids).get_indexer(names)
+    days, day_idx = np.unique(np.asarray(data['date']), return_inverse=True)
+    rows = weights.rows(parcels['parcel_id'].to_numpy())
+    idx, w = weights.neighbors[rows], weights.weights[rows].astype(float)     # (n_parcels, k)
+
+    out = {}
+    for col in columns:
+        if col not in data:
+            continue
+        grid = np.full((len(weights.source_ids), len(days)), np.nan)
+        grid[src, day_idx] = np.asarray(data[col], dtype=float)
+        values = grid[idx]                                                   # (n_parcels, k, n_days)
+        avail = ~np.isnan(values)
+        wk = np.where(avail, w[:, :, None], 0.0)
+        total = wk.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[col] = np.where(total > 0, (np.nan_to_num(values) * wk).sum(axis=1) / total, np.nan)
+    return days, out
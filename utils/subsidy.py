@@ -0,0 +1,189 @@
+"""政府保费补贴支出模拟
+
+首页与政府公益端展示的是固定的 80% 补贴比例和静态总额(如 "¥1.65亿")。
+财政部门需要的是明年补贴支出的分布以及它和赔付的联动: 参保率波动决定保费补贴,
+大灾年份赔付超过封顶赔付率时还需要财政兜底。本模块把补贴分摊规则作用在
+模拟的保单账簿(参保、保费、赔付)上, 按县输出预算分位数。
+
+两种计算方式:
+  - 'moments': 先用 np.bincount 把百万级农户按县聚合成充分统计量, 再按县模拟,
+    与农户数量无关, 适合交互式页面
+  - 'households': 逐农户抽取参保与出险(分块), 结果精确但耗时随农户数线性增长
+"""
+import numpy as np
+import pandas as pd
+
+# 保费分摊比例: 中央+地方财政 80%, 农户自缴 20%
+DEFAULT_SUBSIDY_SPLIT = {
+    '中央财政': 0.45,
+    '省级财政': 0.25,
+    '市县财政': 0.10,
+}
+
+
+def aggregate_book(households, counties=None):
+    """按县聚合农户账簿的充分统计量
+
+    households: DataFrame, 列 county, premium(全额保费, 元), sum_insured(保额, 元)
+    返回 DataFrame(index 为县): 农户数, 保费合计, 保费平方和, 保额合计, 保额平方和
+    """
+    codes, uniques = pd.factorize(households['county'])
+    if counties is None:
+        counties = list(uniques)
+    else:
+        _check_counties(uniques, counties)
+        remap = pd.Index(counties).get_indexer(uniques)
+        codes = remap[codes]
+    k = len(counties)
+
+    premium = households['premium'].to_numpy(dtype=float)
+    insured = households['sum_insured'].to_numpy(dtype=float)
+    return pd.DataFrame({
+        '农户数': np.bincount(codes, minlength=k),
+        '保费合计': np.bincount(codes, weights=premium, minlength=k),
+        '保费平方和': np.bincount(codes, weights=premium**2, minlength=k),
+        '保额合计': np.bincount(codes, weights=insured, minlength=k),
+        '保额平方和': np.bincount(codes, weights=insured**2, minlength=k),
+    }, index=pd.Index(counties, name='county'))
+
+
+def _check_counties(county_values, counties):
+    """农户账簿中的县必须都在参数表里, 否则其保费与赔付会被漏算或记到别的县"""
+    missing = pd.Index(pd.unique(pd.Series(county_values))).difference(pd.Index(counties))
+    if len(missing):
+        raise ValueError(f"县级参数缺少以下县: {list(missing)}")
+
+
+def _county_shocks(rng, params, n_sims):
+    """县级共同冲击: 参保率(Beta)与出险频率(对数正态), 形状 (n_sims, n_counties)"""
+    mean = params['enroll_rate'].to_numpy(dtype=float)
+    sd = params['enroll_sd'].to_numpy(dtype=float)
+    # Beta 分布矩估计, sd 过大时截断到可行区域
+    var = np.minimum(sd**2, mean * (1 - mean) * 0.99)
+    conc = np.where(var > 0, mean * (1 - mean) / np.maximum(var, 1e-12) - 1, 1e6)
+    enroll = rng.beta(mean * conc, (1 - mean) * conc, size=(n_sims, len(mean)))
+
+    freq = params['claim_freq'].to_numpy(dtype=float)
+    cat_sd = params['cat_sd'].to_numpy(dtype=float)
+    freq_shock = np.exp(cat_sd * rng.standard_normal((n_sims, len(freq))) - 0.5 * cat_sd**2)
+    claim_freq = np.clip(freq * freq_shock, 0, 1)
+    return enroll, claim_freq
+
+
+def simulate_subsidy_outlay(
+    households,
+    county_params,
+    n_sims=2000,
+    split=None,
+    stop_loss_ratio=None,
+    stop_loss_payer='省级财政',
+    method='moments',
+    household_chunk=500000,
+    seed=None,
+):
+    """模拟下一年度补贴支出分布
+
+    households: DataFrame, 列 county, premium, sum_insured
+    county_params: DataFrame(index 为县), 列
+        - enroll_rate: 预期参保率
+        - enroll_sd: 参保率标准差(县级)
+        - claim_freq: 预期出险概率
+        - cat_sd: 出险频率的县级对数波动(大灾年份)
+        - damage_mean: 出险时平均损失率(占保额)
+        - damage_sd: 损失率标准差
+    split: 各级财政分摊比例, 默认 DEFAULT_SUBSIDY_SPLIT
+    stop_loss_ratio: 封顶赔付率, 如 1.5 表示赔付超过保费 150% 的部分由财政兜底;
+        None 表示不兜底
+    stop_loss_payer: 兜底支出计入的财政层级
+
+    返回 dict:
+        summary: DataFrame, 每县每个财政层级的 均值/P50/P90/P95/P99
+        outlay: {层级: (n_sims, n_counties)} 支出模拟值
+        premium, claims: (n_sims, n_counties) 参保保费与赔付
+        counties: 县名列表
+    """
+    split = DEFAULT_SUBSIDY_SPLIT if split is None else split
+    rng = np.random.default_rng(seed)
+
+    counties = list(county_params.index)
+    _check_counties(households['county'], counties)
+    params = county_params.loc[counties]
+    enroll, claim_freq = _county_shocks(rng, params, n_sims)
+
+    dmg_mean = params['damage_mean'].to_numpy(dtype=float)
+    dmg_sd = params['damage_sd'].to_numpy(dtype=float)
+
+    if method == 'moments':
+        book = aggregate_book(households, counties)
+        P, P2 = book['保费合计'].to_numpy(), book['保费平方和'].to_numpy()
+        S, S2 = book['保额合计'].to_numpy(), book['保额平方和'].to_numpy()
+
+        # 参保保费: 独立伯努利之和的正态近似
+        prem_mean = enroll * P
+        prem_var = enroll * (1 - enroll) * P2
+        premium = np.maximum(prem_mean + np.sqrt(prem_var) * rng.standard_normal(enroll.shape), 0)
+
+        # 赔付: 参保 × 出险 × 损失率 × 保额 之和的正态近似
+        q = enroll * claim_freq
+        d2 = dmg_sd**2 + dmg_mean**2
+        claim_mean = q * dmg_mean * S
+        claim_var = np.maximum(q * d2 - (q * dmg_mean)**2, 0) * S2
+        claims = np.maximum(claim_mean + np.sqrt(claim_var) * rng.standard_normal(enroll.shape), 0)
+
+    elif method == 'households':
+        codes = pd.Index(counties).get_indexer(households['county'])
+        prem_all = households['premium'].to_numpy(dtype=float)
+        insured_all = households['sum_insured'].to_numpy(dtype=float)
+        k = len(counties)
+
+        # 损失率 Beta 分布矩估计
+        var = np.minimum(dmg_sd**2, dmg_mean * (1 - dmg_mean) * 0.99)
+        conc = np.where(var > 0, dmg_mean * (1 - dmg_mean) / np.maximum(var, 1e-12) - 1, 1e6)
+        alpha, beta = dmg_mean * conc, (1 - dmg_mean) * conc
+
+        premium = np.zeros((n_sims, k))
+        claims = np.zeros((n_sims, k))
+        for s in range(n_sims):
+            for c0 in range(0, len(codes), household_chunk):
+                c = codes[c0:c0 + household_chunk]
+                enrolled = rng.random(len(c)) < enroll[s, c]
+                hit = enrolled & (rng.random(len(c)) < claim_freq[s, c])
+                damage = np.zeros(len(c))
+                if hit.any():
+                    damage[hit] = rng.beta(alpha[c[hit]], beta[c[hit]])
+                premium[s] += np.bincount(c, weights=prem_all[c0:c0 + household_chunk] * enrolled, minlength=k)
+                claims[s] += np.bincount(c, weights=insured_all[c0:c0 + household_chunk] * damage, minlength=k)
+    else:
+        raise ValueError(f"未知的计算方式: {method}")
+
+    outlay = {level: premium * share for level, share in split.items()}
+    if stop_loss_ratio is not None:
+        excess = np.maximum(claims - stop_loss_ratio * premium, 0)
+        outlay['大灾兜底'] = excess
+        if stop_loss_payer in outlay:
+            outlay[stop_loss_payer] = outlay[stop_loss_payer] + excess
+    total = sum(premium * share for share in split.values())
+    if stop_loss_ratio is not None:
+        total = total + outlay['大灾兜底']
+    outlay['财政合计'] = total
+
+    rows = []
+    for level, values in outlay.items():
+        pct = np.percentile(values, [50, 90, 95, 99], axis=0)
+        for j, county in enumerate(counties + ['全部']):
+            col = values[:, j] if j < len(counties) else values.sum(axis=1)
+            p = pct[:, j] if j < len(counties) else np.percentile(col, [50, 90, 95, 99])
+            rows.append({
+                '县域': county,
+                '财政层级': level,
+                '均值': col.mean(),
+                'P50': p[0], 'P90': p[1], 'P95': p[2], 'P99': p[3],
+            })
+
+    return {
+        'summary': pd.DataFrame(rows),
+        'outlay': outlay,
+        'premium': premium,
+        'claims': claims,
+        'counties': counties,
+    }
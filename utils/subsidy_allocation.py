@@ -0,0 +1,164 @@
+"""补贴资金池分配优化: 县 × 作物 稀疏线性规划
+
+政府公益端需要把有上限的补贴资金池分配到各县(武鸣、灵山、扶绥……)的各个作物上。
+决策变量为每个 县×作物 单元获得的补贴金额, 目标是最大化加权覆盖面积,
+约束包括资金池上限、各县上限与各县覆盖率目标(目标用带惩罚的松弛变量表达,
+资金不足时依然可行)。用 scipy.optimize.linprog(HiGHS) 求解。
+
+scipy 的 HiGHS 接口不接受初始基, 无法真正热启动; 这里的"热启动"做法是:
+  - 稀疏约束矩阵只在单元集合变化时构建一次, 改参数只重建右端项/边界/目标向量
+  - 改资金池或县上限时, 若原约束未起作用且上一轮解仍可行, 直接复用上一轮解
+  - 已求解过的参数组合缓存结果, 来回拖动滑块时不重复求解
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+
+class SubsidyAllocator:
+    """补贴分配求解器, 保留上一轮结构与解以便交互式重算
+
+    cells: DataFrame, 每行一个 县×作物 单元, 列
+        - county, crop
+        - eligible_area: 可参保面积(亩)
+        - subsidy_per_mu: 每亩补贴金额(元) = 每亩保费 × 补贴比例, 必须大于 0
+        - weight: 覆盖1亩的权重(如脱贫县、主粮作物可取更高), 缺省为 1
+    """
+
+    def __init__(self, cells, cache_size=64):
+        self.cells = cells.reset_index(drop=True)
+        self.counties = list(dict.fromkeys(self.cells['county']))
+        county_idx = pd.Index(self.counties).get_indexer(self.cells['county'])
+        n_cells, n_counties = len(self.cells), len(self.counties)
+
+        self.unit_cost = self.cells['subsidy_per_mu'].to_numpy(dtype=float)
+        if not (self.unit_cost > 0).all():
+            bad = self.cells.loc[~(self.unit_cost > 0), ['county', 'crop']]
+            raise ValueError(f"每亩补贴金额必须大于 0: {bad.to_dict('records')}")
+        self.need = self.cells['eligible_area'].to_numpy(dtype=float) * self.unit_cost
+        weight = (self.cells['weight'].to_numpy(dtype=float)
+                  if 'weight' in self.cells else np.ones(n_cells))
+        self.value_per_yuan = weight / self.unit_cost
+
+        # 县聚合矩阵 G: (n_counties, n_cells), G[c, i] = 1 表示单元 i 属于县 c
+        self.G = sparse.csr_matrix((np.ones(n_cells), (county_idx, np.arange(n_cells))),
+                                   shape=(n_counties, n_cells))
+        # 县内覆盖面积 = G · diag(1/unit_cost) · x
+        self.G_area = self.G @ sparse.diags(1.0 / self.unit_cost)
+        self.county_area = np.asarray(self.G @ self.cells['eligible_area'].to_numpy(dtype=float)).ravel()
+
+        # 约束结构: 变量 [x (n_cells), slack (n_counties)]
+        #   资金池:   1ᵀx                 ≤ pool
+        #   县上限:   G x                 ≤ county_cap
+        #   覆盖目标: -G_area x - slack   ≤ -target × county_area
+        I = sparse.identity(n_counties, format='csr')
+        Z = sparse.csr_matrix((n_counties, n_counties))
+        self.A_ub = sparse.vstack([
+            sparse.hstack([sparse.csr_matrix(np.ones((1, n_cells))), sparse.csr_matrix((1, n_counties))]),
+            sparse.hstack([self.G, Z]),
+            sparse.hstack([-self.G_area, -I]),
+        ], format='csr')
+
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self.last = None
+        self.solve_count = 0
+
+    def _key(self, pool, county_cap, target, penalty):
+        return (float(pool), tuple(np.round(county_cap, 2)), tuple(np.round(target, 6)), float(penalty))
+
+    def solve(self, pool, county_cap=None, target=0.6, penalty=10.0):
+        """求解分配方案
+
+        pool: 资金池总额(元)
+        county_cap: 各县补贴上限(元), 标量或按 self.counties 顺序的数组, 缺省不设上限
+        target: 各县覆盖率目标(占可参保面积), 标量或数组
+        penalty: 覆盖目标每缺 1 亩的惩罚(相对目标函数单位), 越大越优先满足目标
+
+        返回 dict: allocation(单元分配表), county(县汇总), status, reused(是否复用)
+        """
+        n_cells, n_counties = len(self.cells), len(self.counties)
+        county_cap = np.broadcast_to(np.inf if county_cap is None else county_cap,
+                                     (n_counties,)).astype(float)
+        target = np.broadcast_to(target, (n_counties,)).astype(float)
+
+        key = self._key(pool, county_cap, target, penalty)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.last = self._cache[key]
+            return dict(self.last, reused=True)
+
+        reused = self._try_reuse(pool, county_cap, target, penalty)
+        if reused is not None:
+            result = reused
+        else:
+            c = np.concatenate([-self.value_per_yuan, np.full(n_counties, penalty)])
+            b_ub = np.concatenate([[pool], np.where(np.isfinite(county_cap), county_cap, 1e18),
+                                   -target * self.county_area])
+            bounds = np.column_stack([np.zeros(n_cells + n_counties),
+                                      np.concatenate([self.need, np.full(n_counties, np.inf)])])
+            res = linprog(c, A_ub=self.A_ub, b_ub=b_ub, bounds=bounds, method='highs')
+            self.solve_count += 1
+            if not res.success:
+                return {'status': res.message, 'allocation': None, 'county': None, 'reused': False}
+            result = self._package(res.x[:n_cells], pool, county_cap, target, penalty,
+                                   pool_dual=res.ineqlin.marginals[0])
+
+        self._cache[key] = result
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        self.last = result
+        return dict(result, reused=reused is not None)
+
+    def _try_reuse(self, pool, county_cap, target, penalty):
+        """资金池/县上限变化时, 若原约束不起作用且上一轮解仍可行, 则直接复用"""
+        last = self.last
+        if last is None or last['penalty'] != penalty or not np.array_equal(last['target'], target):
+            return None
+        x = last['x']
+        used = x.sum()
+        county_used = np.asarray(self.G @ x).ravel()
+
+        pool_slack_before = last['pool'] - used > 1e-6
+        caps_slack_before = np.all(last['county_cap'] - county_used > 1e-6)
+        feasible_now = used <= pool + 1e-6 and np.all(county_used <= county_cap + 1e-6)
+        # 上一轮资金池与县上限都没有起作用: 放宽或在余量内收紧都不改变最优解
+        if pool_slack_before and caps_slack_before and feasible_now:
+            return self._package(x, pool, county_cap, target, penalty, pool_dual=0.0)
+        return None
+
+    def _package(self, x, pool, county_cap, target, penalty, pool_dual):
+        area = x / self.unit_cost
+        allocation = self.cells[['county', 'crop']].copy()
+        allocation['补贴金额'] = x
+        allocation['覆盖面积'] = area
+        allocation['覆盖率'] = np.divide(area, self.cells['eligible_area'].to_numpy(dtype=float),
+                                      out=np.zeros_like(area),
+                                      where=self.cells['eligible_area'].to_numpy() > 0)
+
+        county_amount = np.asarray(self.G @ x).ravel()
+        county_area = np.asarray(self.G_area @ x).ravel()
+        county = pd.DataFrame({
+            '县域': self.counties,
+            '补贴金额': county_amount,
+            '覆盖面积': county_area,
+            '覆盖率': county_area / np.maximum(self.county_area, 1e-12),
+            '覆盖目标': target,
+        })
+        county['达标'] = county['覆盖率'] >= county['覆盖目标'] - 1e-9
+
+        return {
+            'status': 'optimal',
+            'allocation': allocation,
+            'county': county,
+            'x': x,
+            'pool': float(pool),
+            'county_cap': county_cap,
+            'target': target,
+            'penalty': penalty,
+            # 资金池影子价格: 每多 1 元资金池带来的目标函数增量
+            'pool_shadow_price': -float(pool_dual),
+        }
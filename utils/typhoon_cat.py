@@ -0,0 +1,245 @@
+"""台风巨灾模型: 路径 → 风雨足迹 → 承保标的损失
+
+保险公司端的"台风预警: 钦州地区预计3天内受影响"只是一行文字。本模块实现一个
+简化的巨灾模型链条:
+  1. 路径: 历史路径表, 或按经验分布生成的合成路径(每6小时一个点)
+  2. 足迹: 每个路径点按修正 Rankine 涡旋计算风速, 取全过程最大风速;
+     降雨按距中心距离衰减逐点累加
+  3. 暴露: 投保地块经 spatial_index 的格点双线性权重汇总到网格, 足迹只在
+     有暴露的格点上计算
+  4. 易损性: 按作物的风速/雨量损失率曲线
+  5. 输出: 事件损失表(ELT) 与 PML 曲线(OEP/AEP)
+事件按块向量化计算, 多个事件块用线程池并行(numpy 运算期间释放 GIL)。
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.spatial_index import build_grid_weights
+
+# 足迹网格: 覆盖广西, 0.1° 分辨率
+GUANGXI_GRID = {'lat0': 20.5, 'lon0': 104.0, 'dlat': 0.1, 'dlon': 0.1, 'nlat': 61, 'nlon': 86}
+
+STEP_HOURS = 6
+
+# 作物易损性: 风速起损点/半损点(m/s), 雨量起损点/全损点(mm), 雨灾最大损失率
+VULNERABILITY = pd.DataFrame({
+    'v_thresh': [18.0, 15.0, 18.0, 17.0, 20.0, 17.0],
+    'v_half': [45.0, 35.0, 42.0, 40.0, 50.0, 42.0],
+    'rain_thresh': [150.0, 200.0, 120.0, 150.0, 150.0, 150.0],
+    'rain_full': [500.0, 600.0, 450.0, 500.0, 550.0, 500.0],
+    'rain_max': [0.4, 0.3, 0.5, 0.4, 0.3, 0.4],
+}, index=pd.Index(['沃柑', '甘蔗', '荔枝', '芒果', '火龙果', '其他'], name='crop'))
+
+
+# ==================== 路径 ====================
+
+def synthetic_tracks(n_years, annual_rate=2.5, n_steps=40, seed=None):
+    """生成影响广西的合成台风路径
+
+    年发生数服从泊松分布; 生成点在南海/西太平洋, 向西北移动, 登陆后强度衰减。
+    返回 DataFrame: event_id, year, step, lat, lon, vmax(m/s), rmw(km)
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(annual_rate, n_years)
+    n = counts.sum()
+    year = np.repeat(np.arange(n_years), counts)
+
+    lat = np.empty((n, n_steps))
+    lon = np.empty((n, n_steps))
+    vmax = np.empty((n, n_steps))
+    lat[:, 0] = rng.uniform(15.0, 20.0, n)
+    lon[:, 0] = rng.uniform(110.0, 119.0, n)
+    vmax[:, 0] = rng.uniform(20.0, 55.0, n)
+    heading = np.radians(rng.normal(300.0, 15.0, n))      # 方位角, 300° 即西北偏西
+    speed_km = rng.uniform(12.0, 25.0, n) * STEP_HOURS
+
+    for s in range(1, n_steps):
+        heading = heading + np.radians(rng.normal(0.0, 6.0, n))
+        dy = speed_km * np.cos(heading) / 110.57
+        dx = speed_km * np.sin(heading) / (111.32 * np.cos(np.radians(lat[:, s - 1])))
+        lat[:, s] = lat[:, s - 1] + dy
+        lon[:, s] = lon[:, s - 1] + dx
+        # 粗略的陆地判断: 北部湾以北、雷州半岛以西视为陆地, 登陆后每步衰减
+        on_land = (lat[:, s] > 21.6) | ((lon[:, s] < 110.5) & (lat[:, s] > 20.2) & (lon[:, s] > 108.5))
+        decay = np.where(on_land, 0.85, 1.0 + rng.normal(0.02, 0.03, n))
+        vmax[:, s] = np.clip(vmax[:, s - 1] * decay, 0.0, 75.0)
+
+    rmw = np.clip(rng.lognormal(np.log(35.0), 0.3, n), 10.0, 120.0)
+    return pd.DataFrame({
+        'event_id': np.repeat(np.arange(n), n_steps),
+        'year': np.repeat(year, n_steps),
+        'step': np.tile(np.arange(n_steps), n),
+        'lat': lat.ravel(), 'lon': lon.ravel(), 'vmax': vmax.ravel(),
+        'rmw': np.repeat(rmw, n_steps),
+    })
+
+
+def pad_tracks(tracks):
+    """路径表 → 按事件对齐的 (n_events, max_steps) 数组, 不足的步填 nan"""
+    tracks = tracks.sort_values(['event_id', 'step'])
+    event_ids, codes = np.unique(tracks['event_id'].to_numpy(), return_inverse=True)
+    pos = tracks.groupby('event_id').cumcount().to_numpy()
+    shape = (len(event_ids), pos.max() + 1)
+    out = {}
+    for col in ('lat', 'lon', 'vmax'):
+        arr = np.full(shape, np.nan)
+        arr[codes, pos] = tracks[col].to_numpy(dtype=float)
+        out[col] = arr
+    rmw = tracks['rmw'].to_numpy(dtype=float) if 'rmw' in tracks else np.full(len(tracks), 35.0)
+    out['rmw'] = np.full(len(event_ids), 35.0)
+    out['rmw'][codes] = rmw
+    first = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    out['year'] = (tracks['year'].to_numpy()[first] if 'year' in tracks else np.zeros(len(event_ids), int))
+    out['event_id'] = event_ids
+    return out
+
+
+# ==================== 足迹 ====================
+
+def wind_rain_footprint(lat, lon, vmax, rmw, cell_lat, cell_lon, rain_rate=30.0, rain_scale_km=200.0,
+                        cutoff_km=500.0):
+    """一块事件在给定格点上的最大风速与累计雨量
+
+    lat/lon/vmax: (n_events, n_steps), rmw: (n_events,)
+    cell_lat/cell_lon: (n_cells,)
+    cutoff_km: 路径点离格点范围超过该距离时忽略(此处风速、雨量已远低于起损点)
+    返回 (max_wind, total_rain), 形状均为 (n_events, n_cells), float32
+    """
+    n_events, n_steps = lat.shape
+    cell_lat = np.asarray(cell_lat, dtype=np.float32)
+    cell_lon = np.asarray(cell_lon, dtype=np.float32)
+    kx = np.float32(111.32) * np.cos(np.radians(cell_lat))
+    max_wind = np.zeros((n_events, len(cell_lat)), dtype=np.float32)
+    total_rain = np.zeros((n_events, len(cell_lat)), dtype=np.float32)
+    if len(cell_lat) == 0:
+        return max_wind, total_rain
+
+    # 先按到格点外包矩形的距离筛掉远处的路径点, 只对近处的 (事件, 时刻) 计算
+    mid_cos = np.cos(np.radians(0.5 * (cell_lat.min() + cell_lat.max())))
+    gap_y = np.maximum.reduce([cell_lat.min() - lat, lat - cell_lat.max(), np.zeros_like(lat)]) * 110.57
+    gap_x = np.maximum.reduce([cell_lon.min() - lon, lon - cell_lon.max(), np.zeros_like(lon)]) * 111.32 * mid_cos
+    with np.errstate(invalid='ignore'):
+        near = (np.hypot(gap_x, gap_y) <= cutoff_km) & (vmax > 0)
+
+    for s in np.flatnonzero(near.any(axis=0)):
+        idx = np.flatnonzero(near[:, s])
+        c_lat = lat[idx, s].astype(np.float32)[:, None]
+        c_lon = lon[idx, s].astype(np.float32)[:, None]
+        v = vmax[idx, s].astype(np.float32)[:, None]
+        r_m = rmw[idx].astype(np.float32)[:, None]
+        r = np.hypot((cell_lon - c_lon) * kx, (cell_lat - c_lat) * np.float32(110.57))
+        # 修正 Rankine 涡旋: 最大风速半径内线性增加, 外侧按 (rmw/r)^0.6 衰减
+        wind = np.where(r < r_m, v * r / r_m, v * (r_m / np.maximum(r, 1e-6)) ** np.float32(0.6))
+        max_wind[idx] = np.maximum(max_wind[idx], wind)
+        total_rain[idx] += rain_rate * (v / 40.0) * np.exp(-r / np.float32(rain_scale_km))
+    return max_wind, total_rain
+
+
+def damage_ratio(wind, rain, vuln):
+    """风、雨损失率合成: 1 - (1-风灾)(1-雨灾), vuln 为 VULNERABILITY 的一行"""
+    x = np.maximum(wind - vuln['v_thresh'], 0.0) / (vuln['v_half'] - vuln['v_thresh'])
+    x3 = x * x * x
+    wind_dmg = x3 / (1.0 + x3)
+    rain_dmg = vuln['rain_max'] * np.clip((rain - vuln['rain_thresh'])
+                                          / (vuln['rain_full'] - vuln['rain_thresh']), 0.0, 1.0)
+    return 1.0 - (1.0 - wind_dmg) * (1.0 - rain_dmg)
+
+
+# ==================== 暴露 ====================
+
+def grid_exposure(exposures, grid=None, vulnerability=None):
+    """把投保标的按双线性权重分摊到网格, 只保留有暴露的格点
+
+    exposures: DataFrame, 列 sum_insured, crop, 以及 lat/lon 或 county(parcel_id 可缺省);
+        没有坐标且县名未知的标的不计入
+    返回 (格点纬度, 格点经度, 暴露矩阵 (n_cells, n_crops)), 矩阵列顺序同 vulnerability.index
+    """
+    grid = GUANGXI_GRID if grid is None else grid
+    vulnerability = VULNERABILITY if vulnerability is None else vulnerability
+    exposures = exposures.reset_index(drop=True)
+    if 'parcel_id' not in exposures:
+        exposures = exposures.assign(parcel_id=np.arange(len(exposures)))
+    weights = build_grid_weights(exposures, **grid)
+
+    crop = exposures['crop'].to_numpy() if 'crop' in exposures else np.full(len(exposures), '其他')
+    crop_idx = vulnerability.index.get_indexer(crop)
+    crop_idx = np.where(crop_idx < 0, vulnerability.index.get_loc('其他'), crop_idx)
+
+    n_crops = len(vulnerability)
+    # 位置未知的标的(权重为 NaN)不分摊到任何格点, 不影响同格点其他标的的暴露
+    amount = np.nan_to_num(exposures['sum_insured'].to_numpy(dtype=float)[:, None] * weights.weights)
+    flat = weights.neighbors.astype(np.int64) * n_crops + crop_idx[:, None]
+    cells, inverse = np.unique(flat // n_crops, return_inverse=True)
+    matrix = np.zeros((len(cells), n_crops))
+    np.add.at(matrix, (inverse.reshape(flat.shape), np.broadcast_to(crop_idx[:, None], flat.shape)), amount)
+
+    keep = matrix.sum(axis=1) > 0
+    cells, matrix = cells[keep], matrix[keep]
+    i, j = np.divmod(cells, grid['nlon'])
+    return grid['lat0'] + i * grid['dlat'], grid['lon0'] + j * grid['dlon'], matrix
+
+
+# ==================== 损失与 PML ====================
+
+def _chunk_losses(padded, sl, cell_lat, cell_lon, matrix, vulnerability):
+    wind, rain = wind_rain_footprint(padded['lat'][sl], padded['lon'][sl], padded['vmax'][sl],
+                                     padded['rmw'][sl], cell_lat, cell_lon)
+    n = wind.shape[0]
+    loss = np.zeros(n)
+    # 绝大多数 (事件, 格点) 风雨都在起损点以下, 只对可能有损失的位置计算损失率
+    hit = np.flatnonzero((wind > vulnerability['v_thresh'].min()).ravel()
+                         | (rain > vulnerability['rain_thresh'].min()).ravel())
+    if len(hit):
+        row, cell = np.divmod(hit, wind.shape[1])
+        w, r = wind.ravel()[hit], rain.ravel()[hit]
+        for c, (_, vuln) in enumerate(vulnerability.iterrows()):
+            if matrix[:, c].any():
+                loss += np.bincount(row, weights=damage_ratio(w, r, vuln) * matrix[cell, c], minlength=n)
+    return loss, wind.max(axis=1, initial=0.0), rain.max(axis=1, initial=0.0)
+
+
+def event_loss_table(tracks, exposures, grid=None, vulnerability=None, chunk_size=100, max_workers=4):
+    """计算事件损失表
+
+    tracks: synthetic_tracks 或同格式的历史路径表
+    exposures: 见 grid_exposure
+    返回 DataFrame: event_id, year, loss, max_wind(暴露点最大风速), max_rain(暴露点最大雨量)
+    """
+    vulnerability = VULNERABILITY if vulnerability is None else vulnerability
+    padded = pad_tracks(tracks)
+    cell_lat, cell_lon, matrix = grid_exposure(exposures, grid, vulnerability)
+    n = len(padded['event_id'])
+    slices = [slice(s, min(s + chunk_size, n)) for s in range(0, n, chunk_size)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(
+            lambda sl: _chunk_losses(padded, sl, cell_lat, cell_lon, matrix, vulnerability), slices))
+
+    loss, wind, rain = (np.concatenate([r[k] for r in results]) if results else np.empty(0)
+                        for k in range(3))
+    return pd.DataFrame({'event_id': padded['event_id'], 'year': padded['year'],
+                         'loss': loss, 'max_wind': wind, 'max_rain': rain})
+
+
+def pml_curve(elt, n_years, return_periods=(5, 10, 20, 50, 100, 200, 250)):
+    """由事件损失表计算 PML 曲线
+
+    OEP: 年最大单次事件损失的分位数; AEP: 年累计损失的分位数
+    没有事件的年份损失为 0, 因此需要传入模拟总年数 n_years。
+    """
+    years = elt['year'].to_numpy(dtype=np.int64)
+    loss = elt['loss'].to_numpy(dtype=float)
+    annual_max = np.zeros(n_years)
+    np.maximum.at(annual_max, years, loss)
+    annual_sum = np.bincount(years, weights=loss, minlength=n_years)
+
+    rp = np.asarray(return_periods, dtype=float)
+    q = 1.0 - 1.0 / rp
+    return pd.DataFrame({
+        '重现期(年)': rp.astype(int),
+        '超越概率': 1.0 / rp,
+        'OEP损失': np.quantile(annual_max, q),
+        'AEP损失': np.quantile(annual_sum, q),
+    })
@@ -0,0 +1,156 @@
+"""极端天气分类(向量化)
+
+农户端原先用 DataFrame.apply(axis=1) 逐行判断 高温/暴雨, 降雨着色也逐元素 apply。
+这里改为纯数组运算: 阈值按 作物 × 生育期 查表后广播到每一行, 用 np.select
+一次得到标签, 可以每秒处理数百万 地块×日 记录, 同时供看板绘图和预警系统使用。
+"""
+import numpy as np
+import pandas as pd
+
+# 分类标签(按优先级从高到低, 同时满足多个条件时取靠前的)
+LABELS = np.array(['高温', '暴雨', '低温', '大雨', '正常'])
+NORMAL = len(LABELS) - 1
+
+# 默认阈值: 与农户端图表中的阈值线一致
+DEFAULT_THRESHOLDS = {
+    'heat': 35.0,        # 日最高温(°C)
+    'heavy_rain': 50.0,  # 暴雨(mm/日)
+    'rain': 25.0,        # 大雨(mm/日)
+    'cold': 5.0,         # 日最低温(°C)
+}
+
+# 作物 × 生育期 的阈值调整, 未列出的沿用默认阈值
+CROP_STAGE_THRESHOLDS = {
+    ('沃柑', '花期'): {'heat': 33.0, 'heavy_rain': 40.0},
+    ('沃柑', '果实膨大期'): {'heat': 36.0},
+    ('荔枝', '花期'): {'heat': 32.0, 'heavy_rain': 40.0, 'cold': 8.0},
+    ('荔枝', '成熟期'): {'heavy_rain': 45.0},
+    ('芒果', '花期'): {'heat': 34.0, 'cold': 10.0},
+    ('火龙果', '开花结果期'): {'heat': 38.0, 'cold': 8.0},
+    ('甘蔗', '伸长期'): {'heat': 38.0, 'heavy_rain': 60.0},
+}
+
+# 广西主要作物生育期日历: 作物 → [(起 月-日, 止 月-日, 生育期)], 闭区间, 未覆盖的日期无特定生育期
+CROP_STAGE_CALENDAR = {
+    '沃柑': [('03-01', '04-15', '花期'), ('06-01', '09-30', '果实膨大期')],
+    '荔枝': [('02-15', '03-31', '花期'), ('05-20', '07-15', '成熟期')],
+    '芒果': [('01-15', '03-15', '花期')],
+    '火龙果': [('05-01', '10-31', '开花结果期')],
+    '甘蔗': [('06-01', '09-30', '伸长期')],
+}
+
+# 降雨量着色, 与农户端降雨柱状图一致
+RAIN_COLORS = np.array(['lightblue', 'orange', 'red'])
+
+
+def threshold_table(overrides=None):
+    """阈值表: DataFrame(index 为 (crop, stage)), 列为各阈值"""
+    table = dict(CROP_STAGE_THRESHOLDS)
+    if overrides:
+        table.update(overrides)
+    rows = {key: {**DEFAULT_THRESHOLDS, **value} for key, value in table.items()}
+    df = pd.DataFrame.from_dict(rows, orient='index')
+    df.index = pd.MultiIndex.from_tuples(df.index, names=['crop', 'stage'])
+    return df
+
+
+def growth_stage(crop, dates):
+    """按生育期日历返回每个日期所处的生育期(无特定生育期为 ''), crop 为标量或与 dates 等长的数组"""
+    dates = pd.DatetimeIndex(dates)
+    mmdd = dates.month.to_numpy() * 100 + dates.day.to_numpy()
+    crop = np.broadcast_to(np.asarray(crop, dtype=object), mmdd.shape)
+    stage = np.full(mmdd.shape, '', dtype=object)
+    for name, periods in CROP_STAGE_CALENDAR.items():
+        is_crop = crop == name
+        for start, end, label in periods:
+            lo, hi = (int(x.replace('-', '')) for x in (start, end))
+            stage[is_crop & (mmdd >= lo) & (mmdd <= hi)] = label
+    return stage
+
+
+def lookup_thresholds(crop=None, stage=None, n=None, table=None):
+    """把阈值广播到每一行, 返回 {阈值名: (n,) 数组}
+
+    crop / stage 可以是标量或与数据等长的数组; 都缺省时返回标量默认阈值。
+    作物、生育期分别 factorize 成整数编码, 在 (作物数 × 生育期数) 的小表上查阈值,
+    再用组合编码一次取出, 不逐行访问字典。
+    """
+    if crop is None and stage is None:
+        return {k: np.float32(v) for k, v in DEFAULT_THRESHOLDS.items()}
+
+    table = threshold_table() if table is None else table
+    if np.ndim(crop) == 0 and np.ndim(stage) == 0:
+        key = (crop if crop is not None else '', stage if stage is not None else '')
+        row = table.loc[key] if key in table.index else DEFAULT_THRESHOLDS
+        return {k: np.float32(row[k] if k in row else v) for k, v in DEFAULT_THRESHOLDS.items()}
+
+    crop_codes, crop_uniq = pd.factorize(np.broadcast_to(
+        np.asarray(crop if crop is not None else '', dtype=object), (n,)))
+    stage_codes, stage_uniq = pd.factorize(np.broadcast_to(
+        np.asarray(stage if stage is not None else '', dtype=object), (n,)))
+
+    grid = pd.MultiIndex.from_product([crop_uniq, stage_uniq])
+    pos = table.index.get_indexer(grid)
+    combined = crop_codes.astype(np.int64) * len(stage_uniq) + stage_codes
+
+    out = {}
+    for name, default in DEFAULT_THRESHOLDS.items():
+        per_key = np.full(len(grid), default, dtype=np.float32)
+        if name in table:
+            hit = pos >= 0
+            per_key[hit] = table[name].to_numpy(dtype=np.float32)[pos[hit]]
+        out[name] = per_key[combined]
+    return out
+
+
+def classify_codes(temp_max, rainfall, temp_min=None, crop=None, stage=None, table=None):
+    """返回每行的标签编码(LABELS 下标), 形状与输入相同"""
+    temp_max = np.asarray(temp_max)
+    rainfall = np.asarray(rainfall)
+    th = lookup_thresholds(crop, stage, temp_max.size, table)
+
+    conditions = [
+        temp_max > th['heat'],
+        rainfall > th['heavy_rain'],
+        (np.asarray(temp_min) < th['cold']) if temp_min is not None else np.zeros(temp_max.shape, bool),
+        rainfall > th['rain'],
+    ]
+    return np.select(conditions, np.arange(len(conditions), dtype=np.int8), default=NORMAL).astype(np.int8)
+
+
+def classify_extreme(temp_max, rainfall, temp_min=None, crop=None, stage=None, table=None):
+    """极端天气分类, 返回 (标签数组, 是否极端数组)
+
+    是否极端只看 高温/暴雨/低温, 大雨 仅用于提示和着色。
+    """
+    codes = classify_codes(temp_max, rainfall, temp_min, crop, stage, table)
+    return LABELS[codes], codes <= 2
+
+
+def classify_frame(df, crop_col='crop', stage_col='stage', table=None):
+    """对 DataFrame 整列分类, 新增 extreme_type / is_extreme 两列(原地修改并返回)"""
+    crop = df[crop_col].to_numpy() if crop_col in df else None
+    stage = df[stage_col].to_numpy() if stage_col in df else None
+    labels, is_extreme = classify_extreme(
+        df['temp_max'].to_numpy(), df['rainfall'].to_numpy(),
+        df['temp_min'].to_numpy() if 'temp_min' in df else None,
+        crop, stage, table,
+    )
+    df['extreme_type'] = labels
+    df['is_extreme'] = is_extreme
+    return df
+
+
+def rainfall_colors(rainfall, heavy=None, moderate=None):
+    """降雨量分级着色: >暴雨阈值 红, >大雨阈值 橙, 其余浅蓝; 阈值可为逐行数组"""
+    heavy = DEFAULT_THRESHOLDS['heavy_rain'] if heavy is None else heavy
+    moderate = DEFAULT_THRESHOLDS['rain'] if moderate is None else moderate
+    rainfall = np.asarray(rainfall)
+    level = (rainfall > moderate).astype(np.int8) + (rainfall > heavy).astype(np.int8)
+    return RAIN_COLORS[level]
+
+
+def alert_counts(codes, group_index, n_groups):
+    """按组(如地块或保单)统计各类极端天气天数, 返回 (n_groups, n_labels) 计数矩阵"""
+    flat = np.asarray(group_index, dtype=np.int64) * len(LABELS) + np.asarray(codes, dtype=np.int64)
+    return np.bincount(flat, minlength=n_groups * len(LABELS)).reshape(n_groups, len(LABELS))
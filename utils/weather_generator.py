@@ -0,0 +1,216 @@
+"""多站点随机天气发生器(巨灾情景)
+
+天气指数产品定价需要数千个合成年份、在广西各站点之间相关的逐日降雨与气温,
+原页面只是30次互相独立的随机抽样。这里实现常用的多站点天气发生器:
+  - 降雨发生: 各站一阶两状态马尔可夫链, 转移概率按月取值
+  - 降雨量: 湿日雨量服从伽马分布
+  - 空间相关: 发生与雨量都由空间相关的标准正态驱动(高斯 Copula),
+    相关系数随站点距离指数衰减
+  - 最高气温: 逐日气候均值 + 空间相关的 AR(1) 距平, 雨日偏凉
+生成按 年份批次 × 365天 × 站点 的数组进行, 逐日循环只发生在365天上, 年份与
+站点全部向量化。大批量情景可按批次直接写入磁盘(.npy 内存映射), 不受内存限制。
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.special import gammaincinv, ndtr
+
+from utils.spatial_index import COUNTY_COORDS, EARTH_RADIUS_KM
+
+DAYS = 365
+# 365天日历中每天所属月份(0~11)
+MONTH_OF_DAY = (np.arange(DAYS)[:, None] >= np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[None, 1:]).sum(axis=1)
+
+# 南宁气候概况(月): 降雨日数、月降雨量(mm)、平均最高温(°C), 作为无历史数据时的缺省参数
+GUANGXI_CLIMATE = pd.DataFrame({
+    'wet_days': [8, 10, 13, 13, 15, 17, 17, 17, 12, 8, 6, 6],
+    'rain_mm': [40, 40, 60, 90, 170, 220, 200, 210, 120, 70, 40, 25],
+    'temp_max': [18, 19, 23, 28, 31, 32, 33, 33, 32, 28, 24, 20],
+    'temp_sd': [3.5, 3.5, 3.5, 3.0, 2.5, 2.0, 2.0, 2.0, 2.0, 2.5, 3.0, 3.5],
+})
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def distance_matrix_km(lat, lon):
+    """站点两两之间的大圆距离(km)"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def spatial_cholesky(dist_km, range_km):
+    """指数衰减相关矩阵 exp(-d/range) 的 Cholesky 因子"""
+    corr = np.exp(-dist_km / range_km)
+    return np.linalg.cholesky(corr + 1e-9 * np.eye(len(corr)))
+
+
+def default_parameters(n_sites, persistence=0.35, gamma_shape=0.7):
+    """用广西气候概况构造各站相同的缺省参数, 每项为 (12, n_sites) 数组"""
+    c = GUANGXI_CLIMATE
+    p_wet = (c['wet_days'] / DAYS_IN_MONTH).to_numpy()
+    mean_amount = (c['rain_mm'] / c['wet_days']).to_numpy()
+    tile = lambda x: np.repeat(np.asarray(x, dtype=float)[:, None], n_sites, axis=1)
+    # 给定湿日频率 p 与一阶自相关 r: p11 = p + r(1-p), p01 = p(1-r), 平稳分布恰为 p
+    return {
+        'p01': tile(p_wet * (1 - persistence)),
+        'p11': tile(p_wet + persistence * (1 - p_wet)),
+        'gamma_shape': tile(np.full(12, gamma_shape)),
+        'gamma_scale': tile(mean_amount / gamma_shape),
+        'temp_mean': tile(c['temp_max']),
+        'temp_sd': tile(c['temp_sd']),
+        'temp_ar': 0.6,
+        'wet_cooling': 1.5,
+    }
+
+
+def fit_parameters(df, sites, min_days=30):
+    """从历史逐日数据按 站点 × 月 估计参数, 样本不足的格子沿用缺省参数
+
+    df: 列 station, date, rainfall, temp_max(如 WeatherStore.query_frame 的结果)
+    sites: 站点名列表, 决定输出的列顺序
+    """
+    params = default_parameters(len(sites))
+    df = df[df['station'].isin(sites)].sort_values(['station', 'date'])
+    site_idx = pd.Index(sites).get_indexer(df['station'])
+    month = pd.to_datetime(df['date']).dt.month.to_numpy() - 1
+    rain = df['rainfall'].to_numpy(dtype=float)
+    wet = rain > 0.1
+    # 前一天是否湿日(同一站点、日期连续时才有效)
+    prev_ok = np.r_[False, (site_idx[1:] == site_idx[:-1])
+                    & (np.diff(pd.to_datetime(df['date']).to_numpy()) == np.timedelta64(1, 'D'))]
+    prev_wet = np.r_[False, wet[:-1]]
+
+    cell = month * len(sites) + site_idx
+    n_cells = 12 * len(sites)
+    count = lambda mask: np.bincount(cell[mask], minlength=n_cells).reshape(12, len(sites))
+    total = lambda w, mask: np.bincount(cell[mask], weights=w[mask], minlength=n_cells).reshape(12, len(sites))
+
+    n_dry_prev, n_wet_prev = count(prev_ok & ~prev_wet), count(prev_ok & prev_wet)
+    enough = (n_dry_prev + n_wet_prev) >= min_days
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p01 = count(prev_ok & ~prev_wet & wet) / n_dry_prev
+        p11 = count(prev_ok & prev_wet & wet) / n_wet_prev
+        # 伽马分布矩估计: shape = mean²/var, scale = var/mean
+        n_wet = count(wet)
+        m = total(rain, wet) / n_wet
+        v = total(rain ** 2, wet) / n_wet - m ** 2
+        shape, scale = m ** 2 / v, v / m
+        has_t = ~np.isnan(df['temp_max'].to_numpy(dtype=float)) if 'temp_max' in df else np.zeros(len(df), bool)
+        t = df['temp_max'].to_numpy(dtype=float) if 'temp_max' in df else np.zeros(len(df))
+        n_t = count(has_t)
+        t_mean = total(t, has_t) / n_t
+        t_sd = np.sqrt(np.maximum(total(t ** 2, has_t) / n_t - t_mean ** 2, 0))
+
+    for key, est, ok in (('p01', p01, enough & (n_dry_prev > 0)), ('p11', p11, enough & (n_wet_prev > 0)),
+                         ('gamma_shape', shape, enough & (n_wet > 2) & (v > 0)),
+                         ('gamma_scale', scale, enough & (n_wet > 2) & (v > 0)),
+                         ('temp_mean', t_mean, n_t >= min_days), ('temp_sd', t_sd, n_t >= min_days)):
+        params[key] = np.where(ok, est, params[key])
+    return params
+
+
+class WeatherGenerator:
+    """多站点逐日天气发生器
+
+    sites: DataFrame, 列 site, lat, lon; 缺省为保险公司端的五个县
+    params: fit_parameters / default_parameters 的结果
+    rain_range_km / temp_range_km: 降雨与气温空间相关的衰减距离
+    """
+
+    def __init__(self, sites=None, params=None, rain_range_km=150.0, temp_range_km=400.0):
+        if sites is None:
+            sites = pd.DataFrame([(k, lat, lon) for k, (lat, lon) in COUNTY_COORDS.items()],
+                                 columns=['site', 'lat', 'lon'])
+        self.sites = sites.reset_index(drop=True)
+        n = len(self.sites)
+        self.params = default_parameters(n) if params is None else params
+        dist = distance_matrix_km(self.sites['lat'].to_numpy(float), self.sites['lon'].to_numpy(float))
+        self._chol_rain = spatial_cholesky(dist, rain_range_km)
+        self._chol_temp = spatial_cholesky(dist, temp_range_km)
+
+        # 按日展开的参数 (365, n_sites)
+        p = self.params
+        self._p01, self._p11 = p['p01'][MONTH_OF_DAY], p['p11'][MONTH_OF_DAY]
+        self._shape, self._scale = p['gamma_shape'][MONTH_OF_DAY], p['gamma_scale'][MONTH_OF_DAY]
+        # 气温气候值用月值插成平滑的日循环, 避免月初跳变
+        mid = np.cumsum(DAYS_IN_MONTH) - DAYS_IN_MONTH / 2
+        xp = np.r_[mid[-1] - DAYS, mid, mid[0] + DAYS]
+        wrap = lambda a: np.vstack([a[-1:], a, a[:1]])
+        interp = lambda a: np.column_stack([np.interp(np.arange(DAYS), xp, col) for col in wrap(a).T])
+        self._t_mean, self._t_sd = interp(p['temp_mean']), interp(p['temp_sd'])
+
+    @property
+    def n_sites(self):
+        return len(self.sites)
+
+    def _correlated_normal(self, rng, n_years, chol):
+        """(n_years, 365, n_sites) 的空间相关标准正态"""
+        z = rng.standard_normal((n_years, DAYS, self.n_sites), dtype=np.float32)
+        return z @ chol.T.astype(np.float32)
+
+    def generate(self, n_years, seed=None, rng=None):
+        """生成 n_years 个合成年份, 返回 {'rainfall', 'temp_max'}, 均为 (n_years, 365, n_sites) float32"""
+        rng = np.random.default_rng(seed) if rng is None else rng
+        occ_z = self._correlated_normal(rng, n_years, self._chol_rain)
+        amt_z = self._correlated_normal(rng, n_years, self._chol_rain)
+        tmp_z = self._correlated_normal(rng, n_years, self._chol_temp)
+
+        # 降雨发生: 逐日推进马尔可夫链, 各年各站同时计算
+        u_occ = ndtr(occ_z)
+        wet = np.empty(u_occ.shape, dtype=bool)
+        state = rng.random((n_years, self.n_sites)) < self._p01[0] / (1 + self._p01[0] - self._p11[0])
+        for d in range(DAYS):
+            state = u_occ[:, d] < np.where(state, self._p11[d], self._p01[d])
+            wet[:, d] = state
+
+        # 降雨量: 相关正态 → 均匀分布 → 伽马分位数
+        u_amt = np.clip(ndtr(amt_z), 1e-7, 1 - 1e-7)
+        rainfall = np.where(wet, gammaincinv(self._shape, u_amt) * self._scale, 0.0).astype(np.float32)
+
+        # 最高气温: AR(1) 距平, 创新项空间相关
+        phi = self.params['temp_ar']
+        anomaly = np.empty(tmp_z.shape, dtype=np.float32)
+        a = tmp_z[:, 0]
+        innov_sd = np.float32(np.sqrt(1 - phi ** 2))
+        for d in range(DAYS):
+            a = tmp_z[:, d] if d == 0 else phi * a + innov_sd * tmp_z[:, d]
+            anomaly[:, d] = a
+        temp_max = (self._t_mean + self._t_sd * anomaly - self.params['wet_cooling'] * wet).astype(np.float32)
+        return {'rainfall': rainfall, 'temp_max': temp_max}
+
+    def iter_batches(self, n_years, batch_years=500, seed=None):
+        """分批生成, 逐批 yield (起始年份下标, 批次结果), 内存只占一个批次"""
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_years, batch_years):
+            yield start, self.generate(min(batch_years, n_years - start), rng=rng)
+
+    def generate_to_disk(self, out_dir, n_years, batch_years=500, seed=None):
+        """把 n_years 年情景逐批写入 out_dir/<要素>.npy, 读取时用 np.load(mmap_mode='r')
+
+        返回各要素文件路径; 另写 sites.csv 记录站点顺序。
+        """
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.sites.to_csv(out_dir / 'sites.csv', index=False)
+        shape = (n_years, DAYS, self.n_sites)
+        paths = {v: out_dir / f'{v}.npy' for v in ('rainfall', 'temp_max')}
+        arrays = {v: np.lib.format.open_memmap(p, mode='w+', dtype=np.float32, shape=shape)
+                  for v, p in paths.items()}
+        for start, batch in self.iter_batches(n_years, batch_years, seed):
+            for v, arr in arrays.items():
+                arr[start:start + len(batch[v])] = batch[v]
+            for arr in arrays.values():
+                arr.flush()
+        del arrays
+        return paths
+
+
+def load_scenarios(out_dir):
+    """读取 generate_to_disk 的结果(只读内存映射)"""
+    out_dir = Path(out_dir)
+    data = {p.stem: np.load(p, mmap_mode='r') for p in out_dir.glob('*.npy')}
+    data['sites'] = pd.read_csv(out_dir / 'sites.csv')
+    return data
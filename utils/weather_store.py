@@ -0,0 +1,287 @@
+"""气象数据入库与列式存储
+
+把放在投递目录里的站点/格点日数据(CSV, 或 NetCDF 导出文件)导入到按
+地区 × 月份 分区的列式目录, 每列一个 .npy 文件。读取时用 np.load(mmap_mode='r')
+内存映射, 农户端看板和天气指数触发可以按县切片几十年的数据, 而不必整体读入内存。
+
+目录结构:
+    data/weather/
+        catalog.json                  站点表与已导入文件清单
+        <地区>/<YYYY-MM>/station.npy  站点编号(int32)
+                          date.npy     日期(datetime64[D])
+                          temp_max.npy / temp_min.npy / rainfall.npy ...(float32)
+分区内按 (站点, 日期) 排序, 同一站点同一天重复导入时以后导入的为准。
+地区名统一去掉"广西"前缀("广西南宁-武鸣" 与 "南宁-武鸣" 是同一分区)。
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ROOT = Path("data/weather")
+
+# 气象要素列(float32 存储)
+VALUE_COLUMNS = ['temp_max', 'temp_min', 'rainfall', 'humidity', 'wind_speed']
+
+# 投递文件中常见的中文表头
+COLUMN_ALIASES = {
+    '站点': 'station_id', '站号': 'station_id', '地区': 'region', '日期': 'date',
+    '最高温': 'temp_max', '最低温': 'temp_min', '降雨量': 'rainfall',
+    '湿度': 'humidity', '风速': 'wind_speed', '纬度': 'lat', '经度': 'lon',
+}
+
+
+def region_key(name):
+    """'广西钦州-灵山' → '钦州-灵山', 导入与读取都用它规范地区名"""
+    name = str(name)
+    return name[2:] if name.startswith('广西') else name
+
+
+def _read_csv(path):
+    df = pd.read_csv(path)
+    return df.rename(columns=COLUMN_ALIASES)
+
+
+def _read_netcdf(path, region):
+    """NetCDF 格点文件: 每个格点作为一个虚拟站点(需要 xarray)"""
+    try:
+        import xarray as xr
+    except ImportError as exc:
+        raise ImportError("导入 NetCDF 文件需要安装 xarray 与 netCDF4") from exc
+
+    with xr.open_dataset(path) as ds:
+        df = ds.to_dataframe().reset_index()
+    df = df.rename(columns={'time': 'date', 'latitude': 'lat', 'longitude': 'lon'})
+    df['station_id'] = ('grid_' + df['lat'].round(3).astype(str) + '_' + df['lon'].round(3).astype(str))
+    if 'region' not in df:
+        df['region'] = region
+    return df
+
+
+class WeatherStore:
+    """列式气象数据仓库"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._catalog_path = self.root / 'catalog.json'
+        if self._catalog_path.exists():
+            self.catalog = json.loads(self._catalog_path.read_text(encoding='utf-8'))
+        else:
+            self.catalog = {'stations': [], 'station_region': {}, 'station_coords': {}, 'ingested': {}}
+        self._station_code = {s: i for i, s in enumerate(self.catalog['stations'])}
+
+    # ==================== 导入 ====================
+
+    def _save_catalog(self):
+        tmp = self._catalog_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.catalog, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self._catalog_path)
+
+    def _encode_stations(self, station_ids, regions, lats=None, lons=None):
+        codes = np.empty(len(station_ids), dtype=np.int32)
+        uniq, inverse = np.unique(station_ids.astype(str), return_inverse=True)
+        first = {}
+        for s in uniq:
+            if s not in self._station_code:
+                self._station_code[s] = len(self.catalog['stations'])
+                self.catalog['stations'].append(s)
+            first[s] = self._station_code[s]
+        codes[:] = np.array([first[s] for s in uniq], dtype=np.int32)[inverse]
+
+        # 记录站点所属地区与坐标(每个站点取首次出现的值)
+        _, first_idx = np.unique(inverse, return_index=True)
+        for s, j in zip(uniq, first_idx):
+            self.catalog['station_region'].setdefault(s, str(regions[j]))
+            if lats is not None:
+                self.catalog['station_coords'].setdefault(s, [float(lats[j]), float(lons[j])])
+        return codes
+
+    def ingest_frame(self, df):
+        """导入一个 DataFrame(列 station_id, region, date 及气象要素), 返回写入的分区数"""
+        df = df.rename(columns=COLUMN_ALIASES)
+        date = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+        region = df['region'].map(region_key).to_numpy()
+        codes = self._encode_stations(
+            df['station_id'].to_numpy(), region,
+            df['lat'].to_numpy() if 'lat' in df else None,
+            df['lon'].to_numpy() if 'lon' in df else None,
+        )
+        month = date.astype('datetime64[M]')
+        columns = [c for c in VALUE_COLUMNS if c in df]
+        values = {c: df[c].to_numpy(dtype=np.float32) for c in columns}
+
+        part_keys = pd.DataFrame({'region': region, 'month': month})
+        written = 0
+        for (reg, mon), idx in part_keys.groupby(['region', 'month']).indices.items():
+            self._merge_partition(reg, str(np.datetime64(mon, 'M')), codes[idx], date[idx],
+                                  {c: v[idx] for c, v in values.items()})
+            written += 1
+        self._save_catalog()
+        return written
+
+    def _merge_partition(self, region, month, station, date, values):
+        part_dir = self.root / region / month
+        if part_dir.exists():
+            old = self.load_partition(region, month, mmap=False)
+            station = np.concatenate([old['station'], station])
+            date = np.concatenate([old['date'], date])
+            for c in set(values) | (set(old) - {'station', 'date'}):
+                old_col = old.get(c, np.full(len(old['station']), np.nan, dtype=np.float32))
+                new_col = values.get(c, np.full(len(station) - len(old_col), np.nan, dtype=np.float32))
+                values[c] = np.concatenate([old_col, new_col])
+
+        # 按 (站点, 日期) 排序, 重复记录保留最后导入的一条
+        order = np.lexsort((np.arange(len(station)), date, station))
+        station, date = station[order], date[order]
+        last = np.ones(len(station), dtype=bool)
+        last[:-1] = (station[1:] != station[:-1]) | (date[1:] != date[:-1])
+
+        tmp_dir = part_dir.with_name(month + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+        np.save(tmp_dir / 'station.npy', station[last].astype(np.int32))
+        np.save(tmp_dir / 'date.npy', date[last].astype('datetime64[D]'))
+        for c, v in values.items():
+            np.save(tmp_dir / f'{c}.npy', v[order][last].astype(np.float32))
+
+        # 先写临时目录再整体替换, 读者不会看到写了一半的分区
+        if part_dir.exists():
+            backup = part_dir.with_name(month + '.old')
+            os.replace(part_dir, backup)
+            os.replace(tmp_dir, part_dir)
+            shutil.rmtree(backup)
+        else:
+            os.replace(tmp_dir, part_dir)
+
+    def ingest_directory(self, drop_dir, default_region='未知地区'):
+        """扫描投递目录, 导入新出现或有修改的 CSV/NetCDF 文件, 返回导入的文件列表"""
+        drop_dir = Path(drop_dir)
+        imported = []
+        for path in sorted(drop_dir.glob('*')):
+            suffix = path.suffix.lower()
+            if suffix not in ('.csv', '.nc', '.nc4'):
+                continue
+            stat = path.stat()
+            signature = f"{stat.st_size}:{int(stat.st_mtime)}"
+            if self.catalog['ingested'].get(path.name) == signature:
+                continue
+
+            df = _read_csv(path) if suffix == '.csv' else _read_netcdf(path, default_region)
+            if 'region' not in df:
+                df['region'] = default_region
+            self.ingest_frame(df)
+            self.catalog['ingested'][path.name] = signature
+            imported.append(path.name)
+        self._save_catalog()
+        return imported
+
+    # ==================== 读取 ====================
+
+    def regions(self):
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def months(self, region):
+        region_dir = self.root / region_key(region)
+        if not region_dir.exists():
+            return []
+        return sorted(p.name for p in region_dir.iterdir()
+                      if p.is_dir() and not p.name.endswith(('.tmp', '.old')))
+
+    def load_partition(self, region, month, columns=None, mmap=True):
+        """读取一个分区, 返回 {列名: 数组}, mmap=True 时为只读内存映射"""
+        part_dir = self.root / region_key(region) / month
+        mode = 'r' if mmap else None
+        names = ['station', 'date'] + (
+            [p.stem for p in part_dir.glob('*.npy') if p.stem not in ('station', 'date')]
+            if columns is None else list(columns))
+        return {n: np.load(part_dir / f'{n}.npy', mmap_mode=mode)
+                for n in names if (part_dir / f'{n}.npy').exists()}
+
+    def query(self, region, start=None, end=None, stations=None, columns=None):
+        """按地区与日期范围读取, 返回 {列名: 数组}
+
+        只有一个分区且不需要按日期/站点过滤时, 返回的就是内存映射本身(零拷贝);
+        跨分区时各分区内先按掩码切片, 再拼接。
+        stations: 站点名列表, 缺省为该地区全部站点
+        """
+        start = np.datetime64(start, 'D') if start is not None else None
+        end = np.datetime64(end, 'D') if end is not None else None
+        months = self.months(region)
+        if start is not None:
+            months = [m for m in months if np.datetime64(m, 'M') >= start.astype('datetime64[M]')]
+        if end is not None:
+            months = [m for m in months if np.datetime64(m, 'M') <= end.astype('datetime64[M]')]
+
+        codes = None
+        if stations is not None:
+            codes = np.array([self._station_code[s] for s in stations if s in self._station_code],
+                             dtype=np.int32)
+
+        pieces = []
+        for m in months:
+            part = self.load_partition(region, m, columns)
+            mask = None
+            if start is not None or end is not None:
+                d = part['date']
+                mask = np.ones(len(d), dtype=bool)
+                if start is not None:
+                    mask &= d >= start
+                if end is not None:
+                    mask &= d <= end
+            if codes is not None:
+                smask = np.isin(part['station'], codes)
+                mask = smask if mask is None else mask & smask
+            if mask is not None and not mask.all():
+                part = {k: v[mask] for k, v in part.items()}
+            pieces.append(part)
+
+        if not pieces:
+            return {}
+        if len(pieces) == 1:
+            return pieces[0]
+        keys = set.intersection(*(set(p) for p in pieces))
+        return {k: np.concatenate([p[k] for p in pieces]) for k in keys}
+
+    def query_frame(self, region, start=None, end=None, stations=None, columns=None):
+        """query 的 DataFrame 版本, 站点编号还原为站点名"""
+        data = self.query(region, start, end, stations, columns)
+        if not data:
+            return pd.DataFrame()
+        df = pd.DataFrame({k: np.asarray(v) for k, v in data.items()})
+        df['station'] = np.asarray(self.catalog['stations'])[df['station'].to_numpy()]
+        return df.sort_values(['date', 'station'], ignore_index=True)
+
+    def daily_region_mean(self, region, start=None, end=None, columns=('temp_max', 'temp_min', 'rainfall')):
+        """地区内所有站点的逐日平均, 供农户端看板直接绘图"""
+        df = self.query_frame(region, start, end, columns=columns)
+        if df.empty:
+            return df
+        return df.groupby('date', as_index=False)[list(columns)].mean()
+
+    def climatology(self, region, start, days=30, columns=('temp_max', 'temp_min', 'rainfall')):
+        """未来 days 天对应日历日的多年平均(同期气候), 只读取涉及月份的分区
+
+        返回 DataFrame: date(从 start 起的连续日期) 及各要素多年均值; 无数据时为空表
+        """
+        target = pd.date_range(pd.Timestamp(start).normalize(), periods=days, freq='D')
+        target_months = {d.strftime('%m') for d in target}
+        pieces = []
+        for m in self.months(region):
+            if m[-2:] not in target_months:
+                continue
+            part = self.load_partition(region, m, columns)
+            pieces.append(pd.DataFrame({k: np.asarray(part[k]) for k in ('date',) + tuple(columns) if k in part}))
+        if not pieces:
+            return pd.DataFrame()
+
+        df = pd.concat(pieces, ignore_index=True)
+        df['md'] = pd.to_datetime(df['date']).dt.strftime('%m-%d')
+        clim = df.groupby('md')[[c for c in columns if c in df]].mean()
+        out = clim.reindex(target.strftime('%m-%d')).reset_index(drop=True)
+        out.insert(0, 'date', target)
+        return out.interpolate(limit_direction='both')
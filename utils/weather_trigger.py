@@ -0,0 +1,188 @@
+"""天气指数保险触发引擎
+
+首页宣传"AI实时监测极端天气, 自动触发理赔预警", 但农户端只是在图上画了
+35°C / 50mm 两条线。本模块按指数定义(N日累计降雨、连续高温天数、N日累计
+降雨不足等)对所有生效保单统一计算指数值与赔付:
+  - 滚动窗口统计用前缀和一次算出 (地点 × 日期) 的全部窗口值
+  - 各保单保障期不同, 期内最大/最小值用稀疏表(Sparse Table)做 O(1) 区间查询
+  - 赔付曲线支持 线性(起赔点→封顶点) 与 阶梯 两种
+全账簿评估只有少量数组运算, 数据刷新后可在数秒内完成。
+"""
+import numpy as np
+import pandas as pd
+
+# 指数定义示例, 与农户端图表阈值一致
+DEFAULT_INDEX_PRODUCTS = {
+    '暴雨指数': {
+        'type': 'rain_sum', 'window': 3, 'direction': 'above',
+        'tiers': [(100, 0.3), (150, 0.6), (200, 1.0)],
+    },
+    '高温指数': {
+        'type': 'hot_run', 'threshold': 35.0, 'direction': 'above',
+        'trigger': 3, 'exit': 10,
+    },
+    '干旱指数': {
+        'type': 'rain_sum', 'window': 20, 'direction': 'below',
+        'trigger': 20, 'exit': 0,
+    },
+}
+
+
+def rolling_sum(x, window):
+    """沿最后一维的滚动求和, 窗口未满 window 天的位置为 NaN(不足天数的累计值不能用于触发)"""
+    c = np.cumsum(x, axis=-1, dtype=np.float64)
+    out = c.copy()
+    out[..., window:] = c[..., window:] - c[..., :-window]
+    out[..., :window - 1] = np.nan
+    return out
+
+
+def run_lengths(mask):
+    """逐日截至当天的连续 True 天数, 沿最后一维"""
+    mask = np.asarray(mask, dtype=bool)
+    c = np.cumsum(mask, axis=-1)
+    reset = np.maximum.accumulate(np.where(~mask, c, 0), axis=-1)
+    return c - reset
+
+
+def forward_run_lengths(mask):
+    """从当天起向后的连续 True 天数"""
+    return run_lengths(np.asarray(mask)[..., ::-1])[..., ::-1]
+
+
+class SparseTable:
+    """(n_rows, n_days) 数组的区间最大/最小值表, 构建 O(n log n), 查询 O(1) 且对保单向量化"""
+
+    def __init__(self, values, op=np.maximum):
+        self.op = op
+        self.levels = [np.asarray(values)]
+        k = 1
+        while 2 * k <= self.levels[0].shape[-1]:
+            prev = self.levels[-1]
+            self.levels.append(op(prev[..., :-k], prev[..., k:]))
+            k *= 2
+
+    def query(self, rows, start, end):
+        """rows/start/end 为等长数组, 区间为闭区间 [start, end]"""
+        length = end - start + 1
+        level = np.floor(np.log2(np.maximum(length, 1))).astype(int)
+        out = np.empty(len(rows), dtype=self.levels[0].dtype)
+        for lv in np.unique(level):
+            sel = level == lv
+            table = self.levels[lv]
+            span = 1 << lv
+            out[sel] = self.op(table[rows[sel], start[sel]], table[rows[sel], end[sel] - span + 1])
+        return out
+
+
+def payout_ratio(index_value, definition):
+    """按赔付曲线把指数值换算成赔付比例(0~1); 指数值为 NaN(无法计算)时不赔付"""
+    x = np.asarray(index_value, dtype=float)
+    return np.where(np.isnan(x), 0.0, _curve(np.nan_to_num(x), definition))
+
+
+def _curve(x, definition):
+    above = definition.get('direction', 'above') == 'above'
+
+    if 'tiers' in definition:
+        levels = np.array([t[0] for t in definition['tiers']], dtype=float)
+        ratios = np.concatenate([[0.0], [t[1] for t in definition['tiers']]])
+        if above:
+            return ratios[np.searchsorted(levels, x, side='right')]
+        # 指数低于阈值赔付: 阈值从高到低排列
+        order = np.argsort(-levels)
+        idx = np.searchsorted(-levels[order], -x, side='right')
+        return np.concatenate([[0.0], ratios[1:][order]])[idx]
+
+    trigger, exit_ = definition['trigger'], definition['exit']
+    span = (exit_ - trigger) if above else (trigger - exit_)
+    dist = (x - trigger) if above else (trigger - x)
+    if span <= 0:
+        return (dist >= 0).astype(float)
+    # 起赔点处比例为 0, 超过起赔点后线性增加, 到封顶点为 1
+    return np.clip(dist / span, 0, 1)
+
+
+def _index_values(weather, definition, locations, start, end):
+    """计算每张保单在保障期内的指数值"""
+    kind = definition['type']
+
+    if kind == 'rain_sum':
+        window = definition['window']
+        sums = rolling_sum(weather['rainfall'], window)
+        # 窗口必须完整落在保障期内: 只在 [start + window - 1, end] 上取极值;
+        # 保障期短于窗口的保单没有完整窗口, 指数值为 NaN(不触发)
+        short = end - start + 1 < window
+        q_start = np.minimum(start + window - 1, end)
+        op = np.maximum if definition.get('direction', 'above') == 'above' else np.minimum
+        values = SparseTable(sums, op).query(locations, q_start, end)
+        return np.where(short, np.nan, values)
+
+    if kind == 'temp_max':
+        return SparseTable(weather['temp_max'], np.maximum).query(locations, start, end)
+
+    if kind == 'hot_run':
+        hot = weather['temp_max'] > definition['threshold']
+        runs = run_lengths(hot)
+        fwd = forward_run_lengths(hot)
+        # 保障期起点所在的连续高温段要截断到起点之后
+        head = np.minimum(fwd[locations, start], end - start + 1)
+        rest_start = start + head
+        has_rest = rest_start <= end
+        rest = np.zeros(len(locations), dtype=runs.dtype)
+        if has_rest.any():
+            rest[has_rest] = SparseTable(runs, np.maximum).query(
+                locations[has_rest], rest_start[has_rest], end[has_rest])
+        return np.maximum(head, rest)
+
+    raise ValueError(f"未知的指数类型: {kind}")
+
+
+def evaluate_policies(weather, policies, products=None):
+    """对全部生效保单计算指数值与赔付
+
+    weather: {要素名: (n_locations, n_days) 数组}, 如 rainfall / temp_max
+    policies: DataFrame, 列
+        - location: 地点行号(对应 weather 的第0维)
+        - start, end: 保障期起止日(对应 weather 的第1维, 闭区间)
+        - product: 指数产品名(products 的键)
+        - sum_insured: 保额(元)
+    products: {产品名: 指数定义}, 缺省为 DEFAULT_INDEX_PRODUCTS
+
+    返回 DataFrame(与 policies 同序): 指数值, 赔付比例, 赔付金额, 是否触发
+    """
+    products = DEFAULT_INDEX_PRODUCTS if products is None else products
+    n_days = next(iter(weather.values())).shape[-1]
+
+    loc = policies['location'].to_numpy(dtype=np.int64)
+    start = np.clip(policies['start'].to_numpy(dtype=np.int64), 0, n_days - 1)
+    end = np.clip(policies['end'].to_numpy(dtype=np.int64), 0, n_days - 1)
+    insured = policies['sum_insured'].to_numpy(dtype=float)
+    product = policies['product'].to_numpy()
+
+    index_value = np.full(len(policies), np.nan)
+    ratio = np.zeros(len(policies))
+    for name in pd.unique(product):
+        sel = np.flatnonzero(product == name)
+        definition = products[name]
+        values = _index_values(weather, definition, loc[sel], start[sel], end[sel])
+        index_value[sel] = values
+        ratio[sel] = payout_ratio(values, definition)
+
+    result = policies.copy()
+    result['指数值'] = index_value
+    result['赔付比例'] = ratio
+    result['赔付金额'] = ratio * insured
+    result['是否触发'] = ratio > 0
+    return result
+
+
+def evaluate_series(weather_frame, product, products=None, sum_insured=1.0):
+    """单个地点的逐日气象表(如农户端30天数据)上评估一个指数产品, 返回 (指数值, 赔付比例, 赔付金额)"""
+    products = DEFAULT_INDEX_PRODUCTS if products is None else products
+    weather = {c: weather_frame[c].to_numpy(dtype=float)[None, :]
+               for c in ('rainfall', 'temp_max') if c in weather_frame}
+    policies = pd.DataFrame({'location': [0], 'start': [0], 'end': [len(weather_frame) - 1],
+                             'product': [product], 'sum_insured': [sum_insured]})
+    row = evaluate_policies(weather, policies, products).iloc[0]
+    return row['指数值'], row['赔付比例'], row['赔付金额']